@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from vector_index import normalize_query
+
+
+def answer_cache_enabled() -> bool:
+    return os.getenv('ANSWER_CACHE_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+
+
+class _CachedAnswer:
+    __slots__ = ('answer', 'sources', 'created_at', 'last_used')
+
+    def __init__(self, answer: str, sources: List[Dict], now: float):
+        self.answer = answer
+        self.sources = sources
+        self.created_at = now
+        self.last_used = now
+
+
+class _SchoolAnswers:
+    """One school's cached answers, with their question vectors as one matrix."""
+
+    __slots__ = ('vectors', 'entries')
+
+    def __init__(self, dim: int):
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.entries: List[_CachedAnswer] = []
+
+    def remove(self, position: int):
+        self.vectors = np.delete(self.vectors, position, axis=0)
+        del self.entries[position]
+
+
+class SemanticAnswerCache:
+    """Per-school cache of generated answers, looked up by question similarity.
+
+    A question whose normalized embedding has cosine similarity of at least
+    ``threshold`` with a cached question gets that question's answer back
+    without calling Claude. Entries expire after ``ttl_seconds``, each school
+    keeps at most ``max_per_school`` answers (least recently served evicted
+    first), and a school's answers are dropped when its handbook changes.
+
+    Invalidation only reaches this process: with several uvicorn workers, the
+    others keep serving their answers until ``ttl_seconds`` runs out, so the
+    TTL is the bound on staleness after a handbook is reprocessed.
+    """
+
+    def __init__(self,
+                 threshold: Optional[float] = None,
+                 ttl_seconds: Optional[float] = None,
+                 max_per_school: Optional[int] = None):
+        self.threshold = threshold if threshold is not None else float(os.getenv('ANSWER_CACHE_THRESHOLD', '0.95'))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv('ANSWER_CACHE_TTL_SECONDS', '3600'))
+        self.max_per_school = max_per_school or int(os.getenv('ANSWER_CACHE_MAX_PER_SCHOOL', '256'))
+        self._schools: Dict[str, _SchoolAnswers] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def get(self, school_id: str, question_embedding: np.ndarray) -> Optional[Dict]:
+        """Cached answer and sources for a similar enough question, or None."""
+        query = normalize_query(question_embedding)
+        now = time.monotonic()
+        with self._lock:
+            school = self._schools.get(school_id)
+            if school is None or not school.entries:
+                self._stats["misses"] += 1
+                return None
+
+            scores = school.vectors @ query
+            best = int(np.argmax(scores))
+            entry = school.entries[best]
+            if now - entry.created_at > self.ttl_seconds:
+                school.remove(best)
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+            if scores[best] < self.threshold:
+                self._stats["misses"] += 1
+                return None
+
+            entry.last_used = now
+            self._stats["hits"] += 1
+            return {"answer": entry.answer, "sources": entry.sources, "similarity": float(scores[best])}
+
+    def put(self, school_id: str, question_embedding: np.ndarray, answer: str, sources: List[Dict]):
+        """Remember an answer generated for a question about a school."""
+        query = normalize_query(question_embedding)
+        now = time.monotonic()
+        with self._lock:
+            school = self._schools.get(school_id)
+            if school is None or school.vectors.shape[1] != len(query):
+                school = self._schools[school_id] = _SchoolAnswers(len(query))
+
+            for position in reversed(range(len(school.entries))):
+                if now - school.entries[position].created_at > self.ttl_seconds:
+                    school.remove(position)
+                    self._stats["expirations"] += 1
+            while len(school.entries) >= self.max_per_school:
+                oldest = min(range(len(school.entries)), key=lambda i: school.entries[i].last_used)
+                school.remove(oldest)
+                self._stats["evictions"] += 1
+
+            school.vectors = np.vstack([school.vectors, query[np.newaxis, :]])
+            school.entries.append(_CachedAnswer(answer, sources, now))
+            self._stats["stores"] += 1
+
+    def invalidate(self, school_id: str):
+        """Forget every answer for a school (its handbook content changed)."""
+        with self._lock:
+            if self._schools.pop(school_id, None) is not None:
+                self._stats["invalidations"] += 1
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": self._stats["hits"] / lookups if lookups else 0.0,
+                "answers": sum(len(school.entries) for school in self._schools.values()),
+                "schools": len(self._schools),
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl_seconds,
+                "max_per_school": self.max_per_school,
+            }
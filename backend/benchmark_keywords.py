@@ -0,0 +1,140 @@
+"""
+Micro-benchmark for page tagging and categorization.
+
+Compares, per page:
+  legacy   - the original per-call keyword dictionaries and substring scans
+  regex    - one compiled alternation regex (overlapping matches) giving the full hit set
+  matcher  - KeywordMatcher.analyze plus category_from_analysis, as used by HandbookProcessor
+
+Pages come from a PDF when one is given, otherwise from synthetic handbook text:
+
+    python benchmark_keywords.py [handbook.pdf] --repeat 50
+"""
+import argparse
+import random
+import re
+import time
+
+from keyword_matcher import (CATEGORY_KEYWORDS, DEFAULT_CATEGORY, DEFAULT_SECTION_GROUP,
+                             SECTION_GROUP_KEYWORDS, TAG_KEYWORDS, KeywordMatcher)
+
+
+def legacy_tags(text):
+    tags = []
+    text_lower = text.lower()
+    all_keywords = {tag: keywords for tag, keywords in TAG_KEYWORDS.items() if tag != 'student_focused'}
+    for tag, keywords in all_keywords.items():
+        if any(keyword in text_lower for keyword in keywords):
+            tags.append(tag)
+    if 'student' in text_lower:
+        tags.append('student_focused')
+    return list(set(tags))
+
+
+def legacy_category(text, section_title=None):
+    text_lower = text.lower()
+    title_lower = (section_title or "").lower()
+    categories = dict(CATEGORY_KEYWORDS)
+    for category, keywords in categories.items():
+        if any(keyword in text_lower or keyword in title_lower for keyword in keywords):
+            return category
+    return DEFAULT_CATEGORY
+
+
+def legacy_section_group(title):
+    title_lower = title.lower()
+    for group, keywords in dict(SECTION_GROUP_KEYWORDS).items():
+        if any(word in title_lower for word in keywords):
+            return group
+    return DEFAULT_SECTION_GROUP
+
+
+class RegexHits:
+    """Full keyword hit set from one overlapping-match regex pass."""
+
+    def __init__(self):
+        keywords = {k for table in (TAG_KEYWORDS, CATEGORY_KEYWORDS, SECTION_GROUP_KEYWORDS)
+                    for values in table.values() for k in values}
+        ordered = sorted(keywords, key=len, reverse=True)
+        self.pattern = re.compile('(?=(' + '|'.join(re.escape(k) for k in ordered) + '))')
+        # A match stands for every keyword it contains (e.g. "course selection" -> "course")
+        self.contained = {k: {j for j in keywords if j in k} for k in keywords}
+
+    def find(self, text):
+        found = set()
+        for match in set(self.pattern.findall(text.lower())):
+            found |= self.contained[match]
+        return found
+
+    def analyze(self, text, title):
+        hits = self.find(text)
+        title_hits = self.find(title)
+        tags = [tag for tag, kws in TAG_KEYWORDS.items() if hits.intersection(kws)]
+        category = next((c for c, kws in CATEGORY_KEYWORDS.items()
+                         if hits.intersection(kws) or title_hits.intersection(kws)), DEFAULT_CATEGORY)
+        group = next((g for g, kws in SECTION_GROUP_KEYWORDS.items() if title_hits.intersection(kws)),
+                     DEFAULT_SECTION_GROUP)
+        return tags, category, group
+
+
+def synthetic_pages(count, seed=0):
+    rng = random.Random(seed)
+    vocabulary = ("the student university policy must all of and to in academic integrity residence hall "
+                  "guests semester course registration office financial aid conduct violations appeal "
+                  "sanctions housing dining examinations grades support services counseling deadline "
+                  "with for is are be by on this that may will should before after within days").split()
+    return [' '.join(rng.choice(vocabulary) for _ in range(550)) for _ in range(count)]
+
+
+def pdf_pages(path):
+    import fitz  # PyMuPDF
+    from handbook_processor import HandbookProcessor
+    processor = HandbookProcessor()
+    doc = fitz.open(path)
+    pages = [processor.clean_text(page.get_text()) for page in doc]
+    doc.close()
+    return [page for page in pages if page.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pdf', nargs='?')
+    parser.add_argument('--pages', type=int, default=200, help='synthetic pages when no PDF is given')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    pages = pdf_pages(args.pdf) if args.pdf else synthetic_pages(args.pages)
+    title = "Student Conduct and Residence Policy"
+    matcher = KeywordMatcher()
+    regex = RegexHits()
+
+    def run_legacy(text):
+        return sorted(legacy_tags(text)), legacy_category(text, title), legacy_section_group(title)
+
+    def run_regex(text):
+        tags, category, group = regex.analyze(text, title)
+        return sorted(tags), category, group
+
+    def run_matcher(text):
+        analysis = matcher.analyze(text)
+        category = matcher.category_from_analysis(analysis["text_category"], title)
+        return sorted(analysis["tags"]), category, matcher.section_group(title)
+
+    for text in pages:
+        expected = run_legacy(text)
+        assert run_regex(text) == expected, "regex result differs from legacy"
+        assert run_matcher(text) == expected, "matcher result differs from legacy"
+
+    chars = sum(len(p) for p in pages) / len(pages)
+    print(f"{len(pages)} pages, {chars:.0f} chars/page, {args.repeat} repeats (results identical)\n")
+    for name, fn in (('legacy', run_legacy), ('regex', run_regex), ('matcher', run_matcher)):
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for text in pages:
+                fn(text)
+        per_page = (time.perf_counter() - start) / (args.repeat * len(pages)) * 1e6
+        print(f"{name:<10}{per_page:>10.1f} us/page")
+
+
+if __name__ == '__main__':
+    main()
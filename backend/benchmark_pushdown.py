@@ -0,0 +1,97 @@
+"""
+Benchmark in-memory retrieval against the Snowflake pushdown backend.
+
+By default both run locally: synthetic sections go into an in-memory SQLite
+repository for the pushdown query and into a FlatIndex for the in-memory
+path, so it runs without Snowflake or the embedding model:
+
+    python benchmark_pushdown.py --sections 5000 --queries 50
+
+With --snowflake-school the pushdown query runs against the configured
+warehouse instead (the school's sections need stored embeddings), and the
+in-memory side is built from the same vectors:
+
+    python benchmark_pushdown.py --snowflake-school <school_id> --queries 50
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from embedding_cache import EMBEDDING_DIMENSION, parse_vector
+from pushdown_search import PushdownRetriever
+from snowflake_storage import SnowflakeRepository
+from sqlite_storage import SQLiteRepository
+from vector_index import FlatIndex, normalize_rows
+
+
+def synthetic_school(storage, n, dim, seed=0):
+    """Ingest one school of n sections; return (section ids, vectors)."""
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    sections = [{'section_id': f's{i}', 'handbook_id': 'h1', 'section_group': 'policy', 'section_key': f'k{i}',
+                 'page': i, 'section_title': f'Section {i}', 'category': 'Policy', 'type': 'page',
+                 'content': f'Policy text for section {i}. ' * 8, 'raw_text': '', 'excerpt': f'Section {i}',
+                 'topics': [], 'tags': [], 'embedding': vector.tolist()} for i, vector in enumerate(vectors)]
+    storage.insert_school('bench', 'Benchmark University', 'BU')
+    with storage.ingest() as writer:
+        writer.insert_handbook('h1', 'bench', 'Benchmark Handbook', '2024-2025')
+        writer.insert_sections(sections)
+    return [section['section_id'] for section in sections], vectors
+
+
+def stored_vectors(storage, school_id):
+    """Section ids and stored vectors of a real school."""
+    frame = pd.concat(storage.school_section_batches(school_id, with_content=False, with_embeddings=True),
+                      ignore_index=True)
+    vectors = [parse_vector(value) for value in frame['EMBEDDING']]
+    keep = [i for i, vector in enumerate(vectors) if vector is not None]
+    return frame['SECTION_ID'].iloc[keep].tolist(), np.vstack([vectors[i] for i in keep])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sections', type=int, default=5000)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--top-k', type=int, default=3)
+    parser.add_argument('--snowflake-school', default=None)
+    args = parser.parse_args()
+
+    if args.snowflake_school:
+        school_id = args.snowflake_school
+        storage = SnowflakeRepository()
+        section_ids, vectors = stored_vectors(storage, school_id)
+    else:
+        school_id = 'bench'
+        storage = SQLiteRepository(':memory:')
+        section_ids, vectors = synthetic_school(storage, args.sections, EMBEDDING_DIMENSION)
+    retriever = PushdownRetriever(storage)
+
+    rng = np.random.default_rng(1)
+    # Queries near real sections, like questions that have an answer in the handbook
+    picks = rng.integers(len(vectors), size=args.queries)
+    queries = (vectors[picks] + 0.5 * rng.normal(size=(args.queries, vectors.shape[1]))).astype(np.float32)
+
+    start = time.perf_counter()
+    normalized = normalize_rows(vectors.astype(np.float32))
+    index = FlatIndex().build(normalized, normalized=True)
+    build_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    memory_hits = [[section_ids[i] for i in index.search(q, args.top_k)[0]] for q in queries]
+    memory_ms = (time.perf_counter() - start) * 1000 / args.queries
+
+    start = time.perf_counter()
+    pushdown_hits = [[r['section_id'] for r in retriever.search(q, school_id, args.top_k)] for q in queries]
+    pushdown_ms = (time.perf_counter() - start) * 1000 / args.queries
+
+    agreement = sum(len(set(a) & set(b)) for a, b in zip(memory_hits, pushdown_hits)) / (args.queries * args.top_k)
+    print(f"{len(section_ids)} sections, top_k {args.top_k}, {args.queries} queries, pushdown via {storage.name}\n")
+    print(f"{'backend':<12}{'query ms':>10}{'worker MB':>11}")
+    print(f"{'memory':<12}{memory_ms:>10.3f}{normalized.nbytes / 1e6:>11.1f}   (vectors only, plus section rows; {build_ms:.0f} ms index build)")
+    print(f"{'pushdown':<12}{pushdown_ms:>10.3f}{0.0:>11.1f}")
+    print(f"\ntop-{args.top_k} agreement: {agreement:.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Memory and result-assembly benchmark for per-school section storage.
+
+Compares, for a synthetic school shaped like the rows a school load reads:
+  dataframe - the previous per-school pandas frame, including searchable_text
+  store     - SectionStore, as held by SchoolCorpus
+
+Memory is measured with tracemalloc as the net allocation still held once
+the raw query rows are gone; latency is the time to turn top_k positions
+into result dicts:
+
+    python benchmark_section_store.py --sections 5000 --top-k 3
+"""
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from section_store import SectionStore
+
+CATEGORIES = ['Academic Policies', 'Student Conduct', 'Administrative', 'Student Services',
+              'Campus Life', 'General Information', 'Miscellaneous']
+GROUPS = ['introduction', 'academics', 'student_life', 'administration', 'policies', 'general']
+WORDS = ("the student university policy must all of and to in academic integrity residence hall "
+         "guests semester course registration office financial aid conduct violations appeal").split()
+
+
+def fresh(value):
+    """A new str object with the same value (the connector never shares them across rows)."""
+    return ''.join(list(value))
+
+
+def query_rows(count, content_chars, seed=0):
+    """Fresh row objects per call, as the connector returns them."""
+    rng = random.Random(seed)
+    titles = [f"Section {i}: {' '.join(rng.choice(WORDS) for _ in range(4)).title()}" for i in range(count // 8 + 1)]
+    rows = []
+    for i in range(count):
+        content = ' '.join(rng.choice(WORDS) for _ in range(content_chars // 7))[:content_chars]
+        rows.append({
+            'SECTION_ID': f"{i:08x}-{rng.getrandbits(64):016x}",
+            'SECTION_TITLE': fresh(rng.choice(titles)),
+            'CATEGORY': fresh(rng.choice(CATEGORIES)),
+            'SECTION_GROUP': fresh(rng.choice(GROUPS)),
+            'CONTENT': content,
+            'EXCERPT': content[:200] + '...',
+            'TOPICS': json.dumps(rng.sample(WORDS, 3)),
+            'TAGS': json.dumps(rng.sample(WORDS, 4)),
+            'HANDBOOK_TITLE': fresh('Student Handbook'),
+            'ACADEMIC_YEAR': fresh('2024-2025'),
+            'SCHOOL_NAME': fresh('Example University'),
+        })
+    return rows
+
+
+def load_frame(rows):
+    frame = pd.DataFrame(rows)
+    frame['searchable_text'] = (frame['SECTION_TITLE'].fillna('') + ' ' +
+                                frame['CONTENT'].fillna('') + ' ' + frame['CATEGORY'].fillna(''))
+    return frame
+
+
+def measure(build, count, content_chars):
+    """Bytes still allocated by build(rows) once the raw rows are released."""
+    gc.collect()
+    tracemalloc.start()
+    rows = query_rows(count, content_chars)
+    held = build(rows)
+    del rows
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return held, current
+
+
+def frame_results(frame, positions, scores):
+    results = []
+    for idx, score in zip(positions, scores):
+        section = frame.iloc[idx]
+        results.append({
+            'title': section['SECTION_TITLE'],
+            'category': section['CATEGORY'],
+            'content': section['CONTENT'],
+            'excerpt': section['EXCERPT'],
+            'similarity': float(score),
+            'section_id': section['SECTION_ID'],
+            'school_name': section['SCHOOL_NAME'],
+            'handbook_title': section['HANDBOOK_TITLE'],
+            'academic_year': section['ACADEMIC_YEAR']
+        })
+    return results
+
+
+def store_results(store, positions, scores):
+    results = store.records(positions)
+    for result, score in zip(results, scores):
+        result['similarity'] = float(score)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sections', type=int, default=5000)
+    parser.add_argument('--content-chars', type=int, default=1500)
+    parser.add_argument('--top-k', type=int, default=3)
+    parser.add_argument('--queries', type=int, default=2000)
+    args = parser.parse_args()
+
+    frame, frame_bytes = measure(load_frame, args.sections, args.content_chars)
+    store, store_bytes = measure(lambda rows: SectionStore.from_frame(load_frame(rows)),
+                                 args.sections, args.content_chars)
+
+    rng = np.random.default_rng(0)
+    queries = [(rng.choice(args.sections, args.top_k, replace=False), rng.random(args.top_k, dtype=np.float32))
+               for _ in range(args.queries)]
+    for positions, scores in queries[:20]:
+        expected = frame_results(frame, positions, scores)
+        got = store_results(store, positions, scores)
+        assert all(got_row[key] == row[key] for got_row, row in zip(got, expected) for key in row)
+
+    print(f"{args.sections} sections, {args.content_chars} chars of content each, top_k={args.top_k}\n")
+    print(f"{'':<12}{'memory MB':>12}{'us/query':>12}")
+    for name, held, nbytes, fn in (('dataframe', frame, frame_bytes, frame_results),
+                                   ('store', store, store_bytes, store_results)):
+        start = time.perf_counter()
+        for positions, scores in queries:
+            fn(held, positions, scores)
+        per_query = (time.perf_counter() - start) / len(queries) * 1e6
+        print(f"{name:<12}{nbytes / 1e6:>12.1f}{per_query:>12.1f}")
+    print(f"\nSectionStore.nbytes estimate: {store.nbytes / 1e6:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark the vector index options against the original brute-force search.
+
+Uses synthetic clustered vectors shaped like all-MiniLM-L6-v2 embeddings, so it
+runs without Snowflake or the embedding model:
+
+    python benchmark_vector_index.py --sections 20000 --queries 200
+"""
+import argparse
+import time
+
+import numpy as np
+
+from vector_index import FlatIndex, IVFIndex
+
+
+def brute_force_search(question_embedding, embeddings, top_k):
+    """The pre-index search path: normalize everything per query, full argsort."""
+    a_norm = question_embedding / np.linalg.norm(question_embedding, axis=1, keepdims=True)
+    b_norm = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    similarities = np.dot(a_norm, b_norm.T)[0]
+    return np.argsort(similarities)[-top_k:][::-1]
+
+
+def make_corpus(n, dim, clusters, noise, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    labels = rng.integers(clusters, size=n)
+    return (centers[labels] + noise * rng.normal(size=(n, dim))).astype(np.float32), centers
+
+
+def time_queries(fn, queries):
+    start = time.perf_counter()
+    results = [fn(q) for q in queries]
+    return results, (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def recall(results, truth):
+    hits = sum(len(set(r) & set(t)) for r, t in zip(results, truth))
+    return hits / sum(len(t) for t in truth)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sections', type=int, default=20000)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--clusters', type=int, default=200)
+    parser.add_argument('--noise', type=float, default=1.2, help='spread of sections around topic centers')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=3)
+    parser.add_argument('--nlist', type=int, default=None)
+    args = parser.parse_args()
+
+    corpus, centers = make_corpus(args.sections, args.dim, args.clusters, args.noise)
+    rng = np.random.default_rng(1)
+    queries = (centers[rng.integers(args.clusters, size=args.queries)]
+               + args.noise * rng.normal(size=(args.queries, args.dim))).astype(np.float32)
+
+    truth, brute_ms = time_queries(lambda q: brute_force_search(q[None, :], corpus, args.top_k), queries)
+    print(f"{args.sections} sections, dim {args.dim}, top_k {args.top_k}, {args.queries} queries\n")
+    print(f"{'method':<22}{'build ms':>10}{'query ms':>10}{'recall':>8}")
+    print(f"{'brute force':<22}{'-':>10}{brute_ms:>10.3f}{1.0:>8.3f}")
+
+    start = time.perf_counter()
+    flat = FlatIndex().build(corpus)
+    build_ms = (time.perf_counter() - start) * 1000
+    results, query_ms = time_queries(lambda q: flat.search(q, args.top_k)[0], queries)
+    print(f"{'flat':<22}{build_ms:>10.1f}{query_ms:>10.3f}{recall(results, truth):>8.3f}")
+
+    start = time.perf_counter()
+    ivf = IVFIndex(nlist=args.nlist).build(corpus)
+    build_ms = (time.perf_counter() - start) * 1000
+    for nprobe in (1, 2, 4, 8, 16, 32):
+        if nprobe > len(ivf.centroids):
+            break
+        ivf.nprobe = nprobe
+        results, query_ms = time_queries(lambda q: ivf.search(q, args.top_k)[0], queries)
+        label = f"ivf nlist={len(ivf.centroids)} np={nprobe}"
+        print(f"{label:<22}{build_ms:>10.1f}{query_ms:>10.3f}{recall(results, truth):>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
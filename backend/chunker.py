@@ -0,0 +1,183 @@
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+PAGE_NUMBER_LINE = re.compile(r'^(Page\s+)?\d+(\s+of\s+\d+)?$', re.IGNORECASE)
+SENTENCE_BREAK = re.compile(r'(?<=[.!?;:])\s+(?=\S)')
+WORD = re.compile(r'\S+')
+# Storage only loads sections with LENGTH(content) > 50, so shorter chunks are merged into a neighbour
+MIN_CHUNK_CHARS = 51
+HEADING_PATTERNS = (
+    re.compile(r'^\d+(\.\d+)*\.?\s+[A-Z]'),
+    re.compile(r'^(Chapter|Section|Article|Part)\s+[\dIVXLC]+', re.IGNORECASE),
+)
+
+
+def chunking_enabled() -> bool:
+    return os.getenv('SECTION_CHUNKING', 'false').lower() in ('1', 'true', 'yes')
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough subword count for English prose (about 4 tokens per 3 words)."""
+    return (len(text.split()) * 4 + 2) // 3
+
+
+class SectionChunker:
+    """Splits a page into overlapping, heading-aware chunks of roughly target_tokens.
+
+    The page's raw text (which still has its line breaks) is read as
+    headings and paragraphs. A heading always starts a new chunk and is
+    remembered as the chunk's title; paragraphs longer than the target are
+    split at sentence boundaries. Consecutive chunks share up to
+    overlap_tokens of trailing sentences so an answer that straddles a
+    boundary is still retrievable from one chunk.
+
+    Offsets are character positions in the page's raw text (what is stored
+    as the page's raw_text): char_start is where the chunk's first word
+    starts and char_end where its last word ends. Chunks shorter than
+    MIN_CHUNK_CHARS are merged into the previous chunk (or, on the first
+    chunk, the next one) so none is written only to be filtered out on load.
+    """
+
+    def __init__(self, target_tokens: int = 180, overlap_tokens: int = 40, min_tokens: int = 30):
+        self.target_tokens = target_tokens
+        self.overlap_tokens = min(overlap_tokens, target_tokens // 2)
+        self.min_tokens = min_tokens
+
+    @classmethod
+    def from_env(cls) -> 'SectionChunker':
+        return cls(target_tokens=int(os.getenv('CHUNK_TARGET_TOKENS', '180')),
+                   overlap_tokens=int(os.getenv('CHUNK_OVERLAP_TOKENS', '40')),
+                   min_tokens=int(os.getenv('CHUNK_MIN_TOKENS', '30')))
+
+    def is_heading(self, line: str) -> bool:
+        if not line or len(line) >= 100 or line.endswith(('.', ',', ';')):
+            return False
+        letters = [c for c in line if c.isalpha()]
+        if len(letters) >= 4 and all(c.isupper() for c in letters):
+            return True
+        return any(pattern.match(line) for pattern in HEADING_PATTERNS)
+
+    def blocks(self, raw_text: str) -> List[Dict]:
+        """Headings and paragraphs of a page, whitespace-normalized, without page-number lines.
+
+        Each block also has "spans": the (start, end) position in raw_text of each of its words.
+        """
+        blocks = []
+        paragraph = []
+        paragraph_spans = []
+
+        def flush():
+            if paragraph:
+                blocks.append({"heading": False, "text": ' '.join(paragraph), "spans": list(paragraph_spans)})
+                paragraph.clear()
+                paragraph_spans.clear()
+
+        line_start = 0
+        for raw_line in raw_text.split('\n'):
+            spans = [(line_start + match.start(), line_start + match.end()) for match in WORD.finditer(raw_line)]
+            line_start += len(raw_line) + 1
+            line = ' '.join(raw_line.split())
+            if PAGE_NUMBER_LINE.match(line):
+                continue
+            if not line:
+                flush()
+            elif self.is_heading(line):
+                flush()
+                blocks.append({"heading": True, "text": line, "spans": spans})
+            else:
+                paragraph.append(line)
+                paragraph_spans.extend(spans)
+        flush()
+        return blocks
+
+    def units(self, text: str) -> List[str]:
+        """Sentences of a paragraph, with over-long sentences split by words."""
+        if estimate_tokens(text) <= self.target_tokens:
+            return [text]
+        units = []
+        max_words = max(1, self.target_tokens * 3 // 4)
+        for sentence in SENTENCE_BREAK.split(text):
+            words = sentence.split()
+            for start in range(0, len(words), max_words):
+                units.append(' '.join(words[start:start + max_words]))
+        return units
+
+    def chunk(self, raw_text: str) -> List[Dict]:
+        """Return chunks as dicts with text, heading, char_start and char_end."""
+        # (text, heading in effect, raw spans of its words, is_heading) for every piece of the page
+        pieces = []
+        heading: Optional[str] = None
+        for block in self.blocks(raw_text):
+            if block["heading"]:
+                heading = block["text"]
+                parts = [block["text"]]
+            else:
+                parts = self.units(block["text"])
+            # units() only re-splits at whitespace, so words line up with the block's spans
+            word = 0
+            for part in parts:
+                count = len(part.split())
+                pieces.append((part, heading, block["spans"][word:word + count], block["heading"]))
+                word += count
+
+        # Each chunk as (its pieces, how many of them are overlap carried from the previous chunk)
+        groups = []
+        current = []
+        carried_count = 0
+        tokens = 0
+
+        for piece in pieces:
+            piece_tokens = estimate_tokens(piece[0])
+            starts_section = piece[3] and tokens >= self.min_tokens
+            if piece[3] and len(current) == carried_count:
+                # Overlap from the previous section doesn't belong under a new heading
+                current, tokens, carried_count = [], 0, 0
+            if len(current) > carried_count and (starts_section or tokens + piece_tokens > self.target_tokens):
+                groups.append((current, carried_count))
+                carried = []
+                carried_tokens = 0
+                if not starts_section:
+                    # Carry trailing sentences (never a heading) into the next chunk
+                    for previous in reversed(current):
+                        cost = estimate_tokens(previous[0])
+                        if previous[3] or carried_tokens + cost > self.overlap_tokens:
+                            break
+                        carried.insert(0, previous)
+                        carried_tokens += cost
+                current, tokens, carried_count = carried, carried_tokens, len(carried)
+            current.append(piece)
+            tokens += piece_tokens
+
+        if len(current) > carried_count:
+            groups.append((current, carried_count))
+        return [self.chunk_record(group, carried) for group, carried in self.merge_short(groups)]
+
+    def merge_short(self, groups: List[Tuple[List[tuple], int]]) -> List[Tuple[List[tuple], int]]:
+        """Fold chunks shorter than MIN_CHUNK_CHARS into a neighbouring chunk."""
+        merged = []
+        for group, carried in groups:
+            if merged and len(self.text_of(group)) < MIN_CHUNK_CHARS:
+                previous, previous_carried = merged[-1]
+                merged[-1] = (previous + group[carried:], previous_carried)
+            elif merged and len(self.text_of(merged[-1][0])) < MIN_CHUNK_CHARS:
+                # A short first chunk: the next one already starts with its carried tail
+                previous, previous_carried = merged[-1]
+                merged[-1] = (previous[:len(previous) - carried] + group, previous_carried)
+            else:
+                merged.append((group, carried))
+        return merged
+
+    @staticmethod
+    def text_of(group: List[tuple]) -> str:
+        return ' '.join(piece[0] for piece in group)
+
+    def chunk_record(self, group: List[tuple], carried: int) -> Dict:
+        spans = [span for piece in group for span in piece[2]]
+        return {
+            "text": self.text_of(group),
+            # Title in effect where this chunk's own (non-overlap) text begins
+            "heading": group[carried][1],
+            "char_start": spans[0][0],
+            "char_end": spans[-1][1],
+        }
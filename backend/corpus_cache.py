@@ -0,0 +1,123 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from lexical_index import BM25Index
+from section_store import SectionStore
+
+logger = logging.getLogger(__name__)
+
+
+class SchoolCorpus:
+    """Everything retrieval needs for one school: section rows, vectors and indexes."""
+
+    __slots__ = ('data', 'embeddings', 'index', 'lexical', 'nbytes')
+
+    def __init__(self, data: SectionStore, embeddings: np.ndarray, index, lexical: Optional[BM25Index] = None):
+        self.data = data
+        self.embeddings = embeddings
+        self.index = index
+        self.lexical = lexical
+        self.nbytes = corpus_nbytes(data, embeddings, index, lexical)
+
+    def __len__(self):
+        return len(self.data)
+
+
+def corpus_nbytes(data: SectionStore, embeddings: np.ndarray, index, lexical: Optional[BM25Index] = None) -> int:
+    """Approximate resident size: section rows (including strings), matrix and index arrays."""
+    size = data.nbytes + embeddings.nbytes + (lexical.nbytes if lexical is not None else 0)
+    for value in vars(index).values():
+        # A flat index shares the embedding matrix; don't count it twice
+        if isinstance(value, np.ndarray) and value is not embeddings:
+            size += value.nbytes
+    return size
+
+
+class CorpusCache:
+    """LRU cache of per-school corpora under a byte budget.
+
+    Loading a school beyond ``max_bytes`` evicts the least recently queried
+    schools until the total fits again; an evicted school is simply reloaded
+    (from the precomputed vectors) the next time somebody asks about it. A
+    single school larger than the whole budget is still kept, on its own.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        if max_bytes is None:
+            # Leaves room for the model and the app on the deployed 1 GB VM (fly.toml)
+            max_bytes = int(float(os.getenv('CORPUS_CACHE_MAX_MB', '256')) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, SchoolCorpus]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "loads": 0}
+
+    def __contains__(self, school_id: str) -> bool:
+        with self._lock:
+            return school_id in self._entries
+
+    def get(self, school_id: str) -> Optional[SchoolCorpus]:
+        """Return a cached corpus and mark it most recently used, or None."""
+        with self._lock:
+            corpus = self._entries.get(school_id)
+            if corpus is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(school_id)
+            self._stats["hits"] += 1
+            return corpus
+
+    def peek(self, school_id: str) -> Optional[SchoolCorpus]:
+        """Cached corpus without touching recency or the hit/miss counters."""
+        with self._lock:
+            return self._entries.get(school_id)
+
+    def put(self, school_id: str, corpus: SchoolCorpus):
+        """Insert or replace a school's corpus, evicting others to stay within budget."""
+        evicted = []
+        with self._lock:
+            previous = self._entries.pop(school_id, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+            else:
+                self._stats["loads"] += 1
+            self._entries[school_id] = corpus
+            self._bytes += corpus.nbytes
+
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                victim_id, victim = self._entries.popitem(last=False)
+                self._bytes -= victim.nbytes
+                self._stats["evictions"] += 1
+                evicted.append(victim_id)
+
+        for victim_id in evicted:
+            logger.info(f"Evicted corpus for {victim_id} to stay within {self.max_bytes} bytes")
+        if corpus.nbytes > self.max_bytes:
+            logger.warning(f"Corpus for {school_id} ({corpus.nbytes} bytes) exceeds the cache budget on its own")
+
+    def discard(self, school_id: str):
+        with self._lock:
+            corpus = self._entries.pop(school_id, None)
+            if corpus is not None:
+                self._bytes -= corpus.nbytes
+
+    def schools(self) -> List[str]:
+        with self._lock:
+            return list(self._entries)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": self._stats["hits"] / lookups if lookups else 0.0,
+                "schools": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "per_school_bytes": {school_id: corpus.nbytes for school_id, corpus in self._entries.items()},
+            }
@@ -0,0 +1,284 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(__file__), '.embedding_cache')
+
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+EMBEDDING_DIMENSION = 384
+
+
+def searchable_text(title: Optional[str], content: Optional[str], category: Optional[str]) -> str:
+    """Text that gets embedded for a section (title, content and category)."""
+    return f"{title or ''} {content or ''} {category or ''}"
+
+
+def embeddings_in_db() -> bool:
+    """Whether section vectors are also stored in handbook_sections.embedding."""
+    return os.getenv('STORE_SECTION_EMBEDDINGS', 'false').lower() in ('1', 'true', 'yes')
+
+
+def parse_vector(value) -> Optional[np.ndarray]:
+    """Convert a VECTOR/ARRAY value from the connector (list or JSON text) to float32."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = json.loads(value)
+    elif isinstance(value, bytes):
+        # Embedded storage keeps vectors as float32 blobs
+        return np.frombuffer(value, dtype=np.float32)
+    try:
+        vector = np.asarray(value, dtype=np.float32)
+    except (TypeError, ValueError):
+        return None
+    # A NULL can reach us as NaN once it has been through a DataFrame
+    return vector if vector.ndim == 1 else None
+
+
+class EmbeddingCache:
+    """On-disk store of section embeddings keyed by model name and text hash.
+
+    Vectors are kept as float32 ``.npy`` shards that are memory-mapped on read,
+    with a small JSON index mapping ``sha256(text)`` to ``(shard, row)``. Each
+    call to :meth:`encode` only sends texts that are not already in the store
+    to the model and appends them as a new shard.
+
+    Once there are more than ``max_shards`` shards (EMBEDDING_CACHE_MAX_SHARDS)
+    they are compacted into one, keeping the newest ``max_vectors``
+    (EMBEDDING_CACHE_MAX_VECTORS) so vectors of edited or deleted sections
+    age out. At most ``max_open_shards`` memory maps are kept open.
+    """
+
+    INDEX_FILE = 'index.json'
+    # Unindexed shards younger than this may belong to a put_many still in progress elsewhere
+    ORPHAN_GRACE_SECONDS = 3600
+
+    def __init__(self, model_name: str, cache_dir: Optional[str] = None,
+                 max_shards: Optional[int] = None,
+                 max_vectors: Optional[int] = None,
+                 max_open_shards: Optional[int] = None):
+        self.model_name = model_name
+        root = cache_dir or os.getenv('EMBEDDING_CACHE_DIR') or DEFAULT_CACHE_DIR
+        safe_name = re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)
+        self.directory = os.path.join(root, safe_name)
+        self.max_shards = max_shards or int(os.getenv('EMBEDDING_CACHE_MAX_SHARDS', '32'))
+        self.max_vectors = max_vectors or int(os.getenv('EMBEDDING_CACHE_MAX_VECTORS', '200000'))
+        self.max_open_shards = max_open_shards or int(os.getenv('EMBEDDING_CACHE_MAX_OPEN_SHARDS', '16'))
+        self.index: Dict[str, Tuple[str, int]] = {}
+        # (mtime, size, inode) of index.json when we last read or wrote it; refresh skips the re-read while it matches
+        self._index_version: Optional[Tuple[int, int, int]] = None
+        self._shards: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"compactions": 0, "dropped_vectors": 0}
+        self._load_index()
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        """Content hash used as the cache key for a section's searchable text."""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, self.INDEX_FILE)
+
+    def _index_file_version(self) -> Optional[Tuple[int, int, int]]:
+        # Every write replaces the file, so the inode changes even when two writes share an mtime tick
+        try:
+            stat = os.stat(self._index_path())
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _read_index_file(self) -> Dict[str, Tuple[str, int]]:
+        try:
+            with open(self._index_path(), 'r') as f:
+                return {key: (shard, row) for key, (shard, row) in json.load(f).items()}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable embedding index {self._index_path()}: {e}")
+            return {}
+
+    def _load_index(self):
+        self._index_version = self._index_file_version()
+        self.index = self._read_index_file()
+        if self.index:
+            logger.info(f"Loaded embedding cache index with {len(self.index)} vectors for {self.model_name}")
+
+    def _write_index_file(self, index: Dict[str, Tuple[str, int]]):
+        tmp_path = f"{self._index_path()}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self._index_path())
+        self._index_version = self._index_file_version()
+
+    def _merged_index(self) -> Dict[str, Tuple[str, int]]:
+        """Our entries updated with the on-disk index, minus entries whose shard was compacted away."""
+        merged = dict(self.index)
+        merged.update(self._read_index_file())
+        live = {name for name in {shard for shard, _ in merged.values()}
+                if os.path.exists(os.path.join(self.directory, name))}
+        return {key: location for key, location in merged.items() if location[0] in live}
+
+    def refresh(self):
+        """Pick up vectors written by other processes (e.g. the ingest job); a no-op while index.json is unchanged."""
+        version = self._index_file_version()
+        with self._lock:
+            if version == self._index_version:
+                return
+            # Taken before the read, so a write that lands during it is picked up next time
+            self._index_version = version
+            self.index = self._merged_index()
+
+    def _shard(self, name: str) -> np.ndarray:
+        with self._lock:
+            shard = self._shards.get(name)
+            if shard is not None:
+                self._shards.move_to_end(name)
+                return shard
+        shard = np.load(os.path.join(self.directory, name), mmap_mode='r')
+        with self._lock:
+            self._shards[name] = shard
+            # Each map holds a file descriptor; rows handed out are copies, so closing is safe
+            while len(self._shards) > self.max_open_shards:
+                self._shards.popitem(last=False)
+        return shard
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Return the cached vector for a content hash, or None."""
+        with self._lock:
+            location = self.index.get(key)
+        if location is None:
+            return None
+        shard_name, row = location
+        try:
+            return np.array(self._shard(shard_name)[row])
+        except Exception as e:
+            logger.warning(f"Dropping cache entry with unreadable shard {shard_name}: {e}")
+            with self._lock:
+                # A concurrent put_many may already have pointed the key at a new shard
+                if self.index.get(key) == location:
+                    del self.index[key]
+            return None
+
+    def put_many(self, keys: List[str], vectors: np.ndarray):
+        """Persist new vectors as a single shard and merge them into the index."""
+        if not keys:
+            return
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        os.makedirs(self.directory, exist_ok=True)
+        shard_name = f"shard_{uuid.uuid4().hex}.npy"
+        np.save(os.path.join(self.directory, shard_name), vectors)
+
+        with self._lock:
+            # Merge with whatever other workers have written since we loaded
+            merged = self._merged_index()
+            for key in keys:
+                # Re-added keys move to the newest end, so compaction keeps them
+                merged.pop(key, None)
+            for row, key in enumerate(keys):
+                merged[key] = (shard_name, row)
+            stale_shards = []
+            if len({shard for shard, _ in merged.values()}) > self.max_shards:
+                merged, stale_shards = self._compact(merged)
+            self._write_index_file(merged)
+            self.index = merged
+            for name in stale_shards:
+                self._shards.pop(name, None)
+        self._remove_shards(stale_shards)
+
+    def _compact(self, index: Dict[str, Tuple[str, int]]) -> Tuple[Dict[str, Tuple[str, int]], List[str]]:
+        """Rewrite the newest max_vectors entries as one shard; returns the new index and the shards it replaces."""
+        keys = list(index)[-self.max_vectors:]
+        by_shard: Dict[str, List[int]] = {}
+        for position, key in enumerate(keys):
+            by_shard.setdefault(index[key][0], []).append(position)
+
+        vectors = None
+        kept = np.ones(len(keys), dtype=bool)
+        for name, positions in by_shard.items():
+            # Read each shard once, without keeping a map of it open
+            try:
+                shard = np.load(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                # Another worker compacted it away after we merged the index; its keys get re-encoded
+                logger.warning(f"Embedding cache shard {name} vanished during compaction; dropping its entries")
+                kept[positions] = False
+                continue
+            if vectors is None:
+                vectors = np.empty((len(keys), shard.shape[1]), dtype=np.float32)
+            vectors[positions] = shard[[index[keys[position]][1] for position in positions]]
+
+        stale_shards = sorted({shard for shard, _ in index.values()})
+        keys = [key for key, keep in zip(keys, kept) if keep]
+        self._stats["compactions"] += 1
+        self._stats["dropped_vectors"] += len(index) - len(keys)
+        if not keys:
+            return {}, stale_shards
+        shard_name = f"shard_{uuid.uuid4().hex}.npy"
+        np.save(os.path.join(self.directory, shard_name), vectors[kept])
+        logger.info(f"Compacted embedding cache: {len(by_shard)} shards -> 1, "
+                    f"{len(keys)} vectors kept, {len(index) - len(keys)} dropped")
+        return {key: (shard_name, row) for row, key in enumerate(keys)}, stale_shards
+
+    def _remove_shards(self, names: List[str]):
+        """Delete compacted shards, plus old shards no index refers to (left by an interrupted put)."""
+        names = set(names)
+        if names:
+            referenced = {shard for shard, _ in self.index.values()}
+            cutoff = time.time() - self.ORPHAN_GRACE_SECONDS
+            for entry in os.scandir(self.directory):
+                if (entry.name.startswith('shard_') and entry.name not in referenced
+                        and entry.stat().st_mtime < cutoff):
+                    names.add(entry.name)
+        for name in names:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self._stats,
+                "vectors": len(self.index),
+                "shards": len({shard for shard, _ in self.index.values()}),
+                "open_shards": len(self._shards),
+            }
+
+    def encode(self, model, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        """Return float32 embeddings for texts, encoding only cache misses."""
+        keys = [self.hash_text(text) for text in texts]
+        cached = [self.get(key) for key in keys]
+        if any(vector is None for vector in cached):
+            self.refresh()
+            cached = [vector if vector is not None else self.get(key) for key, vector in zip(keys, cached)]
+
+        missing = {}
+        for i, (key, vector) in enumerate(zip(keys, cached)):
+            if vector is None:
+                missing.setdefault(key, []).append(i)
+
+        if missing:
+            miss_keys = list(missing.keys())
+            miss_texts = [texts[missing[key][0]] for key in miss_keys]
+            logger.info(f"Encoding {len(miss_texts)} of {len(texts)} sections ({len(texts) - sum(len(v) for v in missing.values())} cached)")
+            encoded = np.asarray(model.encode(miss_texts, batch_size=batch_size), dtype=np.float32)
+            self.put_many(miss_keys, encoded)
+            for key, vector in zip(miss_keys, encoded):
+                for i in missing[key]:
+                    cached[i] = vector
+
+        if not cached:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.vstack(cached).astype(np.float32, copy=False)
@@ -1,16 +1,21 @@
 import fitz  # PyMuPDF
 import uuid
 import pandas as pd
-import json
 import re
+import time
 import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from typing import Dict, List, Optional, Callable
 from datetime import datetime
-import snowflake.connector
-from pathlib import Path
 import os
 from dotenv import load_dotenv
 
+from chunker import SectionChunker, chunking_enabled
+from embedding_cache import EMBEDDING_MODEL_NAME, EmbeddingCache, embeddings_in_db, searchable_text
+from keyword_matcher import KeywordMatcher
+from storage import HandbookRepository, get_storage
+
 # Load environment variables from parent directory
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
 
@@ -19,34 +24,21 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class HandbookProcessor:
-    def __init__(self):
-        """Initialize the handbook processor with Snowflake connection."""
-        self.snowflake_config = {
-            'user': os.getenv('SNOWFLAKE_USER'),
-            'password': os.getenv('SNOWFLAKE_PASSWORD'),
-            'account': os.getenv('SNOWFLAKE_ACCOUNT'),
-            'warehouse': os.getenv('SNOWFLAKE_WAREHOUSE'),
-            'database': os.getenv('SNOWFLAKE_DATABASE'),
-            'schema': os.getenv('SNOWFLAKE_SCHEMA')
-        }
-        self.connection = None
+    def __init__(self, embedding_model=None, embedding_cache: Optional[EmbeddingCache] = None,
+                 storage: Optional[HandbookRepository] = None):
+        """Initialize the handbook processor; writes go through the configured storage backend.
+        
+        embedding_model / embedding_cache let a caller that already holds the
+        sentence transformer (e.g. RAGService) share it instead of loading another copy.
+        """
+        # Resolved on first write, so page-extraction workers never open storage
+        self.storage = storage
+        self.keyword_matcher = KeywordMatcher()
+        self.embedding_model = embedding_model
+        self.embedding_cache = embedding_cache
+        # Sub-page sections (SECTION_CHUNKING); None keeps one section per page
+        self.chunker = SectionChunker.from_env() if chunking_enabled() else None
         
-    def connect_to_snowflake(self):
-        """Establish connection to Snowflake."""
-        try:
-            self.connection = snowflake.connector.connect(**self.snowflake_config)
-            logger.info("Successfully connected to Snowflake")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to connect to Snowflake: {str(e)}")
-            return False
-    
-    def close_connection(self):
-        """Close Snowflake connection."""
-        if self.connection:
-            self.connection.close()
-            logger.info("Snowflake connection closed")
-    
     def clean_text(self, text: str) -> str:
         """Enhanced text cleaning."""
         if not text:
@@ -79,66 +71,11 @@ class HandbookProcessor:
     
     def extract_enhanced_tags(self, text: str) -> List[str]:
         """Enhanced tag extraction with more comprehensive categories."""
-        tags = []
-        text_lower = text.lower()
-        
-        # Academic tags
-        academic_keywords = {
-            'academic_integrity': ['integrity', 'plagiarism', 'cheating', 'honor code'],
-            'examination': ['exam', 'test', 'quiz', 'assessment', 'midterm', 'final'],
-            'grading': ['grade', 'gpa', 'transcript', 'credit', 'pass', 'fail'],
-            'registration': ['registration', 'enrollment', 'course selection', 'add/drop'],
-            'graduation': ['graduation', 'commencement', 'degree', 'diploma'],
-        }
-        
-        # Student life tags
-        student_life_keywords = {
-            'conduct': ['conduct', 'behavior', 'discipline', 'violation'],
-            'housing': ['housing', 'dormitory', 'residence', 'accommodation'],
-            'dining': ['dining', 'meal', 'cafeteria', 'food service'],
-            'health': ['health', 'medical', 'counseling', 'wellness'],
-            'activities': ['club', 'organization', 'event', 'activity'],
-        }
-        
-        # Administrative tags
-        admin_keywords = {
-            'financial': ['tuition', 'fee', 'scholarship', 'financial aid', 'payment'],
-            'policy': ['policy', 'procedure', 'rule', 'regulation'],
-            'appeals': ['appeal', 'grievance', 'complaint', 'petition'],
-            'calendar': ['calendar', 'semester', 'session', 'holiday', 'break'],
-        }
-        
-        all_keywords = {**academic_keywords, **student_life_keywords, **admin_keywords}
-        
-        for tag, keywords in all_keywords.items():
-            if any(keyword in text_lower for keyword in keywords):
-                tags.append(tag)
-        
-        # Always add general tags
-        if 'student' in text_lower:
-            tags.append('student_focused')
-        
-        return list(set(tags))
+        return self.keyword_matcher.tags(text)
     
     def categorize_content(self, text: str, section_title: str = None) -> str:
         """Categorize content based on text analysis."""
-        text_lower = text.lower()
-        title_lower = (section_title or "").lower()
-        
-        categories = {
-            'Academic Policies': ['academic', 'course', 'grade', 'exam', 'credit'],
-            'Student Conduct': ['conduct', 'behavior', 'discipline', 'violation'],
-            'Administrative': ['registration', 'fee', 'tuition', 'administrative'],
-            'Student Services': ['health', 'counseling', 'support', 'service'],
-            'Campus Life': ['housing', 'dining', 'activity', 'club', 'event'],
-            'General Information': ['welcome', 'introduction', 'overview', 'general']
-        }
-        
-        for category, keywords in categories.items():
-            if any(keyword in text_lower or keyword in title_lower for keyword in keywords):
-                return category
-        
-        return 'Miscellaneous'
+        return self.keyword_matcher.category(text, section_title)
     
     def extract_table_of_contents(self, doc) -> Dict[str, int]:
         """Extract table of contents if available."""
@@ -154,14 +91,152 @@ class HandbookProcessor:
         
         return toc
     
+    def extract_page(self, page_num: int, raw_text: str) -> Optional[Dict]:
+        """Per-page extraction work that does not depend on earlier pages."""
+        cleaned_text = self.clean_text(raw_text)
+        
+        if not cleaned_text.strip():
+            return None
+        
+        # Tags and text-matched categories come from one keyword pass
+        analysis = self.keyword_matcher.analyze(cleaned_text)
+        
+        record = {
+            "page_num": page_num,
+            "raw_text": raw_text,
+            "cleaned_text": cleaned_text,
+            "detected_title": self.detect_section_title(raw_text),
+            "tags": analysis["tags"],
+            "text_category": analysis["text_category"],
+            "excerpt": self.generate_excerpt(cleaned_text)
+        }
+        
+        if self.chunker is not None:
+            chunks = self.chunker.chunk(raw_text)
+            for chunk in chunks:
+                chunk_analysis = self.keyword_matcher.analyze(chunk["text"])
+                chunk["tags"] = chunk_analysis["tags"]
+                chunk["text_category"] = chunk_analysis["text_category"]
+                chunk["excerpt"] = self.generate_excerpt(chunk["text"])
+            record["chunks"] = chunks
+        return record
+    
+    def extract_pages(self, pdf_path: str, total_pages: int, workers: int = 1,
+                      progress_callback: Optional[Callable] = None) -> List[Dict]:
+        """Extract all non-empty pages, in page order, optionally across worker processes."""
+        # Spawning workers costs seconds, so small documents stay in-process
+        min_pages = int(os.getenv('PDF_PARALLEL_MIN_PAGES', '100'))
+        if workers <= 1 or total_pages < max(2, min_pages):
+            pages = []
+            doc = fitz.open(pdf_path)
+            try:
+                for page_num, page in enumerate(doc, start=1):
+                    if progress_callback:
+                        progress = 10 + (page_num / total_pages) * 70
+                        progress_callback(progress, f"Processing page {page_num}/{total_pages}")
+                    record = self.extract_page(page_num, page.get_text())
+                    if record:
+                        pages.append(record)
+            finally:
+                doc.close()
+            return pages
+        
+        # Several small shards per worker keep the pool busy when pages vary in cost
+        shard_size = max(1, -(-total_pages // (workers * 4)))
+        ranges = [(start, min(start + shard_size, total_pages))
+                  for start in range(0, total_pages, shard_size)]
+        
+        results = {}
+        pages_done = 0
+        # spawn avoids forking a process that already runs threads (uvicorn, torch)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = {pool.submit(_extract_page_range, pdf_path, start, end): (start, end)
+                       for start, end in ranges}
+            for future in as_completed(futures):
+                start, end = futures[future]
+                results[start] = future.result()
+                pages_done += end - start
+                if progress_callback:
+                    progress = 10 + (pages_done / total_pages) * 70
+                    progress_callback(progress, f"Processed {pages_done}/{total_pages} pages with {workers} workers")
+        
+        return [record for start in sorted(results) for record in results[start]]
+    
+    def build_sections(self, pages: List[Dict], handbook_id: str, toc: Dict[str, int]) -> List[Dict]:
+        """Turn extracted pages into section records, carrying section titles forward in page order.
+        
+        Pages extracted with a chunker yield one section per chunk, keyed
+        sec_<page>_<chunk> with chunk_index/char_start/char_end pointing back
+        into the page's raw text. That text is stored once per page, as the
+        raw_text of its chunk 0. Otherwise each page is one section.
+        """
+        sections = []
+        current_section_title = None
+        current_section_group = "introduction"
+        
+        for page in pages:
+            page_num = page["page_num"]
+            
+            # Try to detect section title
+            detected_title = page["detected_title"]
+            if detected_title:
+                current_section_title = detected_title
+                # Update section group based on TOC or title
+                current_section_group = self.determine_section_group(detected_title, toc)
+            
+            if "chunks" not in page:
+                sections.append(self.section_record(
+                    handbook_id, page_num, f"sec_{page_num:03d}",
+                    current_section_title or f"Page {page_num}", current_section_group,
+                    page["cleaned_text"], page["raw_text"], page["excerpt"], page["tags"], page["text_category"]))
+                continue
+            
+            for index, chunk in enumerate(page["chunks"]):
+                if chunk["heading"] and chunk["heading"] != current_section_title:
+                    current_section_title = chunk["heading"]
+                    current_section_group = self.determine_section_group(chunk["heading"], toc)
+                section = self.section_record(
+                    handbook_id, page_num, f"sec_{page_num:03d}_{index:02d}",
+                    current_section_title or f"Page {page_num}", current_section_group,
+                    chunk["text"], page["raw_text"] if index == 0 else None,
+                    chunk["excerpt"], chunk["tags"], chunk["text_category"])
+                section.update(chunk_index=index, char_start=chunk["char_start"], char_end=chunk["char_end"])
+                sections.append(section)
+        
+        return sections
+    
+    def section_record(self, handbook_id: str, page_num: int, section_key: str, section_title: str,
+                       section_group: str, content: str, raw_text: Optional[str], excerpt: str,
+                       tags: List[str], text_category: Optional[str]) -> Dict:
+        """A handbook_sections row as a dict keyed by column name."""
+        category = self.keyword_matcher.category_from_analysis(text_category, section_title)
+        topics = [tag for tag in tags if not tag.endswith('_focused')]
+        
+        return {
+            "section_id": str(uuid.uuid4()),
+            "handbook_id": handbook_id,
+            "section_group": section_group,
+            "section_key": section_key,
+            "page": f"Page {page_num}",
+            "section_title": section_title,
+            "category": category,
+            "type": "reference",
+            "content": content,
+            "raw_text": raw_text,
+            "excerpt": excerpt,
+            "topics": topics,
+            "tags": tags
+        }
+    
     def process_handbook(self, 
                         pdf_path: str, 
                         school_id: str, 
                         handbook_title: str, 
                         academic_year: str,
-                        progress_callback: Optional[Callable] = None) -> Dict:
+                        progress_callback: Optional[Callable] = None,
+                        extract_workers: Optional[int] = None) -> Dict:
         """
-        Process a handbook PDF and insert data into Snowflake.
+        Process a handbook PDF and insert data into the configured storage backend.
         
         Args:
             pdf_path: Path to the PDF file
@@ -169,6 +244,7 @@ class HandbookProcessor:
             handbook_title: Title of the handbook
             academic_year: Academic year (e.g., "2024-2025")
             progress_callback: Optional callback function for progress updates
+            extract_workers: Worker processes for page extraction (default PDF_EXTRACT_WORKERS, 1 = in-process)
         
         Returns:
             Dict with processing results
@@ -190,96 +266,59 @@ class HandbookProcessor:
             
             # Extract table of contents
             toc = self.extract_table_of_contents(doc)
+            doc.close()
             
-            # Connect to Snowflake
-            if not self.connect_to_snowflake():
-                raise Exception("Failed to connect to Snowflake")
-            
-            # Start transaction
-            self.connection.execute_string("BEGIN")
+            # Process pages before opening the transaction so it stays short
+            if extract_workers is None:
+                extract_workers = int(os.getenv('PDF_EXTRACT_WORKERS', '1'))
+            pages = self.extract_pages(pdf_path, total_pages, extract_workers, progress_callback)
+            sections = self.build_sections(pages, handbook_id, toc)
             
+            # Encode sections now so the first question after ingest doesn't pay for it
+            if progress_callback:
+                progress_callback(80, f"Computing embeddings for {len(sections)} sections...")
             try:
+                embedding_stats = self.embed_sections(sections)
+            except Exception as e:
+                # Not fatal: RAGService encodes any missing vectors when it loads the school
+                logger.warning(f"Ingest-time embedding failed, deferring to first load: {e}")
+                embedding_stats = {"sections": 0, "error": str(e)}
+                for section in sections:
+                    section.pop('embedding', None)
+            
+            if self.storage is None:
+                self.storage = get_storage()
+            
+            # One transaction; rolled back if any write fails
+            with self.storage.ingest() as writer:
+                # Reprocessing a handbook replaces its earlier sections
+                replaced = writer.delete_handbook(handbook_id)
+                
                 # Insert handbook record
-                self.insert_handbook_record(handbook_id, school_id, handbook_title, academic_year)
+                writer.insert_handbook(handbook_id, school_id, handbook_title, academic_year)
                 
                 if progress_callback:
-                    progress_callback(20, "Inserted handbook record")
+                    progress_callback(82, "Inserted handbook record")
                 
-                # Process pages
-                sections = []
-                current_section_title = None
-                current_section_group = "introduction"
-                
-                for page_num, page in enumerate(doc, start=1):
-                    if progress_callback:
-                        progress = 20 + (page_num / total_pages) * 60
-                        progress_callback(progress, f"Processing page {page_num}/{total_pages}")
-                    
-                    raw_text = page.get_text()
-                    cleaned_text = self.clean_text(raw_text)
-                    
-                    if not cleaned_text.strip():
-                        continue
-                    
-                    # Try to detect section title
-                    detected_title = self.detect_section_title(raw_text)
-                    if detected_title:
-                        current_section_title = detected_title
-                        # Update section group based on TOC or title
-                        current_section_group = self.determine_section_group(detected_title, toc)
-                    
-                    # Create section record
-                    section_id = str(uuid.uuid4())
-                    section_title = current_section_title or f"Page {page_num}"
-                    category = self.categorize_content(cleaned_text, section_title)
-                    tags = self.extract_enhanced_tags(cleaned_text)
-                    topics = [tag for tag in tags if not tag.endswith('_focused')]
-                    
-                    section_data = {
-                        "section_id": section_id,
-                        "handbook_id": handbook_id,
-                        "section_group": current_section_group,
-                        "section_key": f"sec_{page_num:03d}",
-                        "page": f"Page {page_num}",
-                        "section_title": section_title,
-                        "category": category,
-                        "type": "reference",
-                        "content": cleaned_text,
-                        "raw_text": raw_text,
-                        "excerpt": self.generate_excerpt(cleaned_text),
-                        "topics": topics,
-                        "tags": tags
-                    }
-                    
-                    sections.append(section_data)
-                
-                # Insert sections into Snowflake
+                # Insert sections
                 if progress_callback:
                     progress_callback(85, f"Inserting {len(sections)} sections into database...")
                 
-                self.insert_sections_batch(sections)
-                
-                # Commit transaction
-                self.connection.execute_string("COMMIT")
-                
-                if progress_callback:
-                    progress_callback(100, "Processing completed successfully!")
-                
-                doc.close()
-                
-                return {
-                    "status": "success",
-                    "handbook_id": handbook_id,
-                    "sections_processed": len(sections),
-                    "total_pages": total_pages,
-                    "message": f"Successfully processed {len(sections)} sections from {total_pages} pages"
-                }
-                
-            except Exception as e:
-                # Rollback transaction on error
-                self.connection.execute_string("ROLLBACK")
-                logger.error(f"Transaction rolled back due to error: {str(e)}")
-                raise e
+                ingest_stats = writer.insert_sections(sections)
+            
+            if progress_callback:
+                progress_callback(100, "Processing completed successfully!")
+            
+            return {
+                "status": "success",
+                "handbook_id": handbook_id,
+                "sections_processed": len(sections),
+                "sections_replaced": replaced,
+                "ingest": ingest_stats,
+                "embeddings": embedding_stats,
+                "total_pages": total_pages,
+                "message": f"Successfully processed {len(sections)} sections from {total_pages} pages"
+            }
             
         except Exception as e:
             logger.error(f"Error processing handbook: {str(e)}")
@@ -291,26 +330,40 @@ class HandbookProcessor:
                 "error": str(e),
                 "message": f"Failed to process handbook: {str(e)}"
             }
+    
+    def embed_sections(self, sections: List[Dict]) -> Dict:
+        """Encode sections in batches and persist their vectors.
+        
+        Vectors always go to the embedding cache, keyed by the same searchable
+        text RAGService builds when loading a school, so loading finds them
+        without running the encoder. With STORE_SECTION_EMBEDDINGS enabled
+        each section also gets an 'embedding' value for handbook_sections.embedding.
+        """
+        if not sections:
+            return {"sections": 0, "seconds": 0.0}
+        
+        start = time.perf_counter()
+        if self.embedding_cache is None:
+            self.embedding_cache = EmbeddingCache(EMBEDDING_MODEL_NAME)
+        if self.embedding_model is None:
+            from sentence_transformers import SentenceTransformer
+            self.embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+        
+        texts = [searchable_text(s['section_title'], s['content'], s['category']) for s in sections]
+        batch_size = int(os.getenv('INGEST_EMBED_BATCH_SIZE', '128'))
+        vectors = self.embedding_cache.encode(self.embedding_model, texts, batch_size=batch_size)
         
-        finally:
-            self.close_connection()
+        if embeddings_in_db():
+            for section, vector in zip(sections, vectors):
+                section['embedding'] = [round(float(x), 7) for x in vector]
+        
+        seconds = time.perf_counter() - start
+        logger.info(f"Embedded {len(sections)} sections in {seconds:.2f}s")
+        return {"sections": len(sections), "seconds": round(seconds, 3), "stored_in_db": embeddings_in_db()}
     
     def determine_section_group(self, title: str, toc: Dict[str, int]) -> str:
         """Determine section group based on title and TOC."""
-        title_lower = title.lower()
-        
-        if any(word in title_lower for word in ['introduction', 'welcome', 'overview']):
-            return 'introduction'
-        elif any(word in title_lower for word in ['academic', 'course', 'curriculum']):
-            return 'academics'
-        elif any(word in title_lower for word in ['student', 'conduct', 'behavior']):
-            return 'student_life'
-        elif any(word in title_lower for word in ['administrative', 'registration', 'fee']):
-            return 'administration'
-        elif any(word in title_lower for word in ['policy', 'procedure', 'rule']):
-            return 'policies'
-        else:
-            return 'general'
+        return self.keyword_matcher.section_group(title)
     
     def generate_excerpt(self, text: str, max_length: int = 200) -> str:
         """Generate excerpt from text."""
@@ -326,57 +379,34 @@ class HandbookProcessor:
             excerpt = excerpt + "..."
         
         return excerpt
+
+_worker_processor = None
+
+def _extract_page_range(pdf_path: str, start: int, end: int) -> List[Dict]:
+    """Process-pool worker: open the PDF independently and extract pages [start, end)."""
+    global _worker_processor
+    if _worker_processor is None:
+        _worker_processor = HandbookProcessor()
     
-    def insert_handbook_record(self, handbook_id: str, school_id: str, handbook_title: str, academic_year: str):
-        """Insert handbook record into Snowflake."""
-        cursor = self.connection.cursor()
-        
-        query = """
-        INSERT INTO handbooks (handbook_id, school_id, handbook_title, academic_year, created_at)
-        VALUES (%(handbook_id)s, %(school_id)s, %(handbook_title)s, %(academic_year)s, CURRENT_TIMESTAMP)
-        """
-        
-        cursor.execute(query, {
-            'handbook_id': handbook_id,
-            'school_id': school_id,
-            'handbook_title': handbook_title,
-            'academic_year': academic_year
-        })
-        
-        cursor.close()
-        logger.info(f"Inserted handbook record: {handbook_id}")
-    
-    def insert_sections_batch(self, sections: List[Dict]):
-        """Insert sections in batch to Snowflake."""
-        cursor = self.connection.cursor()
-        
-        # Insert sections one by one using SELECT statement to handle PARSE_JSON
-        for section in sections:
-            query = """
-            INSERT INTO handbook_sections 
-            (section_id, handbook_id, section_group, section_key, page, section_title, 
-             category, type, content, raw_text, excerpt, topics, tags, created_at)
-            SELECT 
-                %(section_id)s, %(handbook_id)s, %(section_group)s, %(section_key)s, 
-                %(page)s, %(section_title)s, %(category)s, %(type)s, %(content)s, 
-                %(raw_text)s, %(excerpt)s, PARSE_JSON(%(topics)s), PARSE_JSON(%(tags)s), CURRENT_TIMESTAMP
-            """
-            
-            # Convert arrays to JSON strings for PARSE_JSON function
-            section_data = section.copy()
-            section_data['topics'] = json.dumps(section['topics'])
-            section_data['tags'] = json.dumps(section['tags'])
-            
-            cursor.execute(query, section_data)
-        
-        cursor.close()
-        logger.info(f"Inserted {len(sections)} sections")
+    pages = []
+    doc = fitz.open(pdf_path)
+    try:
+        for index in range(start, end):
+            record = _worker_processor.extract_page(index + 1, doc[index].get_text())
+            if record:
+                pages.append(record)
+    finally:
+        doc.close()
+    return pages
 
 # Convenience function for direct usage
 def process_handbook_file(pdf_path: str, school_id: str, handbook_title: str, 
-                         academic_year: str, progress_callback: Optional[Callable] = None) -> Dict:
+                         academic_year: str, progress_callback: Optional[Callable] = None,
+                         extract_workers: Optional[int] = None, embedding_model=None,
+                         embedding_cache: Optional[EmbeddingCache] = None) -> Dict:
     """
     Convenience function to process a handbook file.
     """
-    processor = HandbookProcessor()
-    return processor.process_handbook(pdf_path, school_id, handbook_title, academic_year, progress_callback) 
\ No newline at end of file
+    processor = HandbookProcessor(embedding_model=embedding_model, embedding_cache=embedding_cache)
+    return processor.process_handbook(pdf_path, school_id, handbook_title, academic_year, progress_callback,
+                                      extract_workers=extract_workers) 
\ No newline at end of file
@@ -0,0 +1,127 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Tag vocabulary: a page gets a tag when any of its keywords occurs in the text
+TAG_KEYWORDS = {
+    # Academic tags
+    'academic_integrity': ['integrity', 'plagiarism', 'cheating', 'honor code'],
+    'examination': ['exam', 'test', 'quiz', 'assessment', 'midterm', 'final'],
+    'grading': ['grade', 'gpa', 'transcript', 'credit', 'pass', 'fail'],
+    'registration': ['registration', 'enrollment', 'course selection', 'add/drop'],
+    'graduation': ['graduation', 'commencement', 'degree', 'diploma'],
+    # Student life tags
+    'conduct': ['conduct', 'behavior', 'discipline', 'violation'],
+    'housing': ['housing', 'dormitory', 'residence', 'accommodation'],
+    'dining': ['dining', 'meal', 'cafeteria', 'food service'],
+    'health': ['health', 'medical', 'counseling', 'wellness'],
+    'activities': ['club', 'organization', 'event', 'activity'],
+    # Administrative tags
+    'financial': ['tuition', 'fee', 'scholarship', 'financial aid', 'payment'],
+    'policy': ['policy', 'procedure', 'rule', 'regulation'],
+    'appeals': ['appeal', 'grievance', 'complaint', 'petition'],
+    'calendar': ['calendar', 'semester', 'session', 'holiday', 'break'],
+    # General tags
+    'student_focused': ['student'],
+}
+
+# Categories in priority order: the first one with a hit in the text or title wins
+CATEGORY_KEYWORDS = {
+    'Academic Policies': ['academic', 'course', 'grade', 'exam', 'credit'],
+    'Student Conduct': ['conduct', 'behavior', 'discipline', 'violation'],
+    'Administrative': ['registration', 'fee', 'tuition', 'administrative'],
+    'Student Services': ['health', 'counseling', 'support', 'service'],
+    'Campus Life': ['housing', 'dining', 'activity', 'club', 'event'],
+    'General Information': ['welcome', 'introduction', 'overview', 'general'],
+}
+DEFAULT_CATEGORY = 'Miscellaneous'
+
+# Section groups in priority order, matched against section titles
+SECTION_GROUP_KEYWORDS = {
+    'introduction': ['introduction', 'welcome', 'overview'],
+    'academics': ['academic', 'course', 'curriculum'],
+    'student_life': ['student', 'conduct', 'behavior'],
+    'administration': ['administrative', 'registration', 'fee'],
+    'policies': ['policy', 'procedure', 'rule'],
+}
+DEFAULT_SECTION_GROUP = 'general'
+
+
+class _KeywordHits:
+    """Memoized substring lookups over one lowercased text.
+
+    Each keyword is scanned for at most once, however many labels share it,
+    and lookups stop at the first hit per label.
+    """
+
+    __slots__ = ('text', 'hits')
+
+    def __init__(self, text: str):
+        self.text = text.lower()
+        self.hits: Dict[str, bool] = {}
+
+    def any_of(self, keywords: Sequence[str]) -> bool:
+        hits = self.hits
+        text = self.text
+        for keyword in keywords:
+            hit = hits.get(keyword)
+            if hit is None:
+                hit = hits[keyword] = keyword in text
+            if hit:
+                return True
+        return False
+
+
+class KeywordMatcher:
+    """Precompiled keyword tables for tagging, categorization and section groups.
+
+    Built once per HandbookProcessor. :meth:`analyze` does the per-page work
+    once and returns both the tags and the highest-priority category matched
+    by the text, so the category for any section title can be derived later
+    without another pass over the page.
+    """
+
+    def __init__(self,
+                 tag_keywords: Optional[Dict[str, List[str]]] = None,
+                 category_keywords: Optional[Dict[str, List[str]]] = None,
+                 section_group_keywords: Optional[Dict[str, List[str]]] = None):
+        self.tag_keywords: Tuple[Tuple[str, Tuple[str, ...]], ...] = tuple(
+            (tag, tuple(keywords)) for tag, keywords in (tag_keywords or TAG_KEYWORDS).items())
+        self.category_keywords: Tuple[Tuple[str, Tuple[str, ...]], ...] = tuple(
+            (category, tuple(keywords)) for category, keywords in (category_keywords or CATEGORY_KEYWORDS).items())
+        self.section_group_keywords: Tuple[Tuple[str, Tuple[str, ...]], ...] = tuple(
+            (group, tuple(keywords)) for group, keywords in (section_group_keywords or SECTION_GROUP_KEYWORDS).items())
+
+    def analyze(self, text: str) -> Dict:
+        """Tags and the first category (in priority order) whose keywords occur in a page of text."""
+        hits = _KeywordHits(text)
+        tags = [tag for tag, keywords in self.tag_keywords if hits.any_of(keywords)]
+        # Lower-priority categories can never win once one matches the text
+        text_category = next((category for category, keywords in self.category_keywords
+                              if hits.any_of(keywords)), None)
+        return {"tags": tags, "text_category": text_category}
+
+    def tags(self, text: str) -> List[str]:
+        hits = _KeywordHits(text)
+        return [tag for tag, keywords in self.tag_keywords if hits.any_of(keywords)]
+
+    def category(self, text: str, title: Optional[str] = None) -> str:
+        text_hits = _KeywordHits(text)
+        title_hits = _KeywordHits(title or "")
+        for category, keywords in self.category_keywords:
+            if text_hits.any_of(keywords) or title_hits.any_of(keywords):
+                return category
+        return DEFAULT_CATEGORY
+
+    def category_from_analysis(self, text_category: Optional[str], title: Optional[str] = None) -> str:
+        """Category for a page given its analyze() text_category and the current section title."""
+        title_hits = _KeywordHits(title or "")
+        for category, keywords in self.category_keywords:
+            if category == text_category or title_hits.any_of(keywords):
+                return category
+        return DEFAULT_CATEGORY
+
+    def section_group(self, title: str) -> str:
+        hits = _KeywordHits(title)
+        for group, keywords in self.section_group_keywords:
+            if hits.any_of(keywords):
+                return group
+        return DEFAULT_SECTION_GROUP
@@ -0,0 +1,99 @@
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from vector_index import top_k_indices
+
+# Keeps joined policy terms such as "add/drop", "pass-fail" and course codes like "cs101" whole
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[/'\-][a-z0-9]+)*")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from has have how i if in into is it its may
+me my of on or our should so that the their them then there these they this to was we
+what when where which who will with would you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms of a text, without stopwords."""
+    return [token for token in TOKEN_PATTERN.findall((text or '').lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """In-memory inverted index with Okapi BM25 scoring.
+
+    Each term's postings hold document positions and precomputed BM25
+    weights, so a query is a handful of scatter-adds into one score array
+    followed by the same partial top-k selection the vector indexes use.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def build(self, documents: Sequence[str]) -> 'BM25Index':
+        term_docs = defaultdict(list)
+        term_freqs = defaultdict(list)
+        lengths = np.zeros(len(documents), dtype=np.float32)
+        for doc_id, text in enumerate(documents):
+            counts = Counter(tokenize(text))
+            lengths[doc_id] = sum(counts.values())
+            for term, count in counts.items():
+                term_docs[term].append(doc_id)
+                term_freqs[term].append(count)
+
+        self.size = len(documents)
+        avg_length = (float(lengths.mean()) if self.size else 0.0) or 1.0
+        norms = self.k1 * (1 - self.b + self.b * lengths / avg_length)
+        postings = {}
+        for term, doc_ids in term_docs.items():
+            doc_ids = np.asarray(doc_ids, dtype=np.int32)
+            tf = np.asarray(term_freqs[term], dtype=np.float32)
+            idf = math.log(1 + (self.size - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            postings[term] = (doc_ids, (idf * tf * (self.k1 + 1) / (tf + norms[doc_ids])).astype(np.float32))
+        self.postings = postings
+        return self
+
+    def search(self, query: str, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (indices, BM25 scores) of the top_k documents with at least one query term."""
+        scores = np.zeros(self.size, dtype=np.float32)
+        matched = False
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is not None:
+                doc_ids, weights = posting
+                scores[doc_ids] += weights
+                matched = True
+        if not matched:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        indices = top_k_indices(scores, min(top_k, int(np.count_nonzero(scores))))
+        return indices, scores[indices]
+
+    @property
+    def nbytes(self) -> int:
+        """Posting arrays plus a rough allowance for the term dictionary."""
+        return sum(ids.nbytes + weights.nbytes + 100 for ids, weights in self.postings.values())
+
+
+def reciprocal_rank_fusion(rankings: List[Tuple[np.ndarray, float]], top_k: int, k: int = 60) -> List[int]:
+    """Fuse ranked index lists given as (indices best first, weight) into the top_k positions."""
+    fused: Dict[int, float] = defaultdict(float)
+    for indices, weight in rankings:
+        for rank, idx in enumerate(indices):
+            fused[int(idx)] += weight / (k + rank + 1)
+    return sorted(fused, key=fused.get, reverse=True)[:top_k]
+
+
+def retrieval_mode() -> str:
+    """RETRIEVAL_MODE: dense (embeddings only), lexical (BM25 only) or hybrid."""
+    mode = os.getenv('RETRIEVAL_MODE', 'dense').lower()
+    return mode if mode in ('dense', 'lexical', 'hybrid') else 'dense'
@@ -1,8 +1,10 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, BackgroundTasks
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 import uvicorn
 import shutil
 import os
@@ -21,8 +23,11 @@ if not load_dotenv(env_path):
     # Also try parent of parent directory
     load_dotenv('../.env')
 
-from handbook_processor import HandbookProcessor, process_handbook_file
+from handbook_processor import process_handbook_file
+from metadata_cache import MetadataCache
 from rag_service import RAGService
+from school_directory import SchoolDirectory
+from storage import SchoolExistsError, get_storage
 
 app = FastAPI(title="Multi-School Handbook Bot API")
 
@@ -43,6 +48,10 @@ if os.path.exists(frontend_build_path):
 # Global variables for processing status
 processing_status = {}
 rag_service = RAGService()
+school_directory = SchoolDirectory()
+metadata_cache = MetadataCache()
+# Strong references to long-running startup tasks; the event loop only keeps weak ones
+startup_tasks = set()
 
 def update_processing_status(job_id: str, progress: float, message: str):
     """Update processing status for frontend polling."""
@@ -53,6 +62,47 @@ def update_processing_status(job_id: str, progress: float, message: str):
         "status": "processing" if progress >= 0 else "error"
     }
 
+def start_background_task(coro) -> asyncio.Task:
+    """Run coro on the event loop, holding a reference until it finishes (or shutdown cancels it)."""
+    task = asyncio.create_task(coro)
+    startup_tasks.add(task)
+    task.add_done_callback(startup_tasks.discard)
+    return task
+
+@app.on_event("startup")
+async def warm_schools():
+    # Preload the busiest schools in the background so startup isn't delayed
+    school_ids = [s.strip() for s in os.getenv('WARM_SCHOOLS', '').split(',') if s.strip()]
+    if school_ids:
+        start_background_task(rag_service.warm_up(school_ids))
+    if rag_service.reranker is not None:
+        start_background_task(rag_service.warm_up_reranker())
+
+async def resync_school_directory(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(school_directory.sync, get_storage())
+        except Exception as e:
+            print(f"School directory resync failed: {e}")
+
+@app.on_event("startup")
+async def load_school_directory():
+    # Autocomplete falls back to the database until the first sync succeeds
+    try:
+        await run_in_threadpool(school_directory.sync, get_storage())
+    except Exception as e:
+        print(f"School directory load failed: {e}")
+    interval = float(os.getenv('SCHOOL_DIRECTORY_RESYNC_SECONDS', '300'))
+    if interval > 0:
+        start_background_task(resync_school_directory(interval))
+
+@app.on_event("shutdown")
+async def close_storage():
+    for task in list(startup_tasks):
+        task.cancel()
+    get_storage().close()
+
 @app.get("/")
 async def root():
     return {"message": "Multi-School Handbook Bot API"}
@@ -61,6 +111,12 @@ async def root():
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """Retrieval pipeline metrics (query batching, caches, storage backend)."""
+    return {**rag_service.get_metrics(), "storage": get_storage().get_stats(),
+            "school_directory": school_directory.get_stats(), "metadata_cache": metadata_cache.get_stats()}
+
 @app.post("/api/process-handbook")
 async def process_handbook_endpoint(
     background_tasks: BackgroundTasks,
@@ -137,17 +193,29 @@ async def process_handbook_background(
         update_processing_status(job_id, progress, message)
     
     try:
-        # Process the handbook
-        result = process_handbook_file(
+        # Process the handbook in the threadpool: extraction and the ingest-time
+        # embedding stage would otherwise block every other request
+        result = await run_in_threadpool(
+            process_handbook_file,
             pdf_path=pdf_path,
             school_id=school_id,
             handbook_title=handbook_title,
             academic_year=academic_year,
-            progress_callback=progress_callback
+            progress_callback=progress_callback,
+            # Reuse the loaded sentence transformer for the ingest-time embedding stage
+            embedding_model=rag_service.model,
+            embedding_cache=rag_service.embedding_cache
         )
         
         # Update final status
         if result["status"] == "success":
+            metadata_cache.invalidate_school(school_id)
+            # Make the new sections visible to chat without a restart
+            try:
+                # Takes the school's lock and may query/encode, so keep it off the event loop
+                result["refresh"] = await rag_service.run_blocking(rag_service.refresh_school, school_id)
+            except Exception as e:
+                print(f"Failed to refresh {school_id} after processing: {e}")
             processing_status[job_id] = {
                 "progress": 100,
                 "message": result["message"],
@@ -180,6 +248,15 @@ async def process_handbook_background(
         except:
             pass
 
+@app.post("/api/admin/refresh-school/{school_id}")
+async def refresh_school(school_id: str):
+    """Apply added and removed handbook sections to a loaded school's index."""
+    metadata_cache.invalidate_school(school_id)
+    try:
+        return await rag_service.run_blocking(rag_service.refresh_school, school_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/processing-status/{job_id}")
 async def get_processing_status(job_id: str):
     """Get the current processing status for a job."""
@@ -197,37 +274,11 @@ async def search_schools(query: dict):
     if not search_term:
         return {"schools": []}
     
+    if school_directory.loaded:
+        return {"schools": school_directory.search(search_term)}
+
     try:
-        processor = HandbookProcessor()
-        if not processor.connect_to_snowflake():
-            raise HTTPException(status_code=500, detail="Database connection failed")
-        
-        cursor = processor.connection.cursor()
-        
-        # Search schools by name or abbreviation
-        search_query = """
-        SELECT school_id, school_name, school_abbreviation, created_at
-        FROM schools 
-        WHERE LOWER(school_name) LIKE LOWER(%(search)s) 
-           OR LOWER(school_abbreviation) LIKE LOWER(%(search)s)
-        ORDER BY school_name
-        LIMIT 10
-        """
-        
-        cursor.execute(search_query, {"search": f"%{search_term}%"})
-        results = cursor.fetchall()
-        
-        schools = []
-        for row in results:
-            schools.append({
-                "school_id": row[0],
-                "school_name": row[1],
-                "school_abbreviation": row[2],
-                "created_at": row[3].isoformat() if row[3] else None
-            })
-        
-        processor.close_connection()
-        
+        schools = await run_in_threadpool(get_storage().search_schools, search_term)
         return {"schools": schools}
         
     except Exception as e:
@@ -244,29 +295,17 @@ async def add_school(school_data: dict):
         raise HTTPException(status_code=400, detail="School name is required")
     
     try:
-        processor = HandbookProcessor()
-        if not processor.connect_to_snowflake():
-            raise HTTPException(status_code=500, detail="Database connection failed")
-        
         # Generate school ID
         school_id = school_abbreviation.lower().replace(" ", "_") if school_abbreviation else school_name.lower().replace(" ", "_")
         
-        cursor = processor.connection.cursor()
-        
-        # Insert new school
-        insert_query = """
-        INSERT INTO schools (school_id, school_name, school_abbreviation, created_at)
-        VALUES (%(school_id)s, %(school_name)s, %(school_abbreviation)s, CURRENT_TIMESTAMP)
-        """
-        
-        cursor.execute(insert_query, {
+        await run_in_threadpool(get_storage().insert_school, school_id, school_name, school_abbreviation)
+        school_directory.add({
             "school_id": school_id,
             "school_name": school_name,
-            "school_abbreviation": school_abbreviation or None
+            "school_abbreviation": school_abbreviation or None,
+            "created_at": datetime.now().isoformat()
         })
         
-        processor.close_connection()
-        
         return {
             "school_id": school_id,
             "school_name": school_name,
@@ -274,9 +313,9 @@ async def add_school(school_data: dict):
             "message": "School added successfully"
         }
         
+    except SchoolExistsError:
+        raise HTTPException(status_code=409, detail="School already exists")
     except Exception as e:
-        if "already exists" in str(e).lower():
-            raise HTTPException(status_code=409, detail="School already exists")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/chat")
@@ -301,42 +340,44 @@ async def chat_endpoint(request: dict):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/chat/stream")
+async def chat_stream_endpoint(request: dict):
+    """Streaming chat endpoint: Server-Sent Events with sources first, then answer tokens."""
+    
+    message = request.get("message", "")
+    school_id = request.get("school_id")
+    
+    if not message:
+        raise HTTPException(status_code=400, detail="Message is required")
+    
+    async def event_stream():
+        try:
+            async for event in rag_service.stream_response(message, school_id):
+                yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+        except Exception as e:
+            error = {"type": "error", "message": str(e)}
+            yield f"event: error\ndata: {json.dumps(error)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/api/handbooks/{school_id}")
-async def get_school_handbooks(school_id: str):
-    """Get all handbooks for a specific school."""
+async def get_school_handbooks(school_id: str, request: Request):
+    """Get all handbooks for a specific school (ETag / If-None-Match aware)."""
     
-    try:
-        processor = HandbookProcessor()
-        if not processor.connect_to_snowflake():
-            raise HTTPException(status_code=500, detail="Database connection failed")
-        
-        cursor = processor.connection.cursor()
-        
-        query = """
-        SELECT handbook_id, handbook_title, academic_year, created_at
-        FROM handbooks 
-        WHERE school_id = %(school_id)s
-        ORDER BY created_at DESC
-        """
-        
-        cursor.execute(query, {"school_id": school_id})
-        results = cursor.fetchall()
-        
-        handbooks = []
-        for row in results:
-            handbooks.append({
-                "handbook_id": row[0],
-                "handbook_title": row[1],
-                "academic_year": row[2],
-                "created_at": row[3].isoformat() if row[3] else None
-            })
-        
-        processor.close_connection()
-        
-        return {"handbooks": handbooks}
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    listing = metadata_cache.get("handbooks", school_id)
+    if listing is None:
+        generation = metadata_cache.generation(school_id)
+        try:
+            handbooks = await run_in_threadpool(get_storage().list_handbooks, school_id)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        listing = metadata_cache.put("handbooks", school_id, {"handbooks": handbooks}, generation)
+    
+    return listing.response(request.headers.get("if-none-match"), metadata_cache.cache_control)
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
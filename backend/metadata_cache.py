@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from fastapi import Response
+
+from query_cache import LRUCache
+
+
+class CachedListing:
+    """A serialized JSON response body with its ETag."""
+
+    __slots__ = ('body', 'etag', 'expires_at')
+
+    def __init__(self, payload: Dict, ttl: float):
+        self.body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        # Derived from the body, so every worker hands out the same tag for the same listing
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest() + '"'
+        self.expires_at = time.monotonic() + ttl
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """Whether an If-None-Match header already names this body."""
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or any(tag.removeprefix('W/') == self.etag for tag in tags)
+
+    def response(self, if_none_match: Optional[str], cache_control: str) -> Response:
+        headers = {"ETag": self.etag, "Cache-Control": cache_control}
+        if self.matches(if_none_match):
+            return Response(status_code=304, headers=headers)
+        return Response(content=self.body, media_type="application/json", headers=headers)
+
+
+class MetadataCache:
+    """Per-school cache of small, rarely changing listings such as a school's handbooks.
+
+    Entries are keyed by (kind, school_id) and dropped by
+    :meth:`invalidate_school` when ingestion changes that school. The TTL
+    (METADATA_CACHE_TTL_SECONDS) bounds staleness in other worker processes,
+    which don't see this process's invalidations. Browsers are told to
+    revalidate every time (METADATA_CACHE_CONTROL), so unchanged listings
+    cost a 304 with no body.
+    """
+
+    def __init__(self, max_size: Optional[int] = None, ttl: Optional[float] = None):
+        self.ttl = ttl if ttl is not None else float(os.getenv('METADATA_CACHE_TTL_SECONDS', '300'))
+        self.cache_control = os.getenv('METADATA_CACHE_CONTROL', 'no-cache')
+        self._entries = LRUCache(max_size if max_size is not None else int(os.getenv('METADATA_CACHE_SIZE', '1024')))
+        # Bumped on invalidation so a query that started before it can't cache what it read
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def generation(self, school_id: str) -> int:
+        with self._lock:
+            return self._generations.get(school_id, 0)
+
+    def get(self, kind: str, school_id: str) -> Optional[CachedListing]:
+        entry = self._entries.get((kind, school_id))
+        if entry is not None and entry.expires_at <= time.monotonic():
+            self._entries.discard_where(lambda key: key == (kind, school_id))
+            return None
+        return entry
+
+    def put(self, kind: str, school_id: str, payload: Dict, generation: int) -> CachedListing:
+        """Cache payload unless the school was invalidated since generation was read."""
+        entry = CachedListing(payload, self.ttl)
+        with self._lock:
+            if self._generations.get(school_id, 0) == generation:
+                self._entries.put((kind, school_id), entry)
+        return entry
+
+    def invalidate_school(self, school_id: str):
+        with self._lock:
+            self._generations[school_id] = self._generations.get(school_id, 0) + 1
+            self._entries.discard_where(lambda key: key[1] == school_id)
+
+    def get_stats(self) -> Dict:
+        return {**self._entries.get_stats(), "ttl_seconds": self.ttl}
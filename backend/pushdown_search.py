@@ -0,0 +1,58 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from storage import HandbookRepository, get_storage
+
+
+def retrieval_backend() -> str:
+    """RETRIEVAL_BACKEND: memory (corpus and index in each worker) or pushdown (similarity in the database)."""
+    backend = os.getenv('RETRIEVAL_BACKEND', 'memory').lower()
+    return backend if backend in ('memory', 'pushdown') else 'memory'
+
+
+class PushdownRetriever:
+    """Dense retrieval that runs the top-k similarity query in the database.
+
+    Nothing is held per school in the worker: each search sends the question
+    vector and gets back only the top_k rows, already in search result shape
+    (Snowflake's VECTOR_COSINE_SIMILARITY ... ORDER BY ... LIMIT k). Only
+    sections whose vectors were stored at ingest time
+    (STORE_SECTION_EMBEDDINGS) are searchable this way.
+
+    An in-memory :class:`sqlite_storage.SQLiteRepository` runs the same
+    query locally, which is what benchmark_pushdown.py uses.
+    """
+
+    def __init__(self, storage: Optional[HandbookRepository] = None):
+        self.storage = storage or get_storage()
+        self._lock = threading.Lock()
+        self._stats = {"queries": 0, "rows": 0, "errors": 0}
+        self._total_ms = 0.0
+
+    def search(self, question_embedding: np.ndarray, school_id: str, top_k: int) -> List[Dict]:
+        """Top_k sections of a school by cosine similarity, best first, with a 'similarity' field."""
+        start = time.perf_counter()
+        try:
+            results = self.storage.similar_sections(school_id, question_embedding, top_k)
+        except Exception:
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+
+        with self._lock:
+            self._stats["queries"] += 1
+            self._stats["rows"] += len(results)
+            self._total_ms += 1000 * (time.perf_counter() - start)
+        return results
+
+    def get_metrics(self) -> Dict:
+        with self._lock:
+            return {
+                **self._stats,
+                "avg_query_ms": self._total_ms / self._stats["queries"] if self._stats["queries"] else 0.0,
+                "storage": self.storage.name,
+            }
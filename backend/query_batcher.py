@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class QueryEncoderBatcher:
+    """Coalesces concurrent query encodes into batched model calls.
+
+    Callers submit a question and get a Future for its vector. A single worker
+    thread takes the first waiting question, keeps collecting for up to
+    ``max_wait_ms`` (or until ``max_batch_size`` questions are queued), then
+    runs one ``model.encode`` over the whole batch.
+    """
+
+    def __init__(self, model, max_batch_size: Optional[int] = None, max_wait_ms: Optional[float] = None):
+        self.model = model
+        self.max_batch_size = max_batch_size or int(os.getenv('QUERY_BATCH_MAX_SIZE', '32'))
+        wait_ms = max_wait_ms if max_wait_ms is not None else float(os.getenv('QUERY_BATCH_MAX_WAIT_MS', '5'))
+        self.max_wait = wait_ms / 1000.0
+        self._queue: "queue.Queue[Tuple[str, Future, float]]" = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._batches = 0
+        self._queries = 0
+        self._total_wait = 0.0
+        self._max_wait_seen = 0.0
+        self._encode_time = 0.0
+
+    def _ensure_worker(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='query-encoder-batcher', daemon=True)
+                self._thread.start()
+
+    def submit(self, question: str) -> Future:
+        """Queue a question for encoding and return a Future for its vector."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((question, future, time.perf_counter()))
+        return future
+
+    def encode(self, question: str) -> np.ndarray:
+        """Encode one question, blocking until its batch has run."""
+        return self.submit(question).result()
+
+    async def encode_async(self, question: str) -> np.ndarray:
+        """Encode one question without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(question))
+
+    def _collect_batch(self) -> List[Tuple[str, Future, float]]:
+        batch = [self._queue.get()]
+        deadline = batch[0][2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    # Anything already waiting rides along without further delay
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            try:
+                vectors = self.model.encode([question for question, _, _ in batch])
+            except Exception as e:
+                logger.error(f"Batched query encode failed: {e}")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            finished = time.perf_counter()
+
+            for (_, future, _), vector in zip(batch, vectors):
+                # A copy, so a cached vector doesn't keep the whole batch array alive
+                future.set_result(np.array(vector, dtype=np.float32))
+            self._record(batch, started, finished)
+
+    def _record(self, batch, started: float, finished: float):
+        waits = [started - enqueued for _, _, enqueued in batch]
+        with self._metrics_lock:
+            self._batches += 1
+            self._queries += len(batch)
+            self._batch_sizes[len(batch)] += 1
+            self._total_wait += sum(waits)
+            self._max_wait_seen = max(self._max_wait_seen, max(waits))
+            self._encode_time += finished - started
+
+    def get_metrics(self) -> Dict:
+        """Batch size distribution and queue wait statistics."""
+        with self._metrics_lock:
+            return {
+                "batches": self._batches,
+                "queries": self._queries,
+                "avg_batch_size": self._queries / self._batches if self._batches else 0.0,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "avg_queue_wait_ms": 1000 * self._total_wait / self._queries if self._queries else 0.0,
+                "max_queue_wait_ms": 1000 * self._max_wait_seen,
+                "avg_encode_ms": 1000 * self._encode_time / self._batches if self._batches else 0.0,
+                "queued": self._queue.qsize(),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": 1000 * self.max_wait,
+            }
@@ -1,12 +1,27 @@
-import snowflake.connector
 import pandas as pd
 from sentence_transformers import SentenceTransformer
 import numpy as np
 import os
 from dotenv import load_dotenv
-from typing import List, Dict, Tuple, Optional
-from anthropic import Anthropic
+from typing import AsyncIterator, List, Dict, Tuple, Optional
+from anthropic import Anthropic, AsyncAnthropic
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import logging
+import re
+import threading
+
+from answer_cache import SemanticAnswerCache, answer_cache_enabled
+from corpus_cache import CorpusCache, SchoolCorpus
+from embedding_cache import EMBEDDING_MODEL_NAME, EmbeddingCache, embeddings_in_db, parse_vector, searchable_text
+from lexical_index import BM25Index, reciprocal_rank_fusion, retrieval_mode
+from pushdown_search import PushdownRetriever, retrieval_backend
+from query_batcher import QueryEncoderBatcher
+from query_cache import LRUCache, normalize_question
+from reranker import CrossEncoderReranker, rerank_enabled
+from section_store import SectionStore, positions_of
+from storage import get_storage
+from vector_index import FlatIndex, build_index, normalize_query, normalize_rows
 
 # Load environment variables - try multiple paths
 env_path = os.path.join(os.path.dirname(__file__), '..', '.env')
@@ -16,159 +31,421 @@ if not load_dotenv(env_path):
     # Also try parent of parent directory
     load_dotenv('../.env')
 
+CLAUDE_MODEL = "claude-3-7-sonnet-20250219"
+
 class RAGService:
     def __init__(self):
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-        self.data = {}  # Store data per school
-        self.embeddings = {}  # Store embeddings per school
-        self.initialized_schools = set()
+        self.model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+        # Snowflake, or an embedded SQLite file (STORAGE_BACKEND)
+        self.storage = get_storage()
+        self.embedding_cache = EmbeddingCache(EMBEDDING_MODEL_NAME)
+        self.query_encoder = QueryEncoderBatcher(self.model)
+        # Repeated questions (suggested examples, retries) skip encoding and retrieval
+        self.query_vectors = LRUCache(int(os.getenv('QUERY_CACHE_SIZE', '1024')))
+        self.search_results = LRUCache(int(os.getenv('RESULT_CACHE_SIZE', '1024')))
+        # Full CONTENT of recent hits, for corpora loaded without it (LAZY_SECTION_CONTENT)
+        self.section_contents = LRUCache(int(os.getenv('CONTENT_CACHE_SIZE', '2048')))
+        # Bumped whenever a school's cached results/answers are invalidated, so a lookup
+        # that started against the old corpus can't cache what it found afterwards
+        self.generations: Dict[str, int] = {}
+        self.generations_lock = threading.Lock()
+        # Optional second stage that rescores a wider candidate set (RERANK_ENABLED)
+        self.reranker = CrossEncoderReranker() if rerank_enabled() else None
+        # Answers to near-identical questions are served without calling Claude (ANSWER_CACHE_ENABLED)
+        self.answer_cache = SemanticAnswerCache() if answer_cache_enabled() else None
+        # RETRIEVAL_BACKEND=pushdown runs similarity in the database and keeps no corpora here
+        self.pushdown = PushdownRetriever(self.storage) if retrieval_backend() == 'pushdown' else None
+        # Per-school rows, vectors and index, evicted LRU beyond CORPUS_CACHE_MAX_MB
+        self.corpora = CorpusCache()
+        # Singleflight: one load per school at a time, whoever asks first does it
+        self.school_locks: Dict[str, threading.Lock] = {}
+        self.school_locks_guard = threading.Lock()
+        self.inflight_loads: Dict[str, asyncio.Future] = {}
+        
+        # Bounded pool for blocking work (DB loads, corpus encoding, index scans)
+        # so the event loop stays free while a chat is in flight
+        self.executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('RAG_WORKER_THREADS', '4')),
+            thread_name_prefix='rag-worker'
+        )
         
         # Initialize Claude
         self.claude_client = None
+        self.async_claude_client = None
         api_key = os.getenv('ANTHROPIC_API_KEY')
         if api_key:
             try:
                 self.claude_client = Anthropic(api_key=api_key)
+                self.async_claude_client = AsyncAnthropic(api_key=api_key)
             except Exception as e:
                 print(f"Failed to initialize Claude: {e}")
         
-    def connect_snowflake(self):
-        try:
-            conn = snowflake.connector.connect(
-                user=os.getenv('SNOWFLAKE_USER'),
-                password=os.getenv('SNOWFLAKE_PASSWORD'),
-                account=os.getenv('SNOWFLAKE_ACCOUNT'),
-                warehouse=os.getenv('SNOWFLAKE_WAREHOUSE'),
-                database=os.getenv('SNOWFLAKE_DATABASE'),
-                schema=os.getenv('SNOWFLAKE_SCHEMA')
-            )
-            return conn
-        except Exception as e:
-            print(f"Connection failed: {e}")
-            return None
-    
-    def load_school_data(self, school_id: str):
-        """Load data for a specific school"""
-        conn = self.connect_snowflake()
-        if not conn:
-            return False
-            
-        query = """
-        SELECT 
-            hs.section_id,
-            hs.section_title,
-            hs.category,
-            hs.section_group,
-            hs.content,
-            hs.excerpt,
-            hs.topics,
-            hs.tags,
-            h.handbook_title,
-            h.academic_year,
-            s.school_name
-        FROM handbook_sections hs
-        JOIN handbooks h ON hs.handbook_id = h.handbook_id
-        JOIN schools s ON h.school_id = s.school_id
-        WHERE s.school_id = %(school_id)s
-        AND LENGTH(hs.content) > 50
-        ORDER BY LENGTH(hs.content) DESC
+    def batch_vectors(self, batch: pd.DataFrame, store: SectionStore, with_content: bool) -> List[Optional[np.ndarray]]:
+        """Vectors for a frame of sections and its SectionStore, in row order.
+        
+        Sections are embedded at ingest time, so vectors normally come from
+        the EMBEDDING column or the on-disk cache; only rows ingested before
+        that (or edited since) go through the model. Rows without a stored
+        vector stay None when the frame was fetched without CONTENT.
         """
+        stored = (batch['EMBEDDING'].map(parse_vector).tolist()
+                  if 'EMBEDDING' in batch.columns else [None] * len(batch))
+        missing = [i for i, vector in enumerate(stored) if vector is None]
+        if missing and with_content:
+            texts = store.searchable_texts()
+            encoded = self.embedding_cache.encode(self.model, [texts[i] for i in missing])
+            for i, vector in zip(missing, encoded):
+                stored[i] = vector
+        return stored
+    
+    def keeps_content(self) -> bool:
+        """Whether corpora hold every section's CONTENT or fetch it for hits only"""
+        # The keyword index is built from the content, so hybrid/lexical modes keep it
+        lazy = os.getenv('LAZY_SECTION_CONTENT', 'true').lower() in ('1', 'true', 'yes')
+        return not lazy or retrieval_mode() != 'dense'
+    
+    def load_school_sections(self, school_id: str) -> Optional[Tuple[SectionStore, np.ndarray]]:
+        """Stream a school's sections into a SectionStore and its normalized vectors.
         
+        Rows arrive in batches (Arrow batches from Snowflake) and each batch
+        is reduced to store tuples and vectors before the next one is fetched,
+        so the full result never exists as one DataFrame. Unless keeps_content(),
+        CONTENT is left out of the store and fetched for the hits that are
+        actually used; when vectors are stored in the database it is not even
+        selected, and rows without a stored vector get theirs from a follow-up
+        content query.
+        """
+        keep_content = self.keeps_content()
+        # Without stored vectors the embedding cache key needs each row's full text
+        with_content = keep_content or not embeddings_in_db()
+        rows = []
+        vectors: List[Optional[np.ndarray]] = []
         try:
-            school_data = pd.read_sql(query, conn, params={"school_id": school_id})
-            conn.close()
+            for batch in self.storage.school_section_batches(school_id, with_content=with_content,
+                                                              with_embeddings=embeddings_in_db()):
+                store = SectionStore.from_frame(batch)
+                vectors.extend(self.batch_vectors(batch, store, with_content))
+                rows.extend(store.rows if keep_content else store.without_content().rows)
             
-            if len(school_data) == 0:
+            if not rows:
                 print(f"No data found for school: {school_id}")
-                return False
+                return None
             
-            school_data['searchable_text'] = (
-                school_data['SECTION_TITLE'].fillna('') + ' ' + 
-                school_data['CONTENT'].fillna('') + ' ' +
-                school_data['CATEGORY'].fillna('')
-            )
-            
-            self.data[school_id] = school_data
-            print(f"Loaded {len(school_data)} handbook sections for {school_id}!")
-            return True
+            missing = [i for i, vector in enumerate(vectors) if vector is None]
+            if missing:
+                contents = self.storage.section_contents([rows[i][0] for i in missing])
+                texts = [searchable_text(rows[i][1], contents.get(rows[i][0]), rows[i][2]) for i in missing]
+                for i, vector in zip(missing, self.embedding_cache.encode(self.model, texts)):
+                    vectors[i] = vector
         except Exception as e:
             print(f"Failed to load data for {school_id}: {e}")
-            return False
+            return None
+        
+        print(f"Loaded {len(rows)} handbook sections for {school_id}!")
+        embeddings = np.vstack(vectors).astype(np.float32)
+        return SectionStore(rows), normalize_rows(embeddings, copy=False)
+    
+    def hydrate_content(self, school_id: str, results: List[Dict]) -> bool:
+        """Fill in CONTENT for results taken from a corpus loaded without it.
+        
+        Returns False when some content couldn't be fetched and the excerpt
+        stands in for it, so the results are not cached.
+        """
+        missing = []
+        for result in results:
+            if result['content'] is None:
+                cached = self.section_contents.get((school_id, result['section_id']))
+                if cached is None:
+                    missing.append(result)
+                else:
+                    result['content'] = cached
+        if not missing:
+            return True
+            
+        try:
+            contents = self.storage.section_contents([result['section_id'] for result in missing])
+        except Exception as e:
+            print(f"Failed to fetch section content for {school_id}: {e}")
+            contents = {}
+        for result in missing:
+            content = contents.get(result['section_id'])
+            if content is not None:
+                self.section_contents.put((school_id, result['section_id']), content)
+            # The excerpt still gives Claude and the reranker something to work with
+            result['content'] = content if content is not None else result['excerpt'] or ''
+        return all(result['section_id'] in contents for result in missing)
     
-    def create_school_embeddings(self, school_id: str):
-        """Create embeddings for a specific school's data"""
-        if school_id not in self.data:
-            return False
+    def get_corpus(self, school_id: str) -> Optional[SchoolCorpus]:
+        """Return a school's corpus, loading it (and its index) on a cache miss"""
+        corpus = self.corpora.get(school_id)
+        if corpus is not None:
+            return corpus
             
-        texts = self.data[school_id]['searchable_text'].tolist()
-        print(f"Creating embeddings for {school_id}...")
-        self.embeddings[school_id] = self.model.encode(texts)
-        print(f"Embeddings created successfully for {school_id}!")
-        return True
+        with self.school_lock(school_id):
+            # Another request may have finished loading while we waited
+            corpus = self.corpora.peek(school_id)
+            if corpus is not None:
+                return corpus
+            return self.load_corpus(school_id)
     
-    def cosine_similarity(self, a, b):
-        """Calculate cosine similarity between vectors"""
-        # Normalize vectors
-        a_norm = a / np.linalg.norm(a, axis=1, keepdims=True)
-        b_norm = b / np.linalg.norm(b, axis=1, keepdims=True)
+    def school_lock(self, school_id: str) -> threading.Lock:
+        """Lock serializing loads and refreshes of one school"""
+        with self.school_locks_guard:
+            lock = self.school_locks.get(school_id)
+            if lock is None:
+                lock = self.school_locks[school_id] = threading.Lock()
+            return lock
+    
+    def load_corpus(self, school_id: str) -> Optional[SchoolCorpus]:
+        """Load rows, vectors and indexes for a school and cache them (caller holds its lock)"""
+        loaded = self.load_school_sections(school_id)
+        if loaded is None:
+            return None
+            
+        store, embeddings = loaded
+        index = build_index(embeddings, normalized=True)
+        print(f"Built {index.kind} index for {school_id}")
         
-        # Calculate cosine similarity
-        return np.dot(a_norm, b_norm.T)
+        corpus = SchoolCorpus(store, embeddings, index, self.build_lexical_index(store))
+        self.corpora.put(school_id, corpus)
+        # Same rows as whatever was cached before an eviction, so lookups already in
+        # flight may still cache theirs: drop old entries without bumping the generation
+        self.search_results.discard_where(lambda key: key[0] == school_id)
+        self.section_contents.discard_where(lambda key: key[0] == school_id)
+        print(f"RAG service initialized successfully for {school_id} ({corpus.nbytes / 1e6:.1f} MB)!")
+        return corpus
+    
+    def build_lexical_index(self, store: SectionStore) -> Optional[BM25Index]:
+        """BM25 index over the same text that is embedded; only built when RETRIEVAL_MODE uses it"""
+        if retrieval_mode() == 'dense':
+            return None
+        return BM25Index().build(store.searchable_texts())
     
     def initialize_school(self, school_id: str):
         """Initialize data and embeddings for a specific school"""
-        if school_id in self.initialized_schools:
+        if school_id in self.corpora:
             return True
-            
-        if not self.load_school_data(school_id):
-            return False
-            
-        if not self.create_school_embeddings(school_id):
-            return False
-            
-        self.initialized_schools.add(school_id)
-        print(f"RAG service initialized successfully for {school_id}!")
-        return True
+        return self.get_corpus(school_id) is not None
+    
+    async def initialize_school_async(self, school_id: str) -> bool:
+        """initialize_school for the event loop: concurrent first requests share one load"""
+        if school_id in self.corpora:
+            return True
+        
+        # Without this every waiter would park a worker thread on the school lock
+        load = self.inflight_loads.get(school_id)
+        if load is None:
+            load = asyncio.ensure_future(self.run_blocking(self.initialize_school, school_id))
+            self.inflight_loads[school_id] = load
+            load.add_done_callback(lambda _: self.inflight_loads.pop(school_id, None))
+        # A client that disconnects must not cancel the load others are waiting on
+        return await asyncio.shield(load)
+    
+    async def warm_up(self, school_ids: List[str]):
+        """Preload schools (e.g. WARM_SCHOOLS at startup) so their first question is fast"""
+        if self.pushdown is not None:
+            return
+        for school_id in school_ids:
+            try:
+                loaded = await self.initialize_school_async(school_id)
+                print(f"Warm-up {'loaded' if loaded else 'found no data for'} {school_id}")
+            except Exception as e:
+                print(f"Warm-up failed for {school_id}: {e}")
+    
+    async def warm_up_reranker(self):
+        """Load the cross-encoder at startup so the first reranked question doesn't pay for it"""
+        if self.reranker is None:
+            return
+        try:
+            await self.run_blocking(self.reranker.load)
+            print(f"Warm-up loaded reranker {self.reranker.model_name}")
+        except Exception as e:
+            print(f"Reranker warm-up failed: {e}")
+    
+    def refresh_school(self, school_id: str) -> Dict:
+        """Bring a loaded school in line with the database after a handbook is (re)processed.
+        
+        Only section ids are compared: rows that disappeared are dropped, new
+        rows are fetched and embedded (normally straight from the ingest-time
+        vectors) and appended, and unchanged rows are left alone. The index is
+        patched rather than rebuilt unless most of the corpus changed.
+        """
+        # Never interleave with a first load (or another refresh) of the same school
+        with self.school_lock(school_id):
+            return self.apply_section_changes(school_id)
+    
+    def apply_section_changes(self, school_id: str) -> Dict:
+        """Body of refresh_school; the caller holds the school's lock"""
+        corpus = self.corpora.peek(school_id)
+        if corpus is None:
+            # Nothing cached; the next question loads the school from scratch
+            # (or, with pushdown retrieval, queries the new rows directly)
+            self.invalidate_results(school_id)
+            self.invalidate_answers(school_id)
+            return {"status": "not_loaded", "school_id": school_id}
+        
+        current_ids = self.storage.section_ids(school_id)
+        
+        store = corpus.data
+        keep = positions_of(store, current_ids)
+        new_ids = sorted(current_ids - set(store.section_ids()))
+        removed = int(len(keep) - keep.sum())
+        if not new_ids and not removed:
+            return {"status": "unchanged", "school_id": school_id, "added": 0, "removed": 0}
+        
+        added = SectionStore([])
+        added_vectors = np.zeros((0, corpus.embeddings.shape[1]), dtype=np.float32)
+        if new_ids:
+            added_frame = self.storage.sections_by_id(new_ids, with_embeddings=embeddings_in_db())
+            added = SectionStore.from_frame(added_frame)
+            if len(added):
+                vectors = np.vstack(self.batch_vectors(added_frame, added, with_content=True)).astype(np.float32)
+                added_vectors = normalize_rows(vectors, copy=False)
+            if not self.keeps_content():
+                added = added.without_content()
+        
+        data = store.subset(keep).extend(added)
+        embeddings = np.vstack([corpus.embeddings[keep], added_vectors]).astype(np.float32, copy=False)
+        if len(added) + removed > len(store) // 2:
+            index = build_index(embeddings, normalized=True)
+        elif corpus.index.kind == FlatIndex.kind:
+            # A flat index is just the matrix: share the new one instead of patching a second copy
+            index = FlatIndex().build(embeddings, normalized=True)
+        else:
+            index = corpus.index.updated(keep, added_vectors)
+        
+        self.invalidate_answers(school_id)
+        self.invalidate_results(school_id)
+        # Readers holding the old corpus finish against a consistent snapshot.
+        # BM25 statistics are corpus-wide, so the keyword index is simply rebuilt.
+        self.corpora.put(school_id, SchoolCorpus(data, embeddings, index, self.build_lexical_index(data)))
+        
+        print(f"Refreshed {school_id}: +{len(added)} / -{removed} sections ({len(data)} total)")
+        return {"status": "refreshed", "school_id": school_id, "added": len(added), "removed": removed,
+                "sections": len(data)}
     
     def search(self, question: str, school_id: str, top_k: int = 3) -> List[Dict]:
         """Search for relevant sections in a specific school's handbook"""
-        if not self.initialize_school(school_id):
+        if self.pushdown is None and not self.initialize_school(school_id):
             return []
             
-        if school_id not in self.embeddings:
-            return []
+        key = (school_id, normalize_question(question), top_k)
+        generation = self.generation(school_id)
+        cached = self.search_results.get(key)
+        if cached is not None:
+            return [dict(result) for result in cached]
             
-        question_embedding = self.model.encode([question])
-        similarities = self.cosine_similarity(question_embedding, self.embeddings[school_id])[0]
-        top_indices = np.argsort(similarities)[-top_k:][::-1]
-        
-        results = []
-        school_data = self.data[school_id]
-        
-        for idx in top_indices:
-            section = school_data.iloc[idx]
-            results.append({
-                'title': section['SECTION_TITLE'],
-                'category': section['CATEGORY'],
-                'content': section['CONTENT'],
-                'excerpt': section['EXCERPT'],
-                'similarity': float(similarities[idx]),
-                'section_id': section['SECTION_ID'],
-                'school_name': section['SCHOOL_NAME'],
-                'handbook_title': section['HANDBOOK_TITLE'],
-                'academic_year': section['ACADEMIC_YEAR']
-            })
-        
-        return results
+        question_embedding = self.encode_question(question)
+        results, complete = self.retrieve_sections(question_embedding, school_id, self.candidate_count(top_k),
+                                                   question=question)
+        results = self.rerank(question, results, top_k)
+        if complete:
+            self.cache_results(key, results, generation)
+        return [dict(result) for result in results]
     
-    def generate_claude_response(self, question: str, results: List[Dict], school_name: str) -> str:
-        """Generate response using Claude AI"""
-        if not self.claude_client:
-            return self.generate_fallback_response(question, results, school_name)
+    def encode_question(self, question: str) -> np.ndarray:
+        """Question vector, from the LRU cache when the same question was asked recently"""
+        key = normalize_question(question)
+        vector = self.query_vectors.get(key)
+        if vector is None:
+            vector = self.query_encoder.encode(question)
+            self.query_vectors.put(key, vector)
+        return vector
+    
+    async def encode_question_async(self, question: str) -> np.ndarray:
+        """encode_question without blocking the event loop"""
+        key = normalize_question(question)
+        vector = self.query_vectors.get(key)
+        if vector is None:
+            vector = await self.query_encoder.encode_async(question)
+            self.query_vectors.put(key, vector)
+        return vector
+    
+    def generation(self, school_id: str) -> int:
+        """Read before a lookup and pass to cache_results / remember_answer"""
+        with self.generations_lock:
+            return self.generations.get(school_id, 0)
+    
+    def cache_results(self, key: Tuple, results: List[Dict], generation: int):
+        """Cache search results unless the school was invalidated since generation was read"""
+        with self.generations_lock:
+            if self.generations.get(key[0], 0) == generation:
+                self.search_results.put(key, results)
+    
+    def invalidate_results(self, school_id: str):
+        """Forget cached search results (and hit content) for a school whose corpus was (re)loaded"""
+        with self.generations_lock:
+            self.generations[school_id] = self.generations.get(school_id, 0) + 1
+            self.search_results.discard_where(lambda key: key[0] == school_id)
+            self.section_contents.discard_where(lambda key: key[0] == school_id)
+    
+    def candidate_count(self, top_k: int) -> int:
+        """How many sections to retrieve so the reranker has a wider set to choose from"""
+        if self.reranker is None:
+            return top_k
+        return max(top_k, int(os.getenv('RERANK_CANDIDATES', '20')))
+    
+    def rerank(self, question: str, results: List[Dict], top_k: int) -> List[Dict]:
+        """Cross-encoder rerank and score threshold, or plain truncation when disabled"""
+        if self.reranker is None:
+            return results[:top_k]
+        return self.reranker.rerank(question, results, top_k)
+    
+    def retrieve(self, question_embedding: np.ndarray, school_id: str, top_k: int = 3,
+                 question: Optional[str] = None) -> List[Dict]:
+        """Look up the top_k sections for an already encoded question"""
+        return self.retrieve_sections(question_embedding, school_id, top_k, question)[0]
+    
+    def retrieve_sections(self, question_embedding: np.ndarray, school_id: str, top_k: int = 3,
+                          question: Optional[str] = None) -> Tuple[List[Dict], bool]:
+        """retrieve, plus whether the results may be cached (False when a lookup failed)"""
+        if self.pushdown is not None:
+            # Dense only: the keyword index lives in the in-memory corpus
+            try:
+                return self.pushdown.search(question_embedding, school_id, top_k), True
+            except Exception as e:
+                # A transient warehouse error must not be remembered as "no results"
+                print(f"Pushdown search failed for {school_id}: {e}")
+                return [], False
+            
+        corpus = self.get_corpus(school_id)
+        if corpus is None:
+            return [], False
+            
+        mode = retrieval_mode() if question and corpus.lexical is not None else 'dense'
+        lexical_hits = []
+        if mode != 'dense':
+            candidates = max(top_k, int(os.getenv('HYBRID_CANDIDATES', '50')))
+            lexical_hits, _ = corpus.lexical.search(question, candidates)
         
-        if not results:
-            return f"I couldn't find relevant information in the {school_name} handbook for your question. You might want to:\n\n1. Contact the Student Affairs office directly\n2. Check the complete handbook on the university website\n3. Reach out to your academic advisor\n\nCould you try rephrasing your question with different keywords?"
+        if len(lexical_hits) == 0:
+            # Dense only, or no question term occurs anywhere in the handbook
+            top_indices, scores = corpus.index.search(question_embedding, top_k)
+        else:
+            if mode == 'lexical':
+                top_indices = lexical_hits[:top_k]
+            else:
+                dense_hits, _ = corpus.index.search(question_embedding, candidates)
+                lexical_weight = float(os.getenv('HYBRID_LEXICAL_WEIGHT', '0.5'))
+                top_indices = np.asarray(reciprocal_rank_fusion(
+                    [(dense_hits, 1.0 - lexical_weight), (lexical_hits, lexical_weight)], top_k), dtype=np.int64)
+            # Report cosine similarity whichever ranking picked the section
+            scores = corpus.embeddings[top_indices] @ normalize_query(question_embedding)
+        
+        # One tuple lookup per hit instead of a pandas row per field
+        results = corpus.data.records(top_indices)
+        for result, score in zip(results, scores):
+            result['similarity'] = float(score)
+        complete = self.hydrate_content(school_id, results)
         
+        return results, complete
+    
+    def no_results_message(self, school_name: str) -> str:
+        """Reply used when retrieval found nothing to ground an answer on"""
+        return f"I couldn't find relevant information in the {school_name} handbook for your question. You might want to:\n\n1. Contact the Student Affairs office directly\n2. Check the complete handbook on the university website\n3. Reach out to your academic advisor\n\nCould you try rephrasing your question with different keywords?"
+    
+    def build_prompt(self, question: str, results: List[Dict], school_name: str) -> str:
+        """Build the Claude prompt from the retrieved handbook sections"""
         # Build context from relevant sections
         context_parts = []
         for i, result in enumerate(results[:3], 1):
@@ -181,7 +458,7 @@ Content: {result['content'][:800]}...
         context = "\n".join(context_parts)
         
         # Enhanced prompt for policy-specific responses
-        prompt = f"""You are HandBookBot, an AI assistant specifically designed to help {school_name} students understand their student handbook and university policies.
+        return f"""You are HandBookBot, an AI assistant specifically designed to help {school_name} students understand their student handbook and university policies.
 
 IMPORTANT INSTRUCTIONS:
 1. Always cite exact sections when referencing policies
@@ -204,10 +481,20 @@ Please provide a helpful, accurate response that:
 - Is specific to {school_name}
 
 Response:"""
+    
+    def generate_claude_response(self, question: str, results: List[Dict], school_name: str) -> str:
+        """Generate response using Claude AI"""
+        if not self.claude_client:
+            return self.generate_fallback_response(question, results, school_name)
+        
+        if not results:
+            return self.no_results_message(school_name)
+        
+        prompt = self.build_prompt(question, results, school_name)
 
         try:
             message = self.claude_client.messages.create(
-                model="claude-3-7-sonnet-20250219",
+                model=CLAUDE_MODEL,
                 max_tokens=1000,
                 temperature=0.3,
                 messages=[{"role": "user", "content": prompt}]
@@ -217,6 +504,42 @@ Response:"""
             print(f"Claude API error: {e}")
             return self.generate_fallback_response(question, results, school_name)
     
+    async def claude_answer_async(self, prompt: str) -> Optional[str]:
+        """Ask Claude for an answer to a built prompt; None if the API call fails"""
+        try:
+            message = await self.async_claude_client.messages.create(
+                model=CLAUDE_MODEL,
+                max_tokens=1000,
+                temperature=0.3,
+                messages=[{"role": "user", "content": prompt}]
+            )
+            return message.content[0].text
+        except Exception as e:
+            print(f"Claude API error: {e}")
+            return None
+    
+    def cached_answer(self, school_id: str, question_embedding: np.ndarray) -> Optional[Dict]:
+        """Answer previously generated for a near-identical question about this school"""
+        if self.answer_cache is None:
+            return None
+        return self.answer_cache.get(school_id, question_embedding)
+    
+    def remember_answer(self, school_id: str, question_embedding: np.ndarray, answer: str, results: List[Dict],
+                        generation: int):
+        """Cache a Claude answer (never a fallback) with the sources it was grounded on,
+        unless the school was invalidated since generation was read"""
+        if self.answer_cache is None:
+            return
+        with self.generations_lock:
+            if self.generations.get(school_id, 0) == generation:
+                self.answer_cache.put(school_id, question_embedding, answer, [self.source_summary(r) for r in results])
+    
+    def invalidate_answers(self, school_id: str):
+        if self.answer_cache is not None:
+            with self.generations_lock:
+                self.generations[school_id] = self.generations.get(school_id, 0) + 1
+                self.answer_cache.invalidate(school_id)
+    
     def generate_fallback_response(self, question: str, results: List[Dict], school_name: str) -> str:
         """Fallback response when Claude is not available"""
         if not results:
@@ -237,12 +560,63 @@ Response:"""
         response += f"For specific questions about how this applies to your situation, please contact the {school_name} Student Affairs office for official guidance."
         return response
     
+    def get_metrics(self) -> Dict:
+        """Runtime metrics for the retrieval pipeline"""
+        return {
+            "query_batching": self.query_encoder.get_metrics(),
+            "initialized_schools": self.corpora.schools(),
+            "corpus_cache": self.corpora.get_stats(),
+            "pushdown_search": self.pushdown.get_metrics() if self.pushdown else {"enabled": False},
+            "reranking": self.reranker.get_metrics() if self.reranker else {"enabled": False},
+            "answer_cache": self.answer_cache.get_stats() if self.answer_cache else {"enabled": False},
+            "query_vector_cache": self.query_vectors.get_stats(),
+            "search_result_cache": self.search_results.get_stats(),
+            "section_content_cache": self.section_contents.get_stats(),
+            "embedding_cache": self.embedding_cache.get_stats(),
+        }
+    
+    async def run_blocking(self, func, *args):
+        """Run a blocking call on the RAG worker pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+    
+    async def search_async(self, question: str, school_id: str, top_k: int = 3,
+                           question_embedding: Optional[np.ndarray] = None) -> List[Dict]:
+        """Async variant of search: loading and scanning run off the event loop"""
+        if self.pushdown is None and not await self.initialize_school_async(school_id):
+            return []
+        
+        key = (school_id, normalize_question(question), top_k)
+        generation = self.generation(school_id)
+        cached = self.search_results.get(key)
+        if cached is not None:
+            return [dict(result) for result in cached]
+        
+        if question_embedding is None:
+            question_embedding = await self.encode_question_async(question)
+        results, complete = await self.run_blocking(self.retrieve_sections, question_embedding, school_id,
+                                                    self.candidate_count(top_k), question)
+        if self.reranker is None:
+            results = results[:top_k]
+        else:
+            results = await self.run_blocking(self.reranker.rerank, question, results, top_k)
+        if complete:
+            self.cache_results(key, results, generation)
+        return [dict(result) for result in results]
+    
     async def get_response(self, question: str, school_id: str) -> str:
         """Main method to get a response for a question about a specific school's handbook"""
         if not school_id:
             return "Please specify which school you're asking about."
         
-        relevant_sections = self.search(question, school_id, top_k=3)
+        question_embedding = await self.encode_question_async(question)
+        generation = self.generation(school_id)
+        cached = self.cached_answer(school_id, question_embedding)
+        if cached is not None:
+            return cached["answer"]
+        
+        relevant_sections = await self.search_async(question, school_id, top_k=3,
+                                                    question_embedding=question_embedding)
         
         if not relevant_sections:
             return f"I couldn't find relevant information for your question. The handbook for this school might not be available in our database yet."
@@ -250,13 +624,111 @@ Response:"""
         school_name = relevant_sections[0]['school_name'] if relevant_sections else "your school"
         
         # Use Claude for response generation if available, otherwise fallback
-        if self.claude_client:
-            response = self.generate_claude_response(question, relevant_sections, school_name)
+        if self.async_claude_client:
+            response = await self.claude_answer_async(self.build_prompt(question, relevant_sections, school_name))
+            if response is None:
+                response = self.generate_fallback_response(question, relevant_sections, school_name)
+            else:
+                self.remember_answer(school_id, question_embedding, response, relevant_sections, generation)
         else:
             response = self.generate_fallback_response(question, relevant_sections, school_name)
             
         return response
     
+    def source_summary(self, result: Dict) -> Dict:
+        """Fields of a search result that are sent to the client as a source"""
+        return {
+            'title': result['title'],
+            'category': result['category'],
+            'excerpt': result['excerpt'],
+            'similarity': result['similarity'],
+            'section_id': result['section_id'],
+            'handbook_title': result['handbook_title'],
+            'academic_year': result['academic_year']
+        }
+    
+    async def stream_text(self, text: str) -> AsyncIterator[str]:
+        """Yield a precomputed reply in word-sized chunks, like a model stream"""
+        for chunk in re.findall(r'\S+\s*|\s+', text):
+            yield chunk
+            await asyncio.sleep(0)
+    
+    async def stream_claude_response(self, question: str, results: List[Dict], school_name: str,
+                                     outcome: Optional[Dict] = None) -> AsyncIterator[str]:
+        """Stream Claude's answer token by token, falling back if it fails before any output.
+        
+        outcome["claude"] is set once Claude's stream completes, so callers can
+        tell a real answer from the fallback text.
+        """
+        if not self.async_claude_client:
+            async for chunk in self.stream_text(self.generate_fallback_response(question, results, school_name)):
+                yield chunk
+            return
+        
+        prompt = self.build_prompt(question, results, school_name)
+        emitted = False
+        try:
+            async with self.async_claude_client.messages.stream(
+                model=CLAUDE_MODEL,
+                max_tokens=1000,
+                temperature=0.3,
+                messages=[{"role": "user", "content": prompt}]
+            ) as stream:
+                async for text in stream.text_stream:
+                    emitted = True
+                    yield text
+            if outcome is not None:
+                outcome["claude"] = True
+        except Exception as e:
+            print(f"Claude API error: {e}")
+            if emitted:
+                raise
+            async for chunk in self.stream_text(self.generate_fallback_response(question, results, school_name)):
+                yield chunk
+    
+    async def stream_response(self, question: str, school_id: str) -> AsyncIterator[Dict]:
+        """Streaming variant of get_response: sources first, then answer text as it is generated"""
+        if not school_id:
+            async for chunk in self.stream_text("Please specify which school you're asking about."):
+                yield {"type": "token", "text": chunk}
+            yield {"type": "done"}
+            return
+        
+        question_embedding = await self.encode_question_async(question)
+        generation = self.generation(school_id)
+        cached = self.cached_answer(school_id, question_embedding)
+        if cached is not None:
+            yield {"type": "sources", "sources": cached["sources"]}
+            async for chunk in self.stream_text(cached["answer"]):
+                yield {"type": "token", "text": chunk}
+            yield {"type": "done", "cached": True}
+            return
+        
+        relevant_sections = await self.search_async(question, school_id, top_k=3,
+                                                    question_embedding=question_embedding)
+        yield {"type": "sources", "sources": [self.source_summary(r) for r in relevant_sections]}
+        
+        if not relevant_sections:
+            reply = "I couldn't find relevant information for your question. The handbook for this school might not be available in our database yet."
+            async for chunk in self.stream_text(reply):
+                yield {"type": "token", "text": chunk}
+            yield {"type": "done"}
+            return
+        
+        school_name = relevant_sections[0]['school_name']
+        outcome = {}
+        parts = []
+        try:
+            async for chunk in self.stream_claude_response(question, relevant_sections, school_name, outcome):
+                parts.append(chunk)
+                yield {"type": "token", "text": chunk}
+        except Exception as e:
+            yield {"type": "error", "message": str(e)}
+            return
+        if outcome.get("claude"):
+            self.remember_answer(school_id, question_embedding, ''.join(parts), relevant_sections, generation)
+        yield {"type": "done"}
+    
     def chat(self, question: str, school_id: str = None) -> Tuple[str, List[Dict]]:
         """Legacy method for backwards compatibility"""
         if not school_id:
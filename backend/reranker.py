@@ -0,0 +1,116 @@
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RERANK_MODEL = 'cross-encoder/ms-marco-MiniLM-L-6-v2'
+
+
+def rerank_enabled() -> bool:
+    return os.getenv('RERANK_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+
+
+class CrossEncoderReranker:
+    """Rescores retrieved sections against the question with a small cross-encoder.
+
+    All candidates go through one batched forward pass. Sections scoring
+    below ``min_score`` are dropped (keeping at least ``min_results``), so
+    only sections the cross-encoder considers relevant reach the prompt.
+
+    ``budget_ms`` bounds the added latency: the per-pair cost is tracked as a
+    moving average, the candidate list is cut to what fits the budget, and
+    reranking is skipped entirely (results pass through in retrieval order)
+    when even ``top_k`` pairs would not fit.
+    """
+
+    def __init__(self,
+                 model_name: Optional[str] = None,
+                 budget_ms: Optional[float] = None,
+                 min_score: Optional[float] = None,
+                 min_results: int = 1,
+                 max_chars: int = 1500):
+        self.model_name = model_name or os.getenv('RERANK_MODEL', DEFAULT_RERANK_MODEL)
+        self.budget_ms = budget_ms if budget_ms is not None else float(os.getenv('RERANK_BUDGET_MS', '150'))
+        self.min_score = min_score if min_score is not None else float(os.getenv('RERANK_MIN_SCORE', '0'))
+        self.min_results = min_results
+        self.max_chars = max_chars
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._ms_per_pair = None
+        self._stats = {"reranked": 0, "skipped": 0, "truncated": 0, "pairs": 0, "dropped_below_threshold": 0}
+        self._total_ms = 0.0
+
+    def load(self):
+        """Load the cross-encoder now (at startup) rather than inside the first reranked request."""
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name)
+                    logger.info(f"Loaded reranker {self.model_name}")
+        return self._model
+
+    def _pair_text(self, result: Dict) -> str:
+        return f"{result.get('title') or ''}\n{(result.get('content') or '')[:self.max_chars]}"
+
+    def rerank(self, question: str, results: List[Dict], top_k: int) -> List[Dict]:
+        """Reorder results by cross-encoder score and return at most top_k of them."""
+        if len(results) <= 1:
+            return results[:top_k]
+
+        candidates = results
+        if self._ms_per_pair:
+            affordable = int(self.budget_ms / self._ms_per_pair)
+            if affordable < min(top_k, len(results)):
+                with self._metrics_lock:
+                    self._stats["skipped"] += 1
+                    # Let the estimate decay so one slow pass doesn't disable reranking for good
+                    self._ms_per_pair *= 0.9
+                return results[:top_k]
+            if affordable < len(results):
+                candidates = results[:affordable]
+                with self._metrics_lock:
+                    self._stats["truncated"] += 1
+
+        try:
+            model = self.load()
+            start = time.perf_counter()
+            scores = model.predict([(question, self._pair_text(r)) for r in candidates],
+                                   batch_size=len(candidates), show_progress_bar=False)
+        except Exception as e:
+            logger.error(f"Reranking failed, keeping retrieval order: {e}")
+            with self._metrics_lock:
+                self._stats["skipped"] += 1
+            return results[:top_k]
+        elapsed_ms = 1000 * (time.perf_counter() - start)
+
+        ranked = sorted(zip(candidates, scores), key=lambda pair: pair[1], reverse=True)
+        kept = []
+        for result, score in ranked[:top_k]:
+            if score < self.min_score and len(kept) >= self.min_results:
+                break
+            kept.append({**result, 'rerank_score': float(score)})
+
+        with self._metrics_lock:
+            per_pair = elapsed_ms / len(candidates)
+            self._ms_per_pair = per_pair if self._ms_per_pair is None else 0.8 * self._ms_per_pair + 0.2 * per_pair
+            self._stats["reranked"] += 1
+            self._stats["pairs"] += len(candidates)
+            self._stats["dropped_below_threshold"] += min(top_k, len(ranked)) - len(kept)
+            self._total_ms += elapsed_ms
+        return kept
+
+    def get_metrics(self) -> Dict:
+        with self._metrics_lock:
+            return {
+                **self._stats,
+                "avg_rerank_ms": self._total_ms / self._stats["reranked"] if self._stats["reranked"] else 0.0,
+                "ms_per_pair": self._ms_per_pair or 0.0,
+                "budget_ms": self.budget_ms,
+                "min_score": self.min_score,
+                "model": self.model_name,
+            }
@@ -0,0 +1,172 @@
+import bisect
+import heapq
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_name(text: Optional[str]) -> str:
+    """Lowercase, accent-free, punctuation-free form of a school name or query."""
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(_NON_ALNUM.sub(' ', text.lower()).split())
+
+
+def trigrams(text: str) -> Set[str]:
+    """Character trigrams of a normalized string, padded so short words still have some."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _Snapshot:
+    """Immutable lookup structures for one version of the school list."""
+
+    __slots__ = ('schools', 'names', 'keys', 'tokens', 'grams')
+
+    def __init__(self, schools: Dict[str, Dict]):
+        self.schools = schools
+        # school_id -> normalized name and abbreviation
+        self.names: Dict[str, Tuple[str, ...]] = {}
+        # (normalized full name or abbreviation, school_id), sorted for prefix ranges
+        self.keys: List[Tuple[str, str]] = []
+        # (word of a name or abbreviation, school_id), sorted for per-word prefix ranges
+        self.tokens: List[Tuple[str, str]] = []
+        # trigram -> school ids whose name or abbreviation contains it
+        self.grams: Dict[str, Set[str]] = defaultdict(set)
+        for school_id, school in schools.items():
+            names = tuple(key for key in {normalize_name(school.get('school_name')),
+                                          normalize_name(school.get('school_abbreviation'))} if key)
+            self.names[school_id] = names
+            for key in names:
+                self.keys.append((key, school_id))
+                self.tokens.extend((token, school_id) for token in key.split())
+                for gram in trigrams(key):
+                    self.grams[gram].add(school_id)
+        self.keys.sort()
+        self.tokens.sort()
+
+    def prefixed(self, entries: List[Tuple[str, str]], prefix: str) -> Set[str]:
+        """School ids of entries whose key starts with prefix."""
+        start = bisect.bisect_left(entries, (prefix, ''))
+        matched = set()
+        for key, school_id in entries[start:]:
+            if not key.startswith(prefix):
+                break
+            matched.add(school_id)
+        return matched
+
+
+class SchoolDirectory:
+    """In-process copy of the schools table for autocomplete.
+
+    Loaded from storage at startup, updated as schools are added and
+    resynced periodically. Matches are ranked exact name/abbreviation,
+    then name/abbreviation prefix, then every query word prefixing a word
+    of the name, then substring (what the old ``LIKE '%term%'`` found),
+    then trigram-similar names to tolerate typos. Each rebuild produces a
+    new snapshot that replaces the old one in a single assignment, so
+    lookups never take a lock.
+    """
+
+    def __init__(self, fuzzy_threshold: Optional[float] = None):
+        self.fuzzy_threshold = fuzzy_threshold if fuzzy_threshold is not None else float(
+            os.getenv('SCHOOL_FUZZY_THRESHOLD', '0.5'))
+        self._snapshot: Optional[_Snapshot] = None
+        self._write_lock = threading.Lock()
+        self._stats = {"searches": 0, "syncs": 0, "sync_failures": 0, "added": 0}
+        self._last_sync: Optional[float] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._snapshot is not None
+
+    def sync(self, storage) -> int:
+        """Replace the directory with the schools currently in storage; returns how many."""
+        try:
+            schools = storage.list_schools()
+        except Exception:
+            self._stats["sync_failures"] += 1
+            raise
+        snapshot = _Snapshot({school['school_id']: school for school in schools})
+        with self._write_lock:
+            self._snapshot = snapshot
+            self._stats["syncs"] += 1
+            self._last_sync = time.time()
+        logger.info(f"School directory synced: {len(schools)} schools")
+        return len(schools)
+
+    def add(self, school: Dict):
+        """Make a newly inserted school searchable right away."""
+        with self._write_lock:
+            schools = dict(self._snapshot.schools) if self._snapshot else {}
+            schools[school['school_id']] = school
+            self._snapshot = _Snapshot(schools)
+            self._stats["added"] += 1
+
+    def search(self, query: str, limit: int = 10) -> List[Dict]:
+        """Best matching schools for an autocomplete query, best first."""
+        snapshot = self._snapshot
+        term = normalize_name(query)
+        self._stats["searches"] += 1
+        if snapshot is None or not term:
+            return []
+
+        # school_id -> (tier, score) of its best match; lower tiers rank first
+        tiers: Dict[str, Tuple[int, float]] = {}
+
+        def rank(school_ids, tier: int, score: float = 0.0):
+            for school_id in school_ids:
+                best = tiers.get(school_id)
+                if best is None or (tier, -score) < (best[0], -best[1]):
+                    tiers[school_id] = (tier, score)
+
+        prefixed = snapshot.prefixed(snapshot.keys, term)
+        rank((school_id for school_id in prefixed if term in snapshot.names[school_id]), 0)
+        rank(prefixed, 1)
+
+        words = term.split()
+        word_matches = snapshot.prefixed(snapshot.tokens, words[0])
+        for word in words[1:]:
+            word_matches &= snapshot.prefixed(snapshot.tokens, word)
+        rank(word_matches, 2)
+
+        # Lower tiers can't reach the top `limit` once that many better matches exist
+        if len(tiers) < limit:
+            if len(term) >= 3:
+                # Only schools holding every trigram of the term can contain it
+                postings = sorted((snapshot.grams.get(term[i:i + 3], set()) for i in range(len(term) - 2)), key=len)
+                candidates = postings[0].intersection(*postings[1:])
+            else:
+                candidates = snapshot.names.keys()
+            rank((school_id for school_id in candidates if any(term in key for key in snapshot.names[school_id])), 3)
+
+        if len(tiers) < limit:
+            # Typos: share of the query's trigrams found in the name or abbreviation
+            query_grams = trigrams(term)
+            shared = Counter()
+            for gram in query_grams:
+                shared.update(snapshot.grams.get(gram, ()))
+            for school_id, count in shared.items():
+                score = count / len(query_grams)
+                if score >= self.fuzzy_threshold:
+                    rank((school_id,), 4, score)
+
+        ranked = heapq.nsmallest(limit, tiers, key=lambda school_id: (
+            tiers[school_id][0], -tiers[school_id][1], snapshot.schools[school_id].get('school_name') or ''))
+        return [dict(snapshot.schools[school_id]) for school_id in ranked]
+
+    def get_stats(self) -> Dict:
+        snapshot = self._snapshot
+        return {
+            **self._stats,
+            "schools": len(snapshot.schools) if snapshot else 0,
+            "last_sync": self._last_sync,
+        }
@@ -0,0 +1,107 @@
+import sys
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from embedding_cache import searchable_text
+
+# Result field -> column returned by storage.SECTION_SELECT
+SECTION_FIELDS = (
+    ('section_id', 'SECTION_ID'),
+    ('title', 'SECTION_TITLE'),
+    ('category', 'CATEGORY'),
+    ('section_group', 'SECTION_GROUP'),
+    ('content', 'CONTENT'),
+    ('excerpt', 'EXCERPT'),
+    ('school_name', 'SCHOOL_NAME'),
+    ('handbook_title', 'HANDBOOK_TITLE'),
+    ('academic_year', 'ACADEMIC_YEAR'),
+)
+FIELD_NAMES = tuple(field for field, _ in SECTION_FIELDS)
+CONTENT_POSITION = FIELD_NAMES.index('content')
+
+# Values repeated across many rows of a school; one shared str object each
+INTERNED_FIELDS = {'title', 'category', 'section_group', 'school_name', 'handbook_title', 'academic_year'}
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class SectionStore:
+    """Compact, read-only section rows for one school.
+
+    Each section is one tuple in ``FIELD_NAMES`` order, so building a search
+    result is a single list index. Low-cardinality strings are interned and
+    the searchable text, topics and tags that only matter while embedding are
+    not kept at all.
+    """
+
+    __slots__ = ('rows', '_nbytes')
+
+    def __init__(self, rows: List[Tuple]):
+        self.rows = rows
+        self._nbytes = None
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> 'SectionStore':
+        columns = []
+        for field, column in SECTION_FIELDS:
+            values = frame[column].tolist() if column in frame.columns else [None] * len(frame)
+            if field in INTERNED_FIELDS:
+                values = [_intern(value) for value in values]
+            columns.append(values)
+        return cls(list(zip(*columns)))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def record(self, position: int) -> Dict:
+        """Fields of one section as a dict keyed by FIELD_NAMES."""
+        return dict(zip(FIELD_NAMES, self.rows[position]))
+
+    def records(self, positions: Iterable[int]) -> List[Dict]:
+        rows = self.rows
+        return [dict(zip(FIELD_NAMES, rows[position])) for position in positions]
+
+    def section_ids(self) -> List[str]:
+        return [row[0] for row in self.rows]
+
+    def searchable_texts(self) -> List[str]:
+        """Title, content and category of each row, as embedded and keyword-indexed."""
+        return [searchable_text(title, content, category)
+                for _, title, category, _, content, *_ in self.rows]
+
+    def subset(self, keep: Sequence[bool]) -> 'SectionStore':
+        """Rows where keep is true, in order."""
+        return SectionStore([row for row, kept in zip(self.rows, keep) if kept])
+
+    def without_content(self) -> 'SectionStore':
+        """Same rows with content set to None, for corpora that fetch it per hit."""
+        return SectionStore([row[:CONTENT_POSITION] + (None,) + row[CONTENT_POSITION + 1:] for row in self.rows])
+
+    def extend(self, other: 'SectionStore') -> 'SectionStore':
+        """This store's rows followed by other's, as a new store."""
+        return SectionStore(self.rows + other.rows)
+
+    @property
+    def nbytes(self) -> int:
+        """Resident size of the row list, tuples and (distinct) values."""
+        if self._nbytes is None:
+            seen = set()
+            size = sys.getsizeof(self.rows)
+            for row in self.rows:
+                size += sys.getsizeof(row)
+                for value in row:
+                    if value is not None and id(value) not in seen:
+                        seen.add(id(value))
+                        size += sys.getsizeof(value)
+            self._nbytes = size
+        return self._nbytes
+
+
+def positions_of(store: SectionStore, section_ids: Iterable[str]) -> np.ndarray:
+    """Boolean mask over the store's rows whose section_id is in section_ids."""
+    wanted = set(section_ids)
+    return np.fromiter((row[0] in wanted for row in store.rows), dtype=bool, count=len(store))
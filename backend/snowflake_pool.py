@@ -0,0 +1,193 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import snowflake.connector
+
+logger = logging.getLogger(__name__)
+
+
+def snowflake_config() -> Dict[str, Optional[str]]:
+    """Connection parameters shared by every backend module."""
+    return {
+        'user': os.getenv('SNOWFLAKE_USER'),
+        'password': os.getenv('SNOWFLAKE_PASSWORD'),
+        'account': os.getenv('SNOWFLAKE_ACCOUNT'),
+        'warehouse': os.getenv('SNOWFLAKE_WAREHOUSE'),
+        'database': os.getenv('SNOWFLAKE_DATABASE'),
+        'schema': os.getenv('SNOWFLAKE_SCHEMA')
+    }
+
+
+class SnowflakeConnectionPool:
+    """Process-wide pool of Snowflake connections.
+
+    Connections are checked out per request with :meth:`connection` and
+    returned afterwards instead of being closed, so only the first request
+    pays for login. Idle connections are health-checked before reuse and
+    recycled once they have been idle for ``max_idle_seconds`` or alive for
+    ``max_lifetime_seconds``.
+    """
+
+    def __init__(self,
+                 max_size: Optional[int] = None,
+                 max_idle_seconds: Optional[float] = None,
+                 max_lifetime_seconds: Optional[float] = None,
+                 checkout_timeout: Optional[float] = None,
+                 health_check_after: Optional[float] = None):
+        self.max_size = max_size or int(os.getenv('SNOWFLAKE_POOL_SIZE', '5'))
+        self.max_idle_seconds = max_idle_seconds or float(os.getenv('SNOWFLAKE_POOL_MAX_IDLE_SECONDS', '600'))
+        self.max_lifetime_seconds = max_lifetime_seconds or float(os.getenv('SNOWFLAKE_POOL_MAX_LIFETIME_SECONDS', '3600'))
+        self.checkout_timeout = checkout_timeout or float(os.getenv('SNOWFLAKE_POOL_TIMEOUT_SECONDS', '30'))
+        # Connections used within this many seconds are trusted without a ping
+        self.health_check_after = health_check_after if health_check_after is not None else 30.0
+
+        self._idle: List[Tuple[object, float, float]] = []  # (conn, created_at, last_used)
+        self._created_at: Dict[int, float] = {}
+        self._in_use = 0
+        self._condition = threading.Condition()
+        self._stats = {"created": 0, "reused": 0, "recycled": 0, "failed_health_checks": 0}
+
+    def _connect(self):
+        conn = snowflake.connector.connect(**snowflake_config())
+        with self._condition:
+            self._stats["created"] += 1
+            self._created_at[id(conn)] = time.monotonic()
+        logger.info("Opened new pooled Snowflake connection")
+        return conn
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, conn) -> bool:
+        try:
+            if conn.is_closed():
+                return False
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _take_idle(self, stale: List):
+        """Pop a reusable idle connection, moving stale ones to stale for closing. Caller holds the lock."""
+        now = time.monotonic()
+        while self._idle:
+            conn, created_at, last_used = self._idle.pop()
+            if now - last_used > self.max_idle_seconds or now - created_at > self.max_lifetime_seconds:
+                self._stats["recycled"] += 1
+                self._created_at.pop(id(conn), None)
+                stale.append(conn)
+                continue
+            return conn, last_used
+        return None, None
+
+    def acquire(self):
+        """Check out a connection, waiting up to checkout_timeout for a free slot."""
+        deadline = time.monotonic() + self.checkout_timeout
+        stale = []
+        try:
+            with self._condition:
+                while True:
+                    conn, last_used = self._take_idle(stale)
+                    if conn is not None:
+                        self._in_use += 1
+                        break
+                    if self._in_use < self.max_size:
+                        self._in_use += 1
+                        conn = None
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError("Timed out waiting for a Snowflake connection")
+                    self._condition.wait(remaining)
+        finally:
+            # Network work happens outside the lock
+            for stale_conn in stale:
+                self._close_quietly(stale_conn)
+
+        try:
+            if conn is not None:
+                healthy = time.monotonic() - last_used <= self.health_check_after or self._is_healthy(conn)
+                with self._condition:
+                    if healthy:
+                        self._stats["reused"] += 1
+                        return conn
+                    self._stats["failed_health_checks"] += 1
+                    self._created_at.pop(id(conn), None)
+                self._close_quietly(conn)
+            return self._connect()
+        except Exception:
+            with self._condition:
+                self._in_use -= 1
+                self._condition.notify()
+            raise
+
+    def release(self, conn, discard: bool = False):
+        """Return a connection to the pool, or close it when discard is set."""
+        with self._condition:
+            self._in_use -= 1
+            created_at = self._created_at.get(id(conn), time.monotonic())
+            if discard or len(self._idle) >= self.max_size:
+                self._created_at.pop(id(conn), None)
+                self._close_quietly(conn)
+            else:
+                self._idle.append((conn, created_at, time.monotonic()))
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the duration of a with-block.
+
+        A connection whose block raised or was abandoned (a generator closed
+        mid-iteration) is closed rather than reused, since it may be left
+        mid-transaction or mid-result.
+        """
+        conn = self.acquire()
+        discard = True
+        try:
+            yield conn
+            discard = False
+        finally:
+            # Also runs on GeneratorExit, when a generator holding the connection is abandoned
+            self.release(conn, discard=discard)
+
+    def close_all(self):
+        """Close every idle connection (used at shutdown)."""
+        with self._condition:
+            idle, self._idle = self._idle, []
+            for conn, _, _ in idle:
+                self._created_at.pop(id(conn), None)
+        for conn, _, _ in idle:
+            self._close_quietly(conn)
+
+    def get_stats(self) -> Dict:
+        with self._condition:
+            return {
+                **self._stats,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "max_size": self.max_size,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> SnowflakeConnectionPool:
+    """Return the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = SnowflakeConnectionPool()
+    return _pool
@@ -0,0 +1,171 @@
+import csv
+import logging
+import os
+import tempfile
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+from snowflake.connector.errors import NotSupportedError, ProgrammingError
+
+from embedding_cache import EMBEDDING_DIMENSION
+from snowflake_pool import get_pool
+from storage import HandbookRepository, HandbookWriter, SchoolExistsError, section_row
+
+logger = logging.getLogger(__name__)
+
+# JSON columns are bound as strings and converted on the server with these expressions
+JSON_SECTION_COLUMNS = {
+    'topics': 'PARSE_JSON({})',
+    'tags': 'PARSE_JSON({})',
+    'embedding': f'PARSE_JSON({{}})::ARRAY::VECTOR(FLOAT, {EMBEDDING_DIMENSION})',
+}
+
+
+class SnowflakeWriter(HandbookWriter):
+    def write_sections(self, sections: List[Dict], columns: List[str], mode: Optional[str]):
+        """Insert sections with the mode from SECTION_INGEST_MODE.
+
+        Modes:
+            insert: multi-row INSERT statements in chunks of SECTION_INSERT_CHUNK_SIZE rows
+            stage:  write a local CSV, PUT it to the table stage and COPY INTO
+            auto:   stage when there are at least SECTION_STAGE_THRESHOLD sections, else insert
+        """
+        mode = (mode or os.getenv('SECTION_INGEST_MODE', 'auto')).lower()
+        if mode == 'auto':
+            threshold = int(os.getenv('SECTION_STAGE_THRESHOLD', '500'))
+            mode = 'stage' if len(sections) >= threshold else 'insert'
+        if mode == 'stage':
+            return mode, self._copy_sections_from_stage(sections, columns)
+        return 'insert', self._insert_sections_multirow(sections, columns)
+
+    def _select_list(self, ref: str, columns: List[str]) -> str:
+        """SELECT expressions over positional columns (column1 / $1), converting JSON columns."""
+        exprs = []
+        for i, col in enumerate(columns, start=1):
+            expr = ref.format(i)
+            exprs.append(JSON_SECTION_COLUMNS[col].format(expr) if col in JSON_SECTION_COLUMNS else expr)
+        return ", ".join(exprs + ["CURRENT_TIMESTAMP"])
+
+    def _insert_sections_multirow(self, sections: List[Dict], columns: List[str]) -> int:
+        """Insert sections with one multi-row INSERT ... SELECT FROM VALUES per chunk."""
+        chunk_rows = int(os.getenv('SECTION_INSERT_CHUNK_SIZE', '100'))
+        # Keep each statement comfortably under Snowflake's statement size limit
+        chunk_bytes = int(os.getenv('SECTION_INSERT_CHUNK_BYTES', str(512 * 1024)))
+
+        insert_prefix = f"""
+        INSERT INTO handbook_sections ({", ".join(columns)}, created_at)
+        SELECT {self._select_list("column{}", columns)}
+        FROM VALUES """
+        placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
+
+        statements = 0
+        rows, params, size = [], [], 0
+        for section in sections:
+            row = section_row(section, columns)
+            rows.append(placeholders)
+            params.extend(row)
+            size += sum(len(value) for value in row if isinstance(value, str))
+            if len(rows) >= chunk_rows or size >= chunk_bytes:
+                self.cursor.execute(insert_prefix + ", ".join(rows), params)
+                statements += 1
+                rows, params, size = [], [], 0
+
+        if rows:
+            self.cursor.execute(insert_prefix + ", ".join(rows), params)
+            statements += 1
+        return statements
+
+    def _copy_sections_from_stage(self, sections: List[Dict], columns: List[str]) -> int:
+        """Write sections to a local CSV, upload it to the table stage and COPY INTO."""
+        temp_dir = tempfile.mkdtemp()
+        file_name = f"sections_{uuid.uuid4().hex}.csv"
+        file_path = os.path.join(temp_dir, file_name)
+        try:
+            with open(file_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+                for section in sections:
+                    writer.writerow(section_row(section, columns))
+
+            put_path = Path(file_path).as_posix()
+            self.cursor.execute(f"PUT 'file://{put_path}' @%handbook_sections AUTO_COMPRESS=TRUE OVERWRITE=TRUE")
+            self.cursor.execute(f"""
+            COPY INTO handbook_sections ({", ".join(columns)}, created_at)
+            FROM (SELECT {self._select_list("${}", columns)} FROM @%handbook_sections)
+            FILES = ('{file_name}.gz')
+            FILE_FORMAT = (TYPE = CSV FIELD_OPTIONALLY_ENCLOSED_BY = '"' ENCODING = 'UTF8')
+            PURGE = TRUE
+            """)
+            return 2
+        finally:
+            try:
+                os.remove(file_path)
+                os.rmdir(temp_dir)
+            except OSError:
+                pass
+
+
+class SnowflakeRepository(HandbookRepository):
+    """Handbook data in Snowflake, through the shared connection pool."""
+
+    name = 'snowflake'
+    query_vector_expression = f'PARSE_JSON(%(query)s)::ARRAY::VECTOR(FLOAT, {EMBEDDING_DIMENSION})'
+
+    def connection(self):
+        return get_pool().connection()
+
+    @contextmanager
+    def ingest(self) -> Iterator[SnowflakeWriter]:
+        try:
+            conn = get_pool().acquire()
+        except Exception as e:
+            raise Exception(f"Failed to connect to Snowflake: {e}")
+
+        failed = False
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            conn.execute_string("BEGIN")
+            try:
+                yield SnowflakeWriter(cursor)
+                conn.execute_string("COMMIT")
+            except Exception as e:
+                conn.execute_string("ROLLBACK")
+                logger.error(f"Transaction rolled back due to error: {str(e)}")
+                raise
+        except Exception:
+            failed = True
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
+            # A connection from a failed job may be mid-transaction; don't reuse it
+            get_pool().release(conn, discard=failed)
+
+    def close(self):
+        get_pool().close_all()
+
+    def get_stats(self) -> Dict:
+        return {"backend": self.name, "pool": get_pool().get_stats()}
+
+    def result_batches(self, cursor, batch_size: int = 5000) -> Iterator[pd.DataFrame]:
+        """DataFrames straight from the connector's Arrow batches when it can produce them."""
+        try:
+            batches = cursor.fetch_pandas_batches()
+        except (NotSupportedError, ProgrammingError):
+            # pyarrow not installed, or the result came back as JSON
+            batches = None
+        if batches is None:
+            yield from super().result_batches(cursor, batch_size)
+        else:
+            yield from batches
+
+    def insert_school(self, school_id: str, school_name: str, school_abbreviation: Optional[str]):
+        try:
+            super().insert_school(school_id, school_name, school_abbreviation)
+        except Exception as e:
+            if "already exists" in str(e).lower():
+                raise SchoolExistsError(school_id) from e
+            raise
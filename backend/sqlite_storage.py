@@ -0,0 +1,202 @@
+import functools
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from storage import HandbookRepository, HandbookWriter, SchoolExistsError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(__file__), 'handbooks.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS schools (
+    school_id TEXT PRIMARY KEY,
+    school_name TEXT NOT NULL,
+    school_abbreviation TEXT,
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS handbooks (
+    handbook_id TEXT PRIMARY KEY,
+    school_id TEXT NOT NULL,
+    handbook_title TEXT,
+    academic_year TEXT,
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS handbook_sections (
+    section_id TEXT PRIMARY KEY,
+    handbook_id TEXT NOT NULL,
+    section_group TEXT,
+    section_key TEXT,
+    page TEXT,
+    section_title TEXT,
+    category TEXT,
+    type TEXT,
+    content TEXT,
+    raw_text TEXT,
+    excerpt TEXT,
+    topics TEXT,
+    tags TEXT,
+    chunk_index INTEGER,
+    char_start INTEGER,
+    char_end INTEGER,
+    embedding BLOB,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS handbooks_school ON handbooks (school_id);
+CREATE INDEX IF NOT EXISTS handbook_sections_handbook ON handbook_sections (handbook_id);
+"""
+
+_PLACEHOLDER = re.compile(r'%\((\w+)\)s')
+
+
+@functools.lru_cache(maxsize=16)
+def _parse_json_vector(text: str) -> np.ndarray:
+    return np.asarray(json.loads(text), dtype=np.float32)
+
+
+def _vector(value) -> np.ndarray:
+    return np.frombuffer(value, dtype=np.float32) if isinstance(value, bytes) else _parse_json_vector(value)
+
+
+def _vector_cosine_similarity(stored, query) -> Optional[float]:
+    """VECTOR_COSINE_SIMILARITY for vectors stored as float32 blobs or bound as JSON."""
+    if stored is None or query is None:
+        return None
+    a, b = _vector(stored), _vector(query)
+    norm = float(np.linalg.norm(a) * np.linalg.norm(b))
+    return float(a @ b) / norm if norm else 0.0
+
+
+class _Cursor:
+    """sqlite3 cursor that takes the pyformat parameters the shared SQL is written with."""
+
+    def __init__(self, cursor: sqlite3.Cursor):
+        self._cursor = cursor
+
+    def execute(self, sql: str, params: Optional[Dict] = None):
+        self._cursor.execute(_PLACEHOLDER.sub(r':\1', sql), params or {})
+        return self
+
+    def executemany(self, sql: str, seq_of_params):
+        self._cursor.executemany(_PLACEHOLDER.sub(r':\1', sql), seq_of_params)
+        return self
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchmany(self, size: int):
+        return self._cursor.fetchmany(size)
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self) -> int:
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+
+class _Connection:
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+
+    def cursor(self) -> _Cursor:
+        return _Cursor(self._conn.cursor())
+
+
+class SQLiteWriter(HandbookWriter):
+    def section_params(self, section: Dict, columns: List[str]) -> Dict:
+        params = super().section_params(section, columns)
+        # Vectors are stored as float32 blobs rather than JSON
+        if params.get('embedding') is not None:
+            params['embedding'] = np.asarray(section['embedding'], dtype=np.float32).tobytes()
+        return params
+
+
+class SQLiteRepository(HandbookRepository):
+    """Handbook data in an embedded SQLite file, for edge deployments, tests and benchmarks.
+
+    Runs the same SQL as Snowflake: pyformat parameters are rewritten for
+    sqlite3, and VECTOR_COSINE_SIMILARITY is registered as a function so
+    pushdown retrieval works too (scanning rows in Python).
+    One connection is shared by every thread, behind a lock; ``':memory:'``
+    gives a throwaway database.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv('SQLITE_PATH') or DEFAULT_SQLITE_PATH
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.create_function('VECTOR_COSINE_SIMILARITY', 2, _vector_cosine_similarity, deterministic=True)
+        if self.path != ':memory:':
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def connection(self):
+        with self._lock:
+            yield _Connection(self._conn)
+
+    @contextmanager
+    def ingest(self) -> Iterator[SQLiteWriter]:
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute("BEGIN")
+            try:
+                yield SQLiteWriter(_Cursor(cursor))
+                cursor.execute("COMMIT")
+            except Exception as e:
+                cursor.execute("ROLLBACK")
+                logger.error(f"Transaction rolled back due to error: {str(e)}")
+                raise
+            finally:
+                cursor.close()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def get_stats(self) -> Dict:
+        return {"backend": self.name, "path": self.path}
+
+    def school_section_batches(self, school_id: str, with_content: bool = True, with_embeddings: bool = False,
+                               batch_size: int = 5000) -> Iterator[pd.DataFrame]:
+        """One keyset-paged query per batch, so the shared connection's lock isn't held
+        while the caller processes (and encodes) a batch."""
+        where = f"""
+        WHERE s.school_id = %(school_id)s
+        AND LENGTH(hs.content) > 50
+        AND hs.section_id > %(after)s
+        ORDER BY hs.section_id
+        LIMIT {int(batch_size)}
+        """
+        sql = self.section_query(where, with_content=with_content, with_embeddings=with_embeddings, with_tags=False)
+        after = ''
+        while True:
+            batch = self._frame(sql, {"school_id": school_id, "after": after})
+            if batch.empty:
+                return
+            yield batch
+            if len(batch) < batch_size:
+                return
+            after = batch['SECTION_ID'].iloc[-1]
+
+    def insert_school(self, school_id: str, school_name: str, school_abbreviation: Optional[str]):
+        try:
+            super().insert_school(school_id, school_name, school_abbreviation)
+        except sqlite3.IntegrityError as e:
+            raise SchoolExistsError(school_id) from e
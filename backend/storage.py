@@ -0,0 +1,360 @@
+import json
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+from section_store import FIELD_NAMES
+
+logger = logging.getLogger(__name__)
+
+# Columns written for each handbook section, in insert order
+SECTION_COLUMNS = [
+    'section_id', 'handbook_id', 'section_group', 'section_key', 'page', 'section_title',
+    'category', 'type', 'content', 'raw_text', 'excerpt', 'topics', 'tags'
+]
+# Written only when sections carry them (chunking / stored embeddings), since
+# they need columns added to handbook_sections first
+OPTIONAL_SECTION_COLUMNS = ['chunk_index', 'char_start', 'char_end', 'embedding']
+# Array values, bound as JSON text and converted by each backend
+JSON_COLUMNS = ('topics', 'tags', 'embedding')
+
+SECTION_SELECT = """
+SELECT
+    hs.section_id,
+    hs.section_title,
+    hs.category,
+    hs.section_group,
+    {content},
+    hs.excerpt,
+    {extra_columns}
+    h.handbook_title,
+    h.academic_year,
+    s.school_name
+FROM handbook_sections hs
+JOIN handbooks h ON hs.handbook_id = h.handbook_id
+JOIN schools s ON h.school_id = s.school_id
+{where}
+"""
+
+# Same columns as SECTION_FIELDS, in FIELD_NAMES order, plus the similarity
+SIMILAR_SECTIONS_QUERY = """
+SELECT
+    hs.section_id,
+    hs.section_title,
+    hs.category,
+    hs.section_group,
+    hs.content,
+    hs.excerpt,
+    s.school_name,
+    h.handbook_title,
+    h.academic_year,
+    VECTOR_COSINE_SIMILARITY(hs.embedding, {query_vector}) AS similarity
+FROM handbook_sections hs
+JOIN handbooks h ON hs.handbook_id = h.handbook_id
+JOIN schools s ON h.school_id = s.school_id
+WHERE s.school_id = %(school_id)s
+AND hs.embedding IS NOT NULL
+AND LENGTH(hs.content) > 50
+ORDER BY similarity DESC
+LIMIT {top_k}
+"""
+
+
+class SchoolExistsError(Exception):
+    """Raised by insert_school when the school id is already taken."""
+
+
+def section_columns(sections: List[Dict]) -> List[str]:
+    """SECTION_COLUMNS, plus whichever optional columns these sections carry."""
+    if not sections:
+        return SECTION_COLUMNS
+    return SECTION_COLUMNS + [col for col in OPTIONAL_SECTION_COLUMNS if col in sections[0]]
+
+
+def section_row(section: Dict, columns: List[str] = SECTION_COLUMNS) -> List:
+    """Flatten a section dict into column order, JSON-encoding array columns."""
+    return [json.dumps(section[col]) if col in JSON_COLUMNS else section[col] for col in columns]
+
+
+def _isoformat(value) -> Optional[str]:
+    if value is None:
+        return None
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def _school(row) -> Dict:
+    return {"school_id": row[0], "school_name": row[1], "school_abbreviation": row[2],
+            "created_at": _isoformat(row[3])}
+
+
+def _id_chunks(ids: List[str], chunk_size: int = 1000):
+    """(IN list, params) for ids in chunks small enough for one statement each."""
+    for start in range(0, len(ids), chunk_size):
+        params = {f"id{i}": value for i, value in enumerate(ids[start:start + chunk_size])}
+        yield "(" + ", ".join(f"%({key})s" for key in params) + ")", params
+
+
+class HandbookWriter:
+    """Writes for one handbook ingest, inside the transaction opened by ``ingest()``.
+
+    ``cursor`` takes pyformat parameters. Backends override
+    :meth:`write_sections` with their fastest bulk path.
+    """
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def delete_handbook(self, handbook_id: str) -> int:
+        """Remove a previously processed copy of this handbook; returns the sections deleted."""
+        self.cursor.execute("DELETE FROM handbook_sections WHERE handbook_id = %(handbook_id)s",
+                            {'handbook_id': handbook_id})
+        deleted = self.cursor.rowcount or 0
+        self.cursor.execute("DELETE FROM handbooks WHERE handbook_id = %(handbook_id)s",
+                            {'handbook_id': handbook_id})
+        if deleted:
+            logger.info(f"Replacing {deleted} existing sections for handbook {handbook_id}")
+        return deleted
+
+    def insert_handbook(self, handbook_id: str, school_id: str, handbook_title: str, academic_year: str):
+        self.cursor.execute("""
+        INSERT INTO handbooks (handbook_id, school_id, handbook_title, academic_year, created_at)
+        VALUES (%(handbook_id)s, %(school_id)s, %(handbook_title)s, %(academic_year)s, CURRENT_TIMESTAMP)
+        """, {
+            'handbook_id': handbook_id,
+            'school_id': school_id,
+            'handbook_title': handbook_title,
+            'academic_year': academic_year
+        })
+        logger.info(f"Inserted handbook record: {handbook_id}")
+
+    def insert_sections(self, sections: List[Dict], mode: Optional[str] = None) -> Dict:
+        """Bulk insert sections and return ingest statistics."""
+        start = time.perf_counter()
+        if sections:
+            mode, statements = self.write_sections(sections, section_columns(sections), mode)
+        else:
+            mode, statements = mode or 'insert', 0
+
+        seconds = time.perf_counter() - start
+        stats = {
+            "mode": mode,
+            "rows": len(sections),
+            "statements": statements,
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(len(sections) / seconds, 1) if seconds > 0 else None
+        }
+        logger.info(f"Inserted {len(sections)} sections via {mode} in {seconds:.2f}s ({statements} statements)")
+        return stats
+
+    def write_sections(self, sections: List[Dict], columns: List[str], mode: Optional[str]):
+        """Insert the rows; returns (mode used, statements executed)."""
+        placeholders = ", ".join(f"%({col})s" for col in columns)
+        self.cursor.executemany(
+            f"INSERT INTO handbook_sections ({', '.join(columns)}, created_at) VALUES ({placeholders}, CURRENT_TIMESTAMP)",
+            [self.section_params(section, columns) for section in sections])
+        return 'executemany', 1
+
+    def section_params(self, section: Dict, columns: List[str]) -> Dict:
+        return dict(zip(columns, section_row(section, columns)))
+
+
+class HandbookRepository(ABC):
+    """Every read and write the backend makes against schools, handbooks and sections.
+
+    The SQL here is shared; a backend supplies ``connection()`` (a DB-API
+    connection whose cursors take pyformat parameters), ``ingest()`` (a
+    transaction around a :class:`HandbookWriter`) and the expression that
+    turns the bound question vector into its vector type.
+    """
+
+    name = 'base'
+    query_vector_expression = '%(query)s'
+
+    @abstractmethod
+    def connection(self):
+        """Context manager yielding a connection."""
+
+    @abstractmethod
+    def ingest(self) -> Iterator[HandbookWriter]:
+        """Context manager yielding a writer; commits on exit, rolls back on error."""
+
+    def close(self):
+        pass
+
+    def get_stats(self) -> Dict:
+        return {"backend": self.name}
+
+    def _query(self, sql: str, params: Optional[Dict] = None) -> List[tuple]:
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql, params or {})
+                return cursor.fetchall()
+            finally:
+                cursor.close()
+
+    def _frame(self, sql: str, params: Dict) -> pd.DataFrame:
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql, params)
+                rows = cursor.fetchall()
+                columns = [column[0].upper() for column in cursor.description]
+            finally:
+                cursor.close()
+        return pd.DataFrame.from_records(rows, columns=columns)
+
+    def result_batches(self, cursor, batch_size: int = 5000) -> Iterator[pd.DataFrame]:
+        """DataFrames of batch_size rows for an executed query."""
+        columns = [column[0].upper() for column in cursor.description]
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield pd.DataFrame.from_records(rows, columns=columns)
+
+    # Schools and handbooks
+
+    def search_schools(self, search_term: str, limit: int = 10) -> List[Dict]:
+        """Schools whose name or abbreviation contains search_term."""
+        rows = self._query(f"""
+        SELECT school_id, school_name, school_abbreviation, created_at
+        FROM schools
+        WHERE LOWER(school_name) LIKE LOWER(%(search)s)
+           OR LOWER(school_abbreviation) LIKE LOWER(%(search)s)
+        ORDER BY school_name
+        LIMIT {int(limit)}
+        """, {"search": f"%{search_term}%"})
+        return [_school(row) for row in rows]
+
+    def list_schools(self) -> List[Dict]:
+        """Every school, for the in-process school directory."""
+        rows = self._query("""
+        SELECT school_id, school_name, school_abbreviation, created_at
+        FROM schools
+        """)
+        return [_school(row) for row in rows]
+
+    def insert_school(self, school_id: str, school_name: str, school_abbreviation: Optional[str]):
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("""
+                INSERT INTO schools (school_id, school_name, school_abbreviation, created_at)
+                VALUES (%(school_id)s, %(school_name)s, %(school_abbreviation)s, CURRENT_TIMESTAMP)
+                """, {
+                    "school_id": school_id,
+                    "school_name": school_name,
+                    "school_abbreviation": school_abbreviation or None
+                })
+            finally:
+                cursor.close()
+
+    def list_handbooks(self, school_id: str) -> List[Dict]:
+        """A school's handbooks, newest first."""
+        rows = self._query("""
+        SELECT handbook_id, handbook_title, academic_year, created_at
+        FROM handbooks
+        WHERE school_id = %(school_id)s
+        ORDER BY created_at DESC
+        """, {"school_id": school_id})
+        return [{"handbook_id": row[0], "handbook_title": row[1], "academic_year": row[2],
+                 "created_at": _isoformat(row[3])} for row in rows]
+
+    # Sections
+
+    def section_query(self, where: str, with_content: bool = True, with_embeddings: bool = False,
+                      with_tags: bool = True) -> str:
+        """SELECT for handbook sections with their handbook and school fields."""
+        extra_columns = "hs.topics, hs.tags," if with_tags else ""
+        if with_embeddings:
+            extra_columns += " hs.embedding,"
+        return SECTION_SELECT.format(content="hs.content" if with_content else "NULL AS content",
+                                     extra_columns=extra_columns, where=where)
+
+    def sections_by_id(self, section_ids: List[str], with_embeddings: bool = False) -> pd.DataFrame:
+        frames = [self._frame(self.section_query(f"WHERE hs.section_id IN {in_list}", with_embeddings=with_embeddings),
+                              params)
+                  for in_list, params in _id_chunks(section_ids)]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def school_section_batches(self, school_id: str, with_content: bool = True,
+                               with_embeddings: bool = False) -> Iterator[pd.DataFrame]:
+        """A school's sections as a stream of DataFrames, with only the columns a corpus needs.
+
+        No TOPICS/TAGS (unused at query time) and no ORDER BY (positions are arbitrary anyway).
+        """
+        where = """
+        WHERE s.school_id = %(school_id)s
+        AND LENGTH(hs.content) > 50
+        """
+        sql = self.section_query(where, with_content=with_content, with_embeddings=with_embeddings, with_tags=False)
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql, {"school_id": school_id})
+                yield from self.result_batches(cursor)
+            finally:
+                cursor.close()
+
+    def section_ids(self, school_id: str) -> Set[str]:
+        rows = self._query("""
+        SELECT hs.section_id
+        FROM handbook_sections hs
+        JOIN handbooks h ON hs.handbook_id = h.handbook_id
+        WHERE h.school_id = %(school_id)s
+        AND LENGTH(hs.content) > 50
+        """, {"school_id": school_id})
+        return {row[0] for row in rows}
+
+    def section_contents(self, section_ids: List[str]) -> Dict[str, str]:
+        """Full CONTENT of the given sections, keyed by section id."""
+        contents = {}
+        for in_list, params in _id_chunks(section_ids):
+            contents.update(self._query(f"SELECT section_id, content FROM handbook_sections WHERE section_id IN {in_list}",
+                                        params))
+        return contents
+
+    def similar_sections(self, school_id: str, question_embedding: np.ndarray, top_k: int) -> List[Dict]:
+        """Top_k sections of a school by cosine similarity of their stored vectors, best first."""
+        query = np.asarray(question_embedding, dtype=np.float32).reshape(-1)
+        rows = self._query(SIMILAR_SECTIONS_QUERY.format(query_vector=self.query_vector_expression, top_k=int(top_k)),
+                           {"query": json.dumps([round(float(x), 7) for x in query]), "school_id": school_id})
+        results = []
+        for row in rows:
+            result = dict(zip(FIELD_NAMES, row[:-1]))
+            result['similarity'] = float(row[-1])
+            results.append(result)
+        return results
+
+
+def storage_backend() -> str:
+    """STORAGE_BACKEND: snowflake (default) or sqlite (embedded file, no network)."""
+    backend = os.getenv('STORAGE_BACKEND', 'snowflake').lower()
+    return backend if backend in ('snowflake', 'sqlite') else 'snowflake'
+
+
+_storage: Optional[HandbookRepository] = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> HandbookRepository:
+    """Process-wide repository for the configured STORAGE_BACKEND."""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                if storage_backend() == 'sqlite':
+                    from sqlite_storage import SQLiteRepository
+                    _storage = SQLiteRepository()
+                else:
+                    from snowflake_storage import SnowflakeRepository
+                    _storage = SnowflakeRepository()
+    return _storage
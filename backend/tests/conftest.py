@@ -0,0 +1,79 @@
+import os
+import sys
+import zlib
+
+import numpy as np
+import pytest
+
+# Backend modules are imported flat, as main.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DIMENSION = 64
+
+
+class FakeModel:
+    """Deterministic bag-of-words vectors, so similar texts score close together."""
+
+    def __init__(self, *args, **kwargs):
+        self.calls = 0
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        self.calls += 1
+        vectors = np.zeros((len(texts), DIMENSION), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, zlib.crc32(word.encode()) % DIMENSION] += 1.0
+        return vectors
+
+
+def section(section_id: str, handbook_id: str, title: str, content: str, embedding=None):
+    return {
+        'section_id': section_id, 'handbook_id': handbook_id, 'section_group': 'g', 'section_key': section_id,
+        'page': 'Page 1', 'section_title': title, 'category': 'General', 'type': 'policy', 'content': content,
+        'raw_text': content, 'excerpt': content[:40], 'topics': [], 'tags': [], 'embedding': embedding,
+    }
+
+
+@pytest.fixture
+def repository():
+    from sqlite_storage import SQLiteRepository
+    repository = SQLiteRepository(':memory:')
+    yield repository
+    repository.close()
+
+
+def add_handbook(repository, school_id: str, handbook_id: str, topics, with_embeddings: bool = False):
+    """Insert a handbook whose sections are about the given topics (one section each)."""
+    sections = []
+    for i, topic in enumerate(topics):
+        content = f"{topic} policy " * 20
+        embedding = FakeModel().encode([content])[0].tolist() if with_embeddings else None
+        sections.append(section(f"{handbook_id}-{i}", handbook_id, topic.title(), content, embedding))
+    with repository.ingest() as writer:
+        writer.delete_handbook(handbook_id)
+        writer.insert_handbook(handbook_id, school_id, 'Handbook', '2024-2025')
+        writer.insert_sections(sections)
+    return sections
+
+
+@pytest.fixture
+def make_service(repository, monkeypatch, tmp_path):
+    """RAGService over the in-memory repository with a fake embedding model."""
+    pytest.importorskip('sentence_transformers')
+    pytest.importorskip('anthropic')
+    monkeypatch.setenv('EMBEDDING_CACHE_DIR', str(tmp_path / 'embeddings'))
+    monkeypatch.delenv('ANTHROPIC_API_KEY', raising=False)
+    for name in ('RETRIEVAL_BACKEND', 'RETRIEVAL_MODE', 'RERANK_ENABLED', 'STORE_SECTION_EMBEDDINGS',
+                 'ANSWER_CACHE_ENABLED', 'LAZY_SECTION_CONTENT', 'VECTOR_INDEX'):
+        monkeypatch.delenv(name, raising=False)
+    import rag_service
+    monkeypatch.setattr(rag_service, 'SentenceTransformer', FakeModel)
+    monkeypatch.setattr(rag_service, 'get_storage', lambda: repository)
+    repository.insert_school('tu', 'Test University', 'TU')
+
+    def make_service(**env):
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        return rag_service.RAGService()
+
+    return make_service
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+import answer_cache
+from answer_cache import SemanticAnswerCache, answer_cache_enabled
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def vector(*values):
+    return np.asarray(values, dtype=np.float32)
+
+
+def test_disabled_by_default(monkeypatch):
+    monkeypatch.delenv('ANSWER_CACHE_ENABLED', raising=False)
+    assert not answer_cache_enabled()
+
+
+def test_threshold_hit_and_miss(clock):
+    cache = SemanticAnswerCache(threshold=0.95, ttl_seconds=60, max_per_school=8)
+    cache.put('tu', vector(1, 0, 0), 'answer', [{'title': 'Parking'}])
+
+    hit = cache.get('tu', vector(10, 1, 0))  # cosine 0.995
+    assert hit['answer'] == 'answer' and hit['sources'] == [{'title': 'Parking'}]
+    assert cache.get('tu', vector(1, 1, 0)) is None  # cosine 0.707
+    assert cache.get('other', vector(1, 0, 0)) is None
+    assert (cache.get_stats()['hits'], cache.get_stats()['misses']) == (1, 2)
+
+
+def test_entries_expire(clock):
+    cache = SemanticAnswerCache(threshold=0.95, ttl_seconds=60, max_per_school=8)
+    cache.put('tu', vector(1, 0, 0), 'answer', [])
+
+    clock[0] += 59
+    assert cache.get('tu', vector(1, 0, 0)) is not None
+    clock[0] += 2
+    assert cache.get('tu', vector(1, 0, 0)) is None
+    assert cache.get_stats()['expirations'] == 1
+
+
+def test_least_recently_served_is_evicted(clock):
+    cache = SemanticAnswerCache(threshold=0.95, ttl_seconds=60, max_per_school=2)
+    cache.put('tu', vector(1, 0, 0), 'first', [])
+    clock[0] += 1
+    cache.put('tu', vector(0, 1, 0), 'second', [])
+    clock[0] += 1
+    cache.get('tu', vector(1, 0, 0))
+    cache.put('tu', vector(0, 0, 1), 'third', [])
+
+    assert cache.get('tu', vector(1, 0, 0))['answer'] == 'first'
+    assert cache.get('tu', vector(0, 1, 0)) is None
+
+
+def test_invalidate_drops_school():
+    cache = SemanticAnswerCache(threshold=0.95, ttl_seconds=60, max_per_school=8)
+    cache.put('tu', vector(1, 0, 0), 'answer', [])
+    cache.put('other', vector(1, 0, 0), 'answer', [])
+    cache.invalidate('tu')
+
+    assert cache.get('tu', vector(1, 0, 0)) is None
+    assert cache.get('other', vector(1, 0, 0)) is not None
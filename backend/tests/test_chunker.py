@@ -0,0 +1,77 @@
+import pytest
+
+from chunker import MIN_CHUNK_CHARS, SectionChunker, estimate_tokens
+
+
+def sentences(prefix, count):
+    return ' '.join(f"{prefix} rule {i} applies to every enrolled student on campus." for i in range(count))
+
+
+PAGE = f"""STUDENT CONDUCT
+{sentences('Conduct', 12)}
+
+12
+
+2.1 Parking Permits
+{sentences('Parking', 12)}
+"""
+
+
+@pytest.fixture
+def chunker():
+    return SectionChunker(target_tokens=60, overlap_tokens=20, min_tokens=10)
+
+
+def test_offsets_point_into_raw_text(chunker):
+    chunks = chunker.chunk(PAGE)
+    assert len(chunks) > 2
+    for chunk in chunks:
+        raw = PAGE[chunk["char_start"]:chunk["char_end"]]
+        assert ' '.join(raw.split()) == chunk["text"]
+
+
+def test_offsets_survive_irregular_whitespace(chunker):
+    page = "PARKING   RULES\n  Permits are   required\tfor all vehicles parked on campus\nat any time.  \n"
+    chunk, = chunker.chunk(page)
+    assert chunk["text"] == "PARKING RULES Permits are required for all vehicles parked on campus at any time."
+    assert page[chunk["char_start"]:chunk["char_end"]].startswith("PARKING")
+    assert page[chunk["char_start"]:chunk["char_end"]].endswith("time.")
+
+
+def test_headings_start_new_chunks(chunker):
+    chunks = chunker.chunk(PAGE)
+    parking = [chunk for chunk in chunks if chunk["heading"] == "2.1 Parking Permits"]
+
+    assert chunks[0]["heading"] == "STUDENT CONDUCT"
+    assert parking[0]["text"].startswith("2.1 Parking Permits")
+    # No conduct overlap is carried under the new heading, and page numbers are dropped
+    assert all("Conduct" not in chunk["text"] for chunk in parking)
+    assert all(" 12 " not in f" {chunk['text']} " for chunk in chunks)
+
+
+def test_consecutive_chunks_overlap(chunker):
+    chunks = [chunk for chunk in chunker.chunk(PAGE) if chunk["heading"] == "STUDENT CONDUCT"]
+    assert len(chunks) >= 2
+    for previous, chunk in zip(chunks, chunks[1:]):
+        first_sentence = chunk["text"].split('. ')[0]
+        assert first_sentence in previous["text"]
+        assert chunk["char_start"] < previous["char_end"]
+        assert estimate_tokens(chunk["text"]) <= chunker.target_tokens + chunker.overlap_tokens
+
+
+def test_short_trailing_chunk_is_merged(chunker):
+    page = f"{sentences('Housing', 8)}\n\nLATE FEES\nFees apply.\n"
+    chunks = chunker.chunk(page)
+
+    assert all(len(chunk["text"]) >= MIN_CHUNK_CHARS for chunk in chunks)
+    assert chunks[-1]["text"].endswith("LATE FEES Fees apply.")
+    assert page[chunks[-1]["char_start"]:chunks[-1]["char_end"]].endswith("Fees apply.")
+
+
+def test_short_first_chunk_is_merged_forward():
+    chunker = SectionChunker(target_tokens=60, overlap_tokens=20, min_tokens=1)
+    page = f"INTRO\nWelcome.\n\nHOUSING\n{sentences('Housing', 3)}\n"
+    chunks = chunker.chunk(page)
+
+    assert chunks[0]["text"].startswith("INTRO Welcome. HOUSING")
+    assert all(len(chunk["text"]) >= MIN_CHUNK_CHARS for chunk in chunks)
@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+from corpus_cache import CorpusCache
+
+
+def corpus(nbytes):
+    return SimpleNamespace(nbytes=nbytes)
+
+
+def test_default_budget_fits_deployed_vm(monkeypatch):
+    monkeypatch.delenv('CORPUS_CACHE_MAX_MB', raising=False)
+    assert CorpusCache().max_bytes == 256 * 1024 * 1024
+
+
+def test_budget_evicts_least_recently_used():
+    cache = CorpusCache(max_bytes=300)
+    cache.put('a', corpus(100))
+    cache.put('b', corpus(100))
+    cache.put('c', corpus(100))
+    cache.get('a')
+
+    cache.put('d', corpus(100))
+
+    assert cache.schools() == ['c', 'a', 'd']
+    assert cache.get_stats()['bytes'] == 300
+    assert cache.get_stats()['evictions'] == 1
+
+
+def test_replacing_a_corpus_updates_its_size():
+    cache = CorpusCache(max_bytes=300)
+    cache.put('a', corpus(100))
+    cache.put('b', corpus(100))
+    cache.put('a', corpus(250))
+
+    assert cache.schools() == ['a']
+    assert cache.get_stats()['bytes'] == 250
+
+
+def test_oversized_corpus_is_kept_alone():
+    cache = CorpusCache(max_bytes=100)
+    cache.put('a', corpus(50))
+    cache.put('big', corpus(500))
+
+    assert cache.schools() == ['big']
+    assert cache.peek('big') is not None
@@ -0,0 +1,128 @@
+import os
+
+import numpy as np
+
+from conftest import FakeModel
+from embedding_cache import EmbeddingCache
+
+
+def shard_files(cache):
+    return sorted(name for name in os.listdir(cache.directory) if name.endswith('.npy'))
+
+
+def test_encodes_only_misses(tmp_path):
+    model = FakeModel()
+    cache = EmbeddingCache('model', cache_dir=str(tmp_path))
+    first = cache.encode(model, ['a b', 'c d'])
+    second = cache.encode(model, ['c d', 'a b', 'e f'])
+
+    assert model.calls == 2
+    np.testing.assert_array_equal(second[:2], first[::-1])
+    # A new instance (another worker) reads what was persisted
+    assert EmbeddingCache('model', cache_dir=str(tmp_path)).get(EmbeddingCache.hash_text('e f')) is not None
+
+
+def test_shards_are_compacted(tmp_path):
+    model = FakeModel()
+    cache = EmbeddingCache('model', cache_dir=str(tmp_path), max_shards=3)
+    texts = [f"section {i}" for i in range(10)]
+    expected = model.encode(texts)
+    for text in texts:
+        cache.encode(model, [text])
+
+    assert len(shard_files(cache)) <= 3
+    assert cache.get_stats()["compactions"] >= 1
+    np.testing.assert_array_equal(cache.encode(model, texts), expected)
+    assert model.calls == 11
+
+
+def test_compaction_keeps_newest_vectors(tmp_path):
+    model = FakeModel()
+    cache = EmbeddingCache('model', cache_dir=str(tmp_path), max_shards=2, max_vectors=2)
+    for text in ['old', 'older', 'new', 'newer']:
+        cache.encode(model, [text])
+
+    assert cache.get(EmbeddingCache.hash_text('old')) is None
+    assert cache.get(EmbeddingCache.hash_text('newer')) is not None
+    assert len(cache.index) <= 3
+    # Entries pointing at removed shards are not brought back by another worker's stale index
+    other = EmbeddingCache('model', cache_dir=str(tmp_path))
+    other.refresh()
+    assert all(os.path.exists(os.path.join(cache.directory, shard)) for shard, _ in other.index.values())
+
+
+def test_open_shards_are_bounded(tmp_path):
+    model = FakeModel()
+    cache = EmbeddingCache('model', cache_dir=str(tmp_path), max_open_shards=2)
+    texts = [f"section {i}" for i in range(6)]
+    for text in texts:
+        cache.encode(model, [text])
+
+    reader = EmbeddingCache('model', cache_dir=str(tmp_path), max_open_shards=2)
+    vectors = [reader.get(EmbeddingCache.hash_text(text)) for text in texts]
+    assert all(vector is not None for vector in vectors)
+    assert reader.get_stats()["open_shards"] == 2
+
+
+def test_unreadable_shard_drops_only_its_own_entry(tmp_path):
+    model = FakeModel()
+    cache = EmbeddingCache('model', cache_dir=str(tmp_path))
+    cache.encode(model, ['a b', 'c d'])
+    key, other = EmbeddingCache.hash_text('a b'), EmbeddingCache.hash_text('c d')
+    load_shard = cache._shard
+
+    def repointed_while_reading(name):
+        # Another thread's put_many moves the key to a new shard while this read fails
+        cache.index[key] = ('shard_new.npy', 0)
+        raise OSError("shard is gone")
+
+    cache._shard = repointed_while_reading
+    assert cache.get(key) is None
+    assert cache.index[key] == ('shard_new.npy', 0)
+
+    cache._shard = load_shard
+    os.remove(os.path.join(cache.directory, cache.index[other][0]))
+    assert cache.get(other) is None
+    assert other not in cache.index
+
+
+def test_compaction_survives_a_vanished_shard(tmp_path):
+    model = FakeModel()
+    cache = EmbeddingCache('model', cache_dir=str(tmp_path), max_shards=2)
+    cache.encode(model, ['a b'])
+    cache.encode(model, ['c d'])
+    gone = EmbeddingCache.hash_text('a b')
+    merged_index = cache._merged_index
+
+    def merged_then_removed():
+        merged = merged_index()
+        # Another worker compacts this shard away between our merge and our read
+        os.remove(os.path.join(cache.directory, merged[gone][0]))
+        return merged
+
+    cache._merged_index = merged_then_removed
+    cache.put_many([EmbeddingCache.hash_text('e f')], model.encode(['e f']))
+
+    assert gone not in cache.index
+    assert cache.get_stats()["shards"] == 1
+    np.testing.assert_array_equal(cache.encode(model, ['c d', 'e f']), model.encode(['c d', 'e f']))
+
+
+def test_refresh_rereads_index_only_when_it_changed(tmp_path):
+    model = FakeModel()
+    reader = EmbeddingCache('model', cache_dir=str(tmp_path))
+    writer = EmbeddingCache('model', cache_dir=str(tmp_path))
+    writer.encode(model, ['a b'])
+    reads = []
+    read_index_file = reader._read_index_file
+    reader._read_index_file = lambda: reads.append(1) or read_index_file()
+
+    reader.refresh()
+    reader.refresh()
+    assert len(reads) == 1
+    assert reader.get(EmbeddingCache.hash_text('a b')) is not None
+
+    writer.encode(model, ['c d'])
+    reader.refresh()
+    assert len(reads) == 2
+    assert reader.get(EmbeddingCache.hash_text('c d')) is not None
@@ -0,0 +1,61 @@
+import math
+
+import numpy as np
+
+from lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+def test_tokenize_keeps_joined_terms_and_drops_stopwords():
+    assert tokenize("What is the Add/Drop deadline for CS101?") == ['add/drop', 'deadline', 'cs101']
+
+
+def test_bm25_weight_matches_okapi_formula():
+    index = BM25Index(k1=1.5, b=0.75).build(['parking permit parking', 'dining hall', 'permit fee'])
+    indices, scores = index.search('parking', top_k=3)
+
+    # tf 2 in a 3-term document; the average length is 7/3; one of three documents has the term
+    idf = math.log(1 + (3 - 1 + 0.5) / (1 + 0.5))
+    norm = 1.5 * (1 - 0.75 + 0.75 * 3 / (7 / 3))
+    assert indices.tolist() == [0]
+    assert scores[0] == np.float32(idf * 2 * 2.5 / (2 + norm))
+
+
+def test_bm25_favours_rare_terms_repeated_terms_and_short_documents():
+    documents = [
+        'parking parking fee',
+        'parking permit fee',
+        'parking towing',
+        'permit fee for visitor lots',
+        'dining hall hours',
+    ]
+    index = BM25Index().build(documents)
+    scores = dict(zip(*[values.tolist() for values in index.search('parking permit towing', top_k=5)]))
+
+    # "towing" is in one document, "permit" in two: the rare term outweighs the common one
+    assert max(scores, key=scores.get) == 2
+    # Same length, but "parking" occurs twice
+    parking = dict(zip(*[values.tolist() for values in index.search('parking', top_k=5)]))
+    assert parking[0] > parking[1]
+    # Same term frequency, shorter document ("for" is a stopword and doesn't count)
+    permit = dict(zip(*[values.tolist() for values in index.search('permit', top_k=5)]))
+    assert permit[1] > permit[3]
+    # Only documents containing a query term are returned, and stopwords never match
+    assert sorted(scores) == [0, 1, 2, 3]
+    assert len(index.search('what is the', top_k=5)[0]) == 0
+
+
+def test_rrf_orders_by_summed_reciprocal_rank():
+    dense = np.array([3, 1, 2])
+    lexical = np.array([2, 4])
+    # 2 is in both lists and overtakes 3, which only the dense list ranks first
+    assert reciprocal_rank_fusion([(dense, 1.0), (lexical, 1.0)], top_k=5) == [2, 3, 1, 4]
+    # Weighting the lexical list pulls its top hit further ahead
+    assert reciprocal_rank_fusion([(dense, 1.0), (lexical, 3.0)], top_k=2) == [2, 4]
+
+
+def test_rrf_duplicates_count_once_per_list_and_ties_keep_first_seen_order():
+    # Mirrored lists give 1 and 2 identical scores; the first list decides the tie
+    assert reciprocal_rank_fusion([(np.array([1, 2]), 1.0), (np.array([2, 1]), 1.0)], top_k=2) == [1, 2]
+    assert reciprocal_rank_fusion([(np.array([2, 1]), 1.0), (np.array([1, 2]), 1.0)], top_k=2) == [2, 1]
+    fused = reciprocal_rank_fusion([(np.array([5, 6]), 1.0), (np.array([5]), 1.0)], top_k=10)
+    assert fused == [5, 6]
@@ -0,0 +1,33 @@
+from metadata_cache import MetadataCache
+
+
+def test_conditional_get():
+    cache = MetadataCache(max_size=8, ttl=60)
+    listing = cache.put("handbooks", "tu", {"handbooks": []}, cache.generation("tu"))
+
+    assert cache.get("handbooks", "tu") is listing
+    assert listing.response(listing.etag, "no-cache").status_code == 304
+    assert listing.response(f'W/{listing.etag}, "other"', "no-cache").status_code == 304
+    response = listing.response('"stale"', "no-cache")
+    assert response.status_code == 200 and response.body == listing.body
+    assert response.headers["etag"] == listing.etag
+
+
+def test_invalidation_drops_school_and_stale_puts():
+    cache = MetadataCache(max_size=8, ttl=60)
+    cache.put("handbooks", "tu", {"handbooks": []}, cache.generation("tu"))
+    cache.put("handbooks", "other", {"handbooks": []}, cache.generation("other"))
+    generation = cache.generation("tu")
+
+    cache.invalidate_school("tu")
+    # A listing read before the ingest finished must not be cached
+    cache.put("handbooks", "tu", {"handbooks": []}, generation)
+
+    assert cache.get("handbooks", "tu") is None
+    assert cache.get("handbooks", "other") is not None
+
+
+def test_entries_expire():
+    cache = MetadataCache(max_size=8, ttl=0)
+    cache.put("handbooks", "tu", {"handbooks": []}, cache.generation("tu"))
+    assert cache.get("handbooks", "tu") is None
@@ -0,0 +1,70 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from conftest import FakeModel
+from query_batcher import QueryEncoderBatcher
+
+
+class GatedModel(FakeModel):
+    """Blocks the first encode until released, so later questions queue up behind it."""
+
+    def __init__(self, error=None):
+        super().__init__()
+        self.gate = threading.Event()
+        self.batches = []
+        self.error = error
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        self.batches.append(list(texts))
+        if len(self.batches) == 1:
+            self.gate.wait(5)
+        if self.error is not None and len(self.batches) > 1:
+            raise self.error
+        return super().encode(texts)
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_concurrent_encodes_are_coalesced():
+    model = GatedModel()
+    batcher = QueryEncoderBatcher(model, max_batch_size=16, max_wait_ms=50)
+    first = batcher.submit('warm up')
+    wait_until(lambda: len(model.batches) == 1)
+    questions = [f"question {i}" for i in range(8)]
+    with ThreadPoolExecutor(len(questions)) as pool:
+        futures = [pool.submit(batcher.encode, question) for question in questions]
+        wait_until(lambda: batcher.get_metrics()["queued"] == len(questions))
+        model.gate.set()
+        vectors = [future.result(5) for future in futures]
+    first.result(5)
+
+    assert model.batches[0] == ['warm up']
+    assert sorted(model.batches[1]) == sorted(questions)
+    for question, vector in zip(questions, vectors):
+        np.testing.assert_array_equal(vector, FakeModel().encode([question])[0])
+        # Each caller owns its vector rather than a view of the batch array
+        assert vector.base is None
+
+
+def test_encode_error_reaches_every_caller():
+    model = GatedModel(error=RuntimeError("model crashed"))
+    batcher = QueryEncoderBatcher(model, max_batch_size=16, max_wait_ms=50)
+    first = batcher.submit('warm up')
+    wait_until(lambda: len(model.batches) == 1)
+    futures = [batcher.submit(f"question {i}") for i in range(4)]
+    model.gate.set()
+
+    first.result(5)
+    for future in futures:
+        with pytest.raises(RuntimeError, match="model crashed"):
+            future.result(5)
+    assert len(model.batches) == 2
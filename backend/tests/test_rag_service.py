@@ -0,0 +1,205 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from conftest import add_handbook
+
+TOPICS = ['parking', 'attendance', 'housing', 'dining', 'library', 'grading']
+
+
+def test_pushdown_failure_is_not_cached(make_service, repository, monkeypatch):
+    add_handbook(repository, 'tu', 'tu_2024', TOPICS, with_embeddings=True)
+    service = make_service(RETRIEVAL_BACKEND='pushdown', STORE_SECTION_EMBEDDINGS='true')
+
+    def fail(*args):
+        raise RuntimeError("warehouse unavailable")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(repository, 'similar_sections', fail)
+        assert service.search('parking policy', 'tu', top_k=2) == []
+
+    results = service.search('Parking policy?', 'tu', top_k=2)
+    assert results and results[0]['title'] == 'Parking'
+
+
+def test_refresh_keeps_flat_index_sharing_the_matrix(make_service, repository):
+    add_handbook(repository, 'tu', 'tu_2024', TOPICS)
+    service = make_service()
+    assert service.initialize_school('tu')
+
+    add_handbook(repository, 'tu', 'tu_2025', ['tuition'])
+    assert service.refresh_school('tu')['added'] == 1
+
+    corpus = service.corpora.peek('tu')
+    assert corpus.index.vectors is corpus.embeddings
+
+
+def test_results_from_before_a_refresh_are_not_cached(make_service, repository, monkeypatch):
+    add_handbook(repository, 'tu', 'tu_2024', TOPICS)
+    service = make_service()
+    assert service.initialize_school('tu')
+
+    retrieve_sections = service.retrieve_sections
+
+    def refresh_mid_lookup(*args, **kwargs):
+        results = retrieve_sections(*args, **kwargs)
+        add_handbook(repository, 'tu', 'tu_2025', ['parking garage'])
+        service.refresh_school('tu')
+        return results
+
+    with monkeypatch.context() as patch:
+        patch.setattr(service, 'retrieve_sections', refresh_mid_lookup)
+        service.search('parking garage', 'tu', top_k=2)
+
+    assert service.search_results.get(('tu', 'parking garage', 2)) is None
+    assert service.search('parking garage', 'tu', top_k=2)[0]['title'] == 'Parking Garage'
+
+
+def test_search_results_are_cached_after_first_load(make_service, repository):
+    add_handbook(repository, 'tu', 'tu_2024', TOPICS)
+    service = make_service()
+
+    first = service.search('housing', 'tu', top_k=2)
+    assert service.search_results.get(('tu', 'housing', 2)) == first
+
+
+def test_answer_from_before_a_refresh_is_not_remembered(make_service, repository):
+    add_handbook(repository, 'tu', 'tu_2024', TOPICS)
+    service = make_service(ANSWER_CACHE_ENABLED='true')
+    assert service.initialize_school('tu')
+    question_embedding = service.encode_question('housing')
+    results = service.search('housing', 'tu', top_k=2)
+
+    generation = service.generation('tu')
+    add_handbook(repository, 'tu', 'tu_2025', ['tuition'])
+    service.refresh_school('tu')
+    service.remember_answer('tu', question_embedding, 'stale answer', results, generation)
+    assert service.cached_answer('tu', question_embedding) is None
+
+    service.remember_answer('tu', question_embedding, 'fresh answer', results, service.generation('tu'))
+    assert service.cached_answer('tu', question_embedding)['answer'] == 'fresh answer'
+
+
+def test_results_missing_content_are_not_cached(make_service, repository, monkeypatch):
+    add_handbook(repository, 'tu', 'tu_2024', TOPICS)
+    service = make_service(LAZY_SECTION_CONTENT='true')
+    assert service.initialize_school('tu')
+
+    def fail(section_ids):
+        raise RuntimeError("content query failed")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(repository, 'section_contents', fail)
+        degraded = service.search('library', 'tu', top_k=1)
+    assert degraded[0]['content'] == degraded[0]['excerpt']
+    assert service.search_results.get(('tu', 'library', 1)) is None
+
+    assert service.search('library', 'tu', top_k=1)[0]['content'].startswith('library policy library policy')
+
+
+def remove_handbook(repository, handbook_id):
+    with repository.ingest() as writer:
+        writer.delete_handbook(handbook_id)
+
+
+def test_refresh_applies_added_and_removed_sections(make_service, repository):
+    add_handbook(repository, 'tu', 'tu_2024', TOPICS)
+    add_handbook(repository, 'tu', 'tu_extra', ['athletics'])
+    service = make_service()
+    assert service.search('athletics', 'tu', top_k=1)[0]['title'] == 'Athletics'
+
+    remove_handbook(repository, 'tu_extra')
+    add_handbook(repository, 'tu', 'tu_2025', ['tuition'])
+    refresh = service.refresh_school('tu')
+
+    assert (refresh['added'], refresh['removed'], refresh['sections']) == (1, 1, len(TOPICS) + 1)
+    titles = {result['title'] for result in service.search('athletics tuition', 'tu', top_k=len(TOPICS) + 1)}
+    assert 'Tuition' in titles and 'Athletics' not in titles
+    assert service.refresh_school('tu')['status'] == 'unchanged'
+
+
+@pytest.mark.parametrize('stored', ['true', 'false'])
+def test_refreshed_corpus_matches_a_fresh_load(make_service, repository, stored):
+    add_handbook(repository, 'tu', 'tu_2024', TOPICS, with_embeddings=True)
+    service = make_service(STORE_SECTION_EMBEDDINGS=stored)
+    assert service.initialize_school('tu')
+
+    add_handbook(repository, 'tu', 'tu_2025', ['tuition'], with_embeddings=True)
+    service.refresh_school('tu')
+    refreshed = service.corpora.peek('tu')
+    rows, embeddings = service.load_school_sections('tu')
+
+    order = {section_id: i for i, section_id in enumerate(rows.section_ids())}
+    positions = [order[section_id] for section_id in refreshed.data.section_ids()]
+    assert [rows.rows[i] for i in positions] == refreshed.data.rows
+    np.testing.assert_allclose(refreshed.embeddings, embeddings[positions], rtol=1e-6)
+
+
+def test_refresh_patches_ivf_index_consistently(make_service, repository, monkeypatch):
+    add_handbook(repository, 'tu', 'tu_2024', [f"{topic} {i}" for i in range(5) for topic in TOPICS])
+    monkeypatch.setenv('VECTOR_INDEX_MIN_IVF_SIZE', '10')
+    service = make_service(VECTOR_INDEX='ivf', VECTOR_INDEX_NLIST='4', VECTOR_INDEX_NPROBE='4')
+    assert service.initialize_school('tu')
+    assert service.corpora.peek('tu').index.kind == 'ivf'
+
+    add_handbook(repository, 'tu', 'tu_2025', ['tuition', 'athletics'])
+    service.refresh_school('tu')
+
+    corpus = service.corpora.peek('tu')
+    assert corpus.index.kind == 'ivf'
+    np.testing.assert_array_equal(corpus.index.vectors, corpus.embeddings[corpus.index.ids])
+    assert service.search('tuition', 'tu', top_k=1)[0]['title'] == 'Tuition'
+
+
+def test_refresh_invalidates_cached_results(make_service, repository):
+    add_handbook(repository, 'tu', 'tu_2024', TOPICS)
+    service = make_service()
+    assert service.search('tuition', 'tu', top_k=1)[0]['title'] != 'Tuition'
+
+    add_handbook(repository, 'tu', 'tu_2025', ['tuition'])
+    service.refresh_school('tu')
+
+    assert service.search('tuition', 'tu', top_k=1)[0]['title'] == 'Tuition'
+
+
+def test_refresh_of_unloaded_school_invalidates_pushdown_results(make_service, repository):
+    add_handbook(repository, 'tu', 'tu_2024', TOPICS, with_embeddings=True)
+    service = make_service(RETRIEVAL_BACKEND='pushdown', STORE_SECTION_EMBEDDINGS='true')
+    assert service.search('tuition', 'tu', top_k=1)[0]['title'] != 'Tuition'
+
+    add_handbook(repository, 'tu', 'tu_2025', ['tuition'], with_embeddings=True)
+    assert service.refresh_school('tu')['status'] == 'not_loaded'
+
+    assert service.search('tuition', 'tu', top_k=1)[0]['title'] == 'Tuition'
+
+
+def test_get_response_remembers_answers_unless_refreshed_meanwhile(make_service, repository):
+    add_handbook(repository, 'tu', 'tu_2024', TOPICS)
+    service = make_service(ANSWER_CACHE_ENABLED='true')
+    refresh_during_call = []
+
+    class Messages:
+        async def create(self, **kwargs):
+            if refresh_during_call:
+                add_handbook(repository, 'tu', 'tu_2025', ['tuition'])
+                service.refresh_school('tu')
+            return SimpleNamespace(content=[SimpleNamespace(text='generated answer')])
+
+    service.async_claude_client = SimpleNamespace(messages=Messages())
+
+    assert asyncio.run(service.get_response('parking rules', 'tu')) == 'generated answer'
+    assert service.cached_answer('tu', service.encode_question('parking rules')) is not None
+
+    refresh_during_call.append(True)
+    asyncio.run(service.get_response('housing rules', 'tu'))
+    assert service.cached_answer('tu', service.encode_question('housing rules')) is None
+
+
+def test_warm_up_loads_the_reranker(make_service):
+    service = make_service(RERANK_ENABLED='true')
+    loaded = []
+    service.reranker.load = lambda: loaded.append(True)
+    asyncio.run(service.warm_up_reranker())
+    assert loaded == [True]
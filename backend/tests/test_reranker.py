@@ -0,0 +1,75 @@
+import sys
+from types import SimpleNamespace
+
+from reranker import CrossEncoderReranker
+
+
+class StubScorer:
+    """Scores each (question, text) pair by the section title it starts with."""
+
+    def __init__(self, scores):
+        self.scores = scores
+        self.pairs = []
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        self.pairs.append(len(pairs))
+        return [self.scores[text.split('\n')[0]] for _, text in pairs]
+
+
+def results(*titles):
+    return [{'title': title, 'content': f"About {title.lower()}"} for title in titles]
+
+
+def reranker(scores, budget_ms=1000, min_score=-100):
+    reranker = CrossEncoderReranker(model_name='stub', budget_ms=budget_ms, min_score=min_score)
+    reranker._model = StubScorer(scores)
+    return reranker
+
+
+def test_results_are_ordered_by_cross_encoder_score():
+    ranked = reranker({'Parking': 0.1, 'Housing': 2.0, 'Dining': 1.0}).rerank(
+        'where do I live', results('Parking', 'Housing', 'Dining'), top_k=2)
+
+    assert [result['title'] for result in ranked] == ['Housing', 'Dining']
+    assert [result['rerank_score'] for result in ranked] == [2.0, 1.0]
+
+
+def test_sections_below_min_score_are_dropped_but_one_is_kept():
+    scores = {'Parking': -3.0, 'Housing': 1.5, 'Dining': -1.0}
+    ranked = reranker(scores, min_score=0).rerank('q', results('Parking', 'Housing', 'Dining'), top_k=3)
+    assert [result['title'] for result in ranked] == ['Housing']
+
+    ranked = reranker(scores, min_score=5).rerank('q', results('Parking', 'Housing', 'Dining'), top_k=3)
+    assert [result['title'] for result in ranked] == ['Housing']
+
+
+def test_budget_truncates_then_skips_reranking():
+    scores = {'Parking': 0.0, 'Housing': 1.0, 'Dining': 2.0, 'Library': 3.0}
+    slow = reranker(scores, budget_ms=100)
+    # Measured cost from earlier passes: 40 ms per pair
+    slow._ms_per_pair = 40.0
+    ranked = slow.rerank('q', results('Parking', 'Housing', 'Dining', 'Library'), top_k=2)
+    # Only the first two candidates fit the budget
+    assert slow._model.pairs == [2]
+    assert [result['title'] for result in ranked] == ['Housing', 'Parking']
+
+    slow._ms_per_pair = 80.0
+    ranked = slow.rerank('q', results('Parking', 'Housing', 'Dining', 'Library'), top_k=2)
+    # Not even top_k pairs fit: retrieval order, no model call
+    assert slow._model.pairs == [2]
+    assert ranked == results('Parking', 'Housing')
+    metrics = slow.get_metrics()
+    assert (metrics["truncated"], metrics["skipped"]) == (1, 1)
+
+
+def test_load_builds_the_model_once(monkeypatch):
+    built = []
+
+    def cross_encoder(name):
+        built.append(name)
+        return StubScorer({})
+
+    monkeypatch.setitem(sys.modules, 'sentence_transformers', SimpleNamespace(CrossEncoder=cross_encoder))
+    reranker = CrossEncoderReranker(model_name='stub')
+    assert reranker.load() is reranker.load()
+    assert built == ['stub']
@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+import pytest
+
+from school_directory import SchoolDirectory
+
+SCHOOLS = [
+    ('tu', 'Texas University', 'TU'),
+    ('tufts', 'Tufts University', None),
+    ('atc', 'Austin Tulane College', 'ATC'),
+    ('sut', 'State University of Texas', 'SUT'),
+    ('mit', 'Massachusetts Institute of Technology', 'MIT'),
+]
+
+
+@pytest.fixture
+def directory():
+    storage = SimpleNamespace(list_schools=lambda: [
+        {'school_id': school_id, 'school_name': name, 'school_abbreviation': abbreviation}
+        for school_id, name, abbreviation in SCHOOLS])
+    directory = SchoolDirectory(fuzzy_threshold=0.5)
+    assert directory.sync(storage) == len(SCHOOLS)
+    return directory
+
+
+def ids(results):
+    return [school['school_id'] for school in results]
+
+
+def test_tiers_rank_exact_then_prefix_then_word_prefix_then_substring(directory):
+    # Exact abbreviation, name prefix, prefix of a later word ("Tulane"), inside a word ("Institute")
+    assert ids(directory.search('TU')) == ['tu', 'tufts', 'atc', 'mit']
+    assert ids(directory.search('tu', limit=2)) == ['tu', 'tufts']
+
+
+def test_abbreviation_and_accents_match_exactly(directory):
+    assert ids(directory.search('mit')) == ['mit']
+    assert ids(directory.search('Tüfts')) == ['tufts']
+
+
+def test_every_query_word_must_prefix_a_word(directory):
+    # "of" only appears in one name; Texas University is left to the fuzzy tier
+    assert ids(directory.search('univ of texas')) == ['sut', 'tu']
+
+
+def test_fuzzy_matches_need_the_threshold_share_of_trigrams(directory):
+    # "texus" shares half its trigrams with Texas University and a third with State University of Texas
+    assert ids(directory.search('texus')) == ['tu']
+    directory.fuzzy_threshold = 0.3
+    assert ids(directory.search('texus')) == ['tu', 'sut']
+    assert ids(directory.search('masachusets institute')) == ['mit']
+    assert directory.search('xyz') == []
+
+
+def test_added_school_is_searchable_without_a_resync(directory):
+    directory.add({'school_id': 'tcu', 'school_name': 'Texas Christian University', 'school_abbreviation': 'TCU'})
+    assert ids(directory.search('texas c'))[0] == 'tcu'
+    assert directory.get_stats()["schools"] == len(SCHOOLS) + 1
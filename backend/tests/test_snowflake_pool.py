@@ -0,0 +1,108 @@
+import time
+
+import pytest
+
+from snowflake_pool import SnowflakeConnectionPool
+from storage import HandbookRepository
+
+
+class FakeCursor:
+    description = [("SECTION_ID",)]
+
+    def execute(self, sql, params=None):
+        pass
+
+    def fetchmany(self, size):
+        return [("a",)]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor()
+
+    def close(self):
+        self.closed = True
+
+    def is_closed(self):
+        return self.closed
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = SnowflakeConnectionPool(max_size=2, checkout_timeout=0.1)
+    monkeypatch.setattr(pool, '_connect', FakeConnection)
+    return pool
+
+
+def test_connection_is_reused_after_clean_block(pool):
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is first
+    assert pool.get_stats()["in_use"] == 0
+
+
+def test_connection_is_discarded_after_error(pool):
+    with pytest.raises(ValueError):
+        with pool.connection() as conn:
+            raise ValueError("boom")
+    assert conn.closed
+    stats = pool.get_stats()
+    assert (stats["in_use"], stats["idle"]) == (0, 0)
+
+
+def test_abandoned_generator_returns_its_connection(pool):
+    def rows():
+        with pool.connection():
+            yield 1
+            yield 2
+
+    for _ in range(pool.max_size + 1):
+        generator = rows()
+        next(generator)
+        generator.close()
+
+    assert pool.get_stats()["in_use"] == 0
+    with pool.connection():
+        pass
+
+
+def test_failed_batch_load_does_not_leak_pool_slot(pool):
+    class Repository(HandbookRepository):
+        def connection(self):
+            return pool.connection()
+
+        def ingest(self):
+            raise NotImplementedError
+
+    for _ in range(pool.max_size + 1):
+        with pytest.raises(RuntimeError):
+            for _ in Repository().school_section_batches("school"):
+                raise RuntimeError("encode failed")
+
+    assert pool.get_stats()["in_use"] == 0
+
+
+def test_expired_and_unhealthy_connections_are_replaced(pool):
+    pool.max_lifetime_seconds = 0.001
+    with pool.connection() as first:
+        pass
+    time.sleep(0.01)
+    with pool.connection() as second:
+        pass
+    assert first.closed and second is not first
+
+    pool.max_lifetime_seconds = 3600
+    pool.health_check_after = 0
+    second.closed = True
+    with pool.connection() as third:
+        assert third is not second
+
+    stats = pool.get_stats()
+    assert (stats["recycled"], stats["failed_health_checks"], stats["in_use"]) == (1, 1, 0)
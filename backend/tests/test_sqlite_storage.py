@@ -0,0 +1,43 @@
+import threading
+
+import pytest
+
+from conftest import add_handbook
+from storage import HandbookRepository
+
+
+def test_repository_is_abstract():
+    with pytest.raises(TypeError):
+        HandbookRepository()
+
+
+def test_section_batches_cover_every_section(repository):
+    repository.insert_school('tu', 'Test University', 'TU')
+    sections = add_handbook(repository, 'tu', 'tu_2024', [f"topic {i}" for i in range(7)])
+
+    batches = list(repository.school_section_batches('tu', batch_size=3))
+
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    ids = [section_id for batch in batches for section_id in batch['SECTION_ID']]
+    assert sorted(ids) == sorted(section['section_id'] for section in sections)
+
+
+def test_lock_is_released_between_batches(repository):
+    repository.insert_school('tu', 'Test University', 'TU')
+    add_handbook(repository, 'tu', 'tu_2024', [f"topic {i}" for i in range(4)])
+
+    batches = repository.school_section_batches('tu', batch_size=2)
+    next(batches)
+    # Another thread can use the database while this batch is being processed
+    other = threading.Thread(target=repository.list_handbooks, args=('tu',))
+    other.start()
+    other.join(timeout=5)
+    assert not other.is_alive()
+    assert len(next(batches)) == 2
+
+
+def test_page_labels_are_stored_as_text(repository):
+    repository.insert_school('tu', 'Test University', 'TU')
+    add_handbook(repository, 'tu', 'tu_2024', ['parking'])
+
+    assert repository._query("SELECT page, typeof(page) FROM handbook_sections") == [('Page 1', 'text')]
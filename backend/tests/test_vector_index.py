@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from section_store import FIELD_NAMES, SectionStore, positions_of
+from vector_index import FlatIndex, IVFIndex, normalize_rows
+
+
+@pytest.fixture
+def vectors():
+    return normalize_rows(np.random.default_rng(0).normal(size=(200, 16)))
+
+
+def expected_rows(vectors, keep, added):
+    return np.vstack([vectors[keep], added])
+
+
+@pytest.mark.parametrize('removed', [[], [0], [5, 17, 199], list(range(0, 200, 3))])
+def test_ivf_updated_maps_every_slot_to_its_new_row(vectors, removed):
+    index = IVFIndex(nlist=8).build(vectors, normalized=True)
+    keep = np.ones(len(vectors), dtype=bool)
+    keep[removed] = False
+    added = normalize_rows(np.random.default_rng(1).normal(size=(5, 16)))
+
+    updated = index.updated(keep, added)
+    rows = expected_rows(vectors, keep, added)
+
+    assert len(updated) == len(rows)
+    assert sorted(updated.ids.tolist()) == list(range(len(rows)))
+    np.testing.assert_array_equal(updated.vectors, rows[updated.ids])
+    assert updated.offsets[-1] == len(rows)
+
+
+def test_ivf_updated_probing_every_cell_matches_exact_search(vectors):
+    index = IVFIndex(nlist=8, nprobe=8).build(vectors, normalized=True)
+    keep = np.arange(len(vectors)) % 4 != 0
+    added = normalize_rows(np.random.default_rng(1).normal(size=(10, 16)))
+    updated = index.updated(keep, added)
+    flat = FlatIndex().build(expected_rows(vectors, keep, added), normalized=True)
+
+    for query in np.random.default_rng(2).normal(size=(5, 16)):
+        np.testing.assert_array_equal(updated.search(query, 5)[0], flat.search(query, 5)[0])
+
+
+def test_positions_of():
+    store = SectionStore([(section_id,) + (None,) * (len(FIELD_NAMES) - 1) for section_id in 'abc'])
+    assert positions_of(store, {'c', 'a', 'z'}).tolist() == [True, False, True]
@@ -0,0 +1,229 @@
+import logging
+import os
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_rows(vectors: np.ndarray, copy: bool = True) -> np.ndarray:
+    """L2-normalize a 2-D array as C-contiguous float32.
+
+    With copy=False a writeable float32 input is normalized in place, so a
+    freshly built corpus matrix is never duplicated.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if copy or not vectors.flags.writeable:
+        vectors = vectors.copy()
+    if vectors.size == 0:
+        return vectors
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors /= norms
+    return vectors
+
+
+def normalize_query(query: np.ndarray) -> np.ndarray:
+    """Return a normalized float32 copy of a single query vector."""
+    query = np.asarray(query, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(query)
+    return query / norm if norm else query.copy()
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Indices of the top_k highest scores, best first, in O(n + k log k)."""
+    n = len(scores)
+    if top_k <= 0 or n == 0:
+        return np.zeros(0, dtype=np.int64)
+    if top_k < n:
+        candidates = np.argpartition(scores, n - top_k)[n - top_k:]
+    else:
+        candidates = np.arange(n)
+    return candidates[np.argsort(scores[candidates])[::-1]]
+
+
+class _ScoreBuffers(threading.local):
+    """Per-thread scratch space so concurrent searches never share a buffer."""
+
+    def get(self, size: int) -> np.ndarray:
+        buffer = getattr(self, 'buffer', None)
+        if buffer is None or len(buffer) < size:
+            buffer = np.empty(size, dtype=np.float32)
+            self.buffer = buffer
+        return buffer[:size]
+
+
+class FlatIndex:
+    """Exact inner-product search over normalized vectors."""
+
+    kind = 'flat'
+
+    def __init__(self):
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self._buffers = _ScoreBuffers()
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def build(self, vectors: np.ndarray, normalized: bool = False):
+        """Index a corpus; pass normalized=True to share an already normalized matrix."""
+        self.vectors = vectors if normalized else normalize_rows(vectors)
+        return self
+
+    def search(self, query: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (indices, cosine scores) of the top_k nearest vectors."""
+        if len(self.vectors) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        scores = self._buffers.get(len(self.vectors))
+        np.dot(self.vectors, normalize_query(query), out=scores)
+        indices = top_k_indices(scores, top_k)
+        return indices, scores[indices]
+
+
+class IVFIndex:
+    """Inverted-file index: spherical k-means cells, probing the nearest few.
+
+    ``nprobe`` is the recall-vs-latency knob: probing more cells scans more
+    vectors and gets closer to the exact flat result. Vectors are stored
+    grouped by cell so each probed cell is scored as one contiguous slice.
+    """
+
+    kind = 'ivf'
+
+    def __init__(self, nlist: Optional[int] = None, nprobe: int = 8, n_iter: int = 10, seed: int = 0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.n_iter = n_iter
+        self.seed = seed
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.centroids = np.zeros((0, 0), dtype=np.float32)
+        self._buffers = _ScoreBuffers()
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def build(self, vectors: np.ndarray, normalized: bool = False):
+        vectors = vectors if normalized else normalize_rows(vectors)
+        n = len(vectors)
+        if n == 0:
+            self.vectors = vectors
+            return self
+
+        nlist = self.nlist or max(1, int(np.sqrt(n)))
+        nlist = min(nlist, n)
+        rng = np.random.default_rng(self.seed)
+        centroids = vectors[rng.choice(n, size=nlist, replace=False)].copy()
+
+        for _ in range(self.n_iter):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = vectors[assignments == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+                else:
+                    # Re-seed empty cells so every centroid stays useful
+                    centroids[c] = vectors[rng.integers(n)]
+            centroids = normalize_rows(centroids, copy=False)
+
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        self.ids = np.argsort(assignments, kind='stable')
+        self.vectors = vectors[self.ids]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=nlist))])
+        self.centroids = centroids
+        return self
+
+    def search(self, query: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (indices, cosine scores) of the top_k vectors in the probed cells."""
+        if len(self.vectors) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        query = normalize_query(query)
+        cells = top_k_indices(self.centroids @ query, min(self.nprobe, len(self.centroids)))
+
+        buffer = self._buffers.get(len(self.vectors))
+        ids = []
+        filled = 0
+        for c in cells:
+            start, end = self.offsets[c], self.offsets[c + 1]
+            np.dot(self.vectors[start:end], query, out=buffer[filled:filled + end - start])
+            ids.append(self.ids[start:end])
+            filled += end - start
+
+        scores = buffer[:filled]
+        candidates = np.concatenate(ids)
+        best = top_k_indices(scores, top_k)
+        return candidates[best], scores[best]
+
+    def updated(self, keep: np.ndarray, added: np.ndarray) -> 'IVFIndex':
+        """New index over the kept rows (boolean mask) followed by normalized added rows.
+
+        Centroids are reused: kept vectors stay in their cells and added ones
+        go to their nearest centroid, so no k-means pass is needed.
+        """
+        index = IVFIndex(self.nlist, self.nprobe, self.n_iter, self.seed)
+        if len(self.centroids) == 0:
+            return index.build(added, normalized=True)
+
+        # Row positions shift down past every removed row
+        positions = np.cumsum(keep) - 1
+        cells = np.repeat(np.arange(len(self.centroids)), np.diff(self.offsets))
+        kept_slots = keep[self.ids]
+        n_kept = int(np.count_nonzero(keep))
+
+        added_cells = (np.argmax(added @ self.centroids.T, axis=1) if len(added)
+                       else np.zeros(0, dtype=np.int64))
+        all_cells = np.concatenate([cells[kept_slots], added_cells])
+        all_ids = np.concatenate([positions[self.ids[kept_slots]], n_kept + np.arange(len(added))])
+        all_vectors = _append_rows(self.vectors[kept_slots], added)
+
+        order = np.argsort(all_cells, kind='stable')
+        index.ids = all_ids[order]
+        index.vectors = all_vectors[order]
+        index.offsets = np.concatenate([[0], np.cumsum(np.bincount(all_cells, minlength=len(self.centroids)))])
+        index.centroids = self.centroids
+        return index
+
+
+def _append_rows(vectors: np.ndarray, added: np.ndarray) -> np.ndarray:
+    """Stack two float32 matrices, tolerating an empty (0, 0) side."""
+    if len(added) == 0:
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+    if len(vectors) == 0:
+        return np.ascontiguousarray(added, dtype=np.float32)
+    return np.vstack([vectors, added]).astype(np.float32, copy=False)
+
+
+INDEX_TYPES = {
+    FlatIndex.kind: FlatIndex,
+    IVFIndex.kind: IVFIndex,
+}
+
+
+def build_index(vectors: np.ndarray, kind: Optional[str] = None, normalized: bool = False, **params):
+    """Build the configured vector index for a corpus.
+
+    The index type comes from ``VECTOR_INDEX`` (``flat`` or ``ivf``). IVF
+    settings come from ``VECTOR_INDEX_NLIST`` / ``VECTOR_INDEX_NPROBE``, and
+    corpora smaller than ``VECTOR_INDEX_MIN_IVF_SIZE`` always use the flat index.
+    """
+    kind = (kind or os.getenv('VECTOR_INDEX', 'flat')).lower()
+    if kind not in INDEX_TYPES:
+        logger.warning(f"Unknown vector index '{kind}', using flat")
+        kind = FlatIndex.kind
+
+    if kind == IVFIndex.kind:
+        min_size = int(os.getenv('VECTOR_INDEX_MIN_IVF_SIZE', '2000'))
+        if len(vectors) < min_size:
+            kind = FlatIndex.kind
+        else:
+            params.setdefault('nprobe', int(os.getenv('VECTOR_INDEX_NPROBE', '8')))
+            nlist = os.getenv('VECTOR_INDEX_NLIST')
+            if nlist:
+                params.setdefault('nlist', int(nlist))
+
+    if kind == FlatIndex.kind:
+        params = {}
+    return INDEX_TYPES[kind](**params).build(vectors, normalized=normalized)
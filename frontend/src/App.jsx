@@ -4,7 +4,6 @@ import Hero from './components/Hero';
 import SchoolSelector from './components/SchoolSelector';
 import HandbookUploader from './components/HandbookUploader';
 import ChatInterface from './components/ChatInterface';
-import axios from 'axios';
 
 const API_BASE_URL = 'http://127.0.0.1:8000/api';
 
@@ -69,31 +68,76 @@ function App() {
     setMessages(prev => [...prev, userMessage]);
     setIsLoading(true);
 
+    const botMessageId = Date.now() + 1;
+
     try {
-      const response = await axios.post(`${API_BASE_URL}/chat`, {
-        message: messageText,
-        school_id: selectedSchool.school_id
+      // Stream the answer over Server-Sent Events: sources arrive first,
+      // then the answer text as it is generated
+      const response = await fetch(`${API_BASE_URL}/chat/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          message: messageText,
+          school_id: selectedSchool.school_id
+        })
       });
 
-      const botMessage = {
-        id: Date.now() + 1,
-        text: response.data.response,
-        isBot: true,
-        timestamp: new Date(),
-        sources: [],
-        confidence: 0.9
-      };
+      if (!response.ok || !response.body) {
+        throw new Error(`Chat request failed with status ${response.status}`);
+      }
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let sources = [];
+      let botText = '';
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+
+        for (const rawEvent of events) {
+          const dataLine = rawEvent.split('\n').find(line => line.startsWith('data: '));
+          if (!dataLine) continue;
+          const event = JSON.parse(dataLine.slice(6));
 
-      setMessages(prev => [...prev, botMessage]);
+          if (event.type === 'sources') {
+            sources = event.sources;
+          } else if (event.type === 'token') {
+            if (!botText) {
+              // First token: swap the typing indicator for the answer bubble
+              const botMessage = {
+                id: botMessageId,
+                text: '',
+                isBot: true,
+                timestamp: new Date(),
+                sources,
+                confidence: 0.9
+              };
+              setIsLoading(false);
+              setMessages(prev => [...prev, botMessage]);
+            }
+            botText += event.text;
+            const text = botText;
+            setMessages(prev => prev.map(msg => (msg.id === botMessageId ? { ...msg, text } : msg)));
+          } else if (event.type === 'error') {
+            throw new Error(event.message);
+          }
+        }
+      }
     } catch (error) {
       const errorMessage = {
-        id: Date.now() + 1,
+        id: botMessageId,
         text: "I'm sorry, I'm having trouble processing your request right now. Please try again.",
         isBot: true,
         timestamp: new Date(),
         isError: true
       };
-      setMessages(prev => [...prev, errorMessage]);
+      setMessages(prev => [...prev.filter(msg => msg.id !== botMessageId), errorMessage]);
     } finally {
       setIsLoading(false);
     }
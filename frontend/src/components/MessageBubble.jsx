@@ -138,8 +138,8 @@ const MessageBubble = ({ message }) => {
                         {source.category}
                       </p>
                       <p className="text-sm text-gray-700 leading-relaxed">
-                        {source.summary?.substring(0, 150) || source.content?.substring(0, 150)}
-                        {(source.summary?.length > 150 || source.content?.length > 150) && '...'}
+                        {(source.excerpt || source.summary || source.content)?.substring(0, 150)}
+                        {(source.excerpt || source.summary || source.content)?.length > 150 && '...'}
                       </p>
                     </motion.div>
                   ))}